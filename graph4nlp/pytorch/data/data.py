@@ -5,23 +5,21 @@ import numpy as np
 import scipy.sparse
 import torch
 
+from .storage import ArrayBuffer, AttributeRow, AttributeTable, AttributeTableView, FeatureBuffer, SortedEdgeIndex
 from .utils import SizeMismatchException, NodeNotFoundException, EdgeNotFoundException
-from .utils import entail_zero_padding, slice_to_list
-from .views import NodeView, NodeFeatView, EdgeView
+from .utils import slice_to_range, to_index_array
+from .views import NodeView, NodeFeatView, EdgeView, EdgeFeatView
 
 EdgeIndex = namedtuple('EdgeIndex', ['src', 'tgt'])
 
 node_feat_factory = dict
-node_attr_factory = dict
-single_node_attr_factory = dict
+node_attr_factory = AttributeTable
 res_init_node_attr = {'node_attr': None}
 res_init_node_features = {'node_feat': None, 'node_emb': None}
 
-eid_nids_mapping_factory = dict
-nids_eid_mapping_factory = dict
+edge_index_factory = ArrayBuffer
 edge_feature_factory = dict
-edge_attribute_factory = dict
-single_edge_attr_factory = dict
+edge_attribute_factory = AttributeTable
 res_init_edge_features = {'edge_feat': None, 'edge_emb': None}
 res_init_edge_attributes = {'edge_attr': None}
 
@@ -31,16 +29,25 @@ graph_data_factory = dict
 class GraphData(object):
     """
     Represent a single graph with additional attributes.
+
+    The topology and the attributes are stored column-wise: the edge endpoints live in two int64
+    buffers and every node/edge attribute name owns one typed column. ``node_attributes`` and
+    ``edge_attributes`` expose these columns through dict-of-dict views, so that
+    ``g.node_attributes[i]['token']`` reads and writes the underlying column directly.
+    Node and edge features are kept in ``FeatureBuffer`` objects which grow by doubling their capacity,
+    so adding nodes or edges one by one after the features are set costs amortized O(1) per element.
     """
 
     def __init__(self):
-        self._node_attributes = node_attr_factory()
+        self._node_attributes = node_attr_factory(res_init_node_attr)
         self._node_features = node_feat_factory(res_init_node_features)
-        self._edge_indices = EdgeIndex(src=[], tgt=[])
-        self._eid_nids_mapping = eid_nids_mapping_factory()
-        self._nids_eid_mapping = nids_eid_mapping_factory()
+        self._edge_indices = EdgeIndex(src=edge_index_factory(np.int64), tgt=edge_index_factory(np.int64))
+        self._topology_version = 0  # Bumped whenever nodes or edges are added, used to invalidate caches
+        self._edge_lookup_cache = None  # (topology version, SortedEdgeIndex), built lazily by `edge_ids`
+        self._adj_cache = (0, dict())  # (topology version, {key: adjacency structure}), filled lazily by `adj`
+        self._dgl_cache = None  # (topology version, dgl.DGLGraph, {feature key: bound tensor}), built by `to_dgl`
         self._edge_features = edge_feature_factory(res_init_edge_features)
-        self._edge_attributes = edge_attribute_factory()
+        self._edge_attributes = edge_attribute_factory(res_init_edge_attributes)
         self.graph_attributes = graph_data_factory()
 
     # # Graph level data
@@ -72,7 +79,7 @@ class GraphData(object):
         """
         return len(self._node_attributes)
 
-    def add_nodes(self, node_num: int) -> None:
+    def add_nodes(self, node_num: int, attributes: dict = None) -> None:
         """
         Add a number of nodes to the graph.
 
@@ -80,16 +87,37 @@ class GraphData(object):
         ------
         node_num: int
             The number of nodes to be added
+        attributes: dict, optional
+            Map from attribute name to the list of values of the new nodes, which are written as whole
+            columns. Default: ``None``.
+        """
+        table = None
+        if attributes is not None:
+            columns = dict()
+            for name, values in attributes.items():
+                if len(values) != node_num:
+                    raise SizeMismatchException('Attribute {} has {} values for {} nodes.'.format(
+                        name, len(values), node_num))
+                columns[name] = (values, np.ones(node_num, dtype=bool))
+            table = AttributeTable.from_columns(node_num, columns, self._node_attributes._defaults)
+        self._append_nodes(node_num, table)
+
+    def _append_nodes(self, node_num: int, attributes: AttributeTable = None) -> None:
+        """
+        Append nodes, optionally taking their attributes from a table of `node_num` rows.
         """
-        current_num_nodes = self.get_node_num()
+        self._topology_version += 1
 
-        # Create placeholders in the node attribute dictionary
-        for new_node_idx in range(current_num_nodes, current_num_nodes + node_num):
-            self._node_attributes[new_node_idx] = single_node_attr_factory(**res_init_node_attr)
+        # Create rows in the node attribute table
+        if attributes is None:
+            self._node_attributes.add_rows(node_num)
+        else:
+            self._node_attributes.extend(attributes)
 
         # Do padding in the node feature dictionary
-        for key in self._node_features.keys():
-            self._node_features[key] = entail_zero_padding(self._node_features[key], node_num)
+        for feat in self._node_features.values():
+            if feat is not None:
+                feat.extend(node_num)
 
     # Node feature operations
     @property
@@ -114,8 +142,7 @@ class GraphData(object):
         -------
         NodeFeatView
         """
-
-        return self.nodes[:].features
+        return NodeFeatView(self, slice(None))
 
     def get_node_features(self, nodes: int or slice) -> torch.tensor:
         """
@@ -132,11 +159,11 @@ class GraphData(object):
             The reference dict of the actual tensor
         """
         ret = dict()
-        for key in self._node_features.keys():
-            if self._node_features[key] is None:
+        for key, feat in self._node_features.items():
+            if feat is None:
                 ret[key] = None
             else:
-                ret[key] = self._node_features[key][nodes]
+                ret[key] = feat.data[nodes]
         return ret
 
     def get_node_feature_names(self):
@@ -163,7 +190,7 @@ class GraphData(object):
             if key not in self._node_features or self._node_features[key] is None:  # A new feature is added
                 # If the shape of the new feature does not match the number of existing nodes, then error occurs
                 if (not isinstance(nodes, slice)) or (
-                        len(slice_to_list(nodes, self.get_node_num())) != self.get_node_num()):
+                        len(slice_to_range(nodes, self.get_node_num())) != self.get_node_num()):
                     raise SizeMismatchException(
                         'The new feature `{}\' should cover all existing {} nodes!'.format(key, self.get_node_num()))
 
@@ -171,22 +198,22 @@ class GraphData(object):
         for key, value in new_data.items():
             assert isinstance(value, torch.Tensor), "`{}' is not a tensor. Node features are expected to be tensor."
             if key not in self._node_features or self._node_features[key] is None:
-                self._node_features[key] = value
+                self._node_features[key] = FeatureBuffer(value)
             else:
-                self._node_features[key][nodes] = value
+                self._node_features[key].data[nodes] = value
 
     # Node attribute operations
     @property
-    def node_attributes(self) -> dict:
+    def node_attributes(self) -> AttributeTableView:
         """
         Access node attribute dictionary
 
         Returns
         -------
-        node_attribute_dict: dict
-            The dict of node attributes
+        node_attribute_dict: AttributeTableView
+            The dict-like view of node attributes, keyed by node index
         """
-        return self._node_attributes
+        return AttributeTableView(self._node_attributes)
 
     def get_node_attrs(self, nodes: int or slice):
         """
@@ -203,13 +230,13 @@ class GraphData(object):
             The node attribute dictionary.
         """
         if isinstance(nodes, slice):
-            node_idx = slice_to_list(nodes, self.get_node_num())
+            node_idx = slice_to_range(nodes, self.get_node_num())
         else:
             node_idx = [nodes]
 
         ret = {}
         for idx in node_idx:
-            ret[idx] = self._node_attributes[idx]
+            ret[idx] = AttributeRow(self._node_attributes, idx)
         return ret
 
     # Edge views and operations
@@ -247,25 +274,42 @@ class GraphData(object):
             Tatget node index
         """
         # Consistency check
-        if (src not in range(self.get_node_num())) or (tgt not in range(self.get_node_num())):
+        num_nodes = self.get_node_num()
+        if not (0 <= src < num_nodes and 0 <= tgt < num_nodes):
             raise NodeNotFoundException('Endpoint not in the graph.')
 
-        # Append to the mapping list
-        endpoint_tuple = (src, tgt)
-        eid = self.get_edge_num()
-        self._eid_nids_mapping[eid] = endpoint_tuple
-        self._nids_eid_mapping[endpoint_tuple] = eid
-
         # Add edge
         self._edge_indices.src.append(src)
         self._edge_indices.tgt.append(tgt)
+        self._topology_version += 1
+
+        # Initialize edge feature and attribute
+        # 1. create a row in edge attribute table
+        self._edge_attributes.add_rows(1)
+        # 2. perform zero padding
+        for feat in self._edge_features.values():
+            if feat is not None:
+                feat.extend(1)
+
+    def _append_edges(self, src: np.ndarray, tgt: np.ndarray, attributes: AttributeTable = None):
+        """
+        Append already validated edges, optionally taking their attributes from a table.
+        """
+        # Add edges
+        self._edge_indices.src.extend(src)
+        self._edge_indices.tgt.extend(tgt)
+        self._topology_version += 1
 
         # Initialize edge feature and attribute
-        # 1. create placeholder in edge attribute dictionary
-        self._edge_attributes[eid] = single_edge_attr_factory(res_init_edge_attributes)
+        # 1. create rows in edge attribute table
+        if attributes is None:
+            self._edge_attributes.add_rows(len(src))
+        else:
+            self._edge_attributes.extend(attributes)
         # 2. perform zero padding
-        for key in self._edge_features.keys():
-            self._edge_features[key] = entail_zero_padding(self._edge_features[key], 1)
+        for feat in self._edge_features.values():
+            if feat is not None:
+                feat.extend(len(src))
 
     def add_edges(self, src: list, tgt: list):
         """
@@ -273,9 +317,9 @@ class GraphData(object):
 
         Parameters
         ----------
-        src: list of int
+        src: list of int or numpy.ndarray or torch.Tensor
             Source node indices
-        tgt: list of int
+        tgt: list of int or numpy.ndarray or torch.Tensor
             Target node indices
 
         Raises
@@ -290,68 +334,103 @@ class GraphData(object):
         else:
             if len(src) != len(tgt) and len(src) > 1 and len(tgt) > 1:
                 raise SizeMismatchException('The numbers of nodes in `src` and `tgt` don\'t match.')
+            src = to_index_array(src)
+            tgt = to_index_array(tgt)
             if len(src) == 1:
-                src = [src[0]] * len(tgt)
+                src = np.repeat(src, len(tgt))
             elif len(tgt) == 1:
-                tgt = [tgt[0]] * len(src)
-            for src_idx, tgt_idx in zip(src, tgt):
-                self.add_edge(src_idx, tgt_idx)
+                tgt = np.repeat(tgt, len(src))
+            num_nodes = self.get_node_num()
+            if src.min() < 0 or tgt.min() < 0 or src.max() >= num_nodes or tgt.max() >= num_nodes:
+                raise NodeNotFoundException('Endpoint not in the graph.')
+            self._append_edges(src, tgt)
+
+    def _edge_lookup(self) -> SortedEdgeIndex:
+        if self._edge_lookup_cache is None or self._edge_lookup_cache[0] != self._topology_version:
+            index = SortedEdgeIndex(self._edge_indices.src.data, self._edge_indices.tgt.data, self.get_node_num())
+            self._edge_lookup_cache = (self._topology_version, index)
+        return self._edge_lookup_cache[1]
+
+    def _lookup_edges(self, src, tgt):
+        """
+        Broadcast the endpoints and look them up in the edge index.
+
+        Returns the edge ids (``-1`` for non-edges) and a function converting a numpy result
+        back to the container type of the inputs.
+        """
+        for endpoint, name in ((src, 'src'), (tgt, 'tgt')):
+            if not isinstance(endpoint, (int, np.integer, list, tuple, np.ndarray, torch.Tensor)):
+                raise AssertionError("`{}' must be int, list, numpy.ndarray or torch.Tensor!".format(name))
+        src_arr, tgt_arr = to_index_array(src), to_index_array(tgt)
+        if len(src_arr) != len(tgt_arr) and not (np.ndim(src) == 0 or np.ndim(tgt) == 0):
+            raise SizeMismatchException("The length of `src' and `tgt' don't match!")
+        src_arr, tgt_arr = np.broadcast_arrays(src_arr, tgt_arr)
+
+        tensor = src if isinstance(src, torch.Tensor) else tgt if isinstance(tgt, torch.Tensor) else None
+        if tensor is not None:
+            def convert(ret):
+                return torch.from_numpy(ret).to(tensor.device)
+        elif isinstance(src, np.ndarray) or isinstance(tgt, np.ndarray):
+            def convert(ret):
+                return ret
+        else:
+            def convert(ret):
+                return ret.tolist()
+        return self._edge_lookup().lookup(src_arr, tgt_arr), convert
 
-    def edge_ids(self, src: int or list, tgt: int or list) -> list:
+    def edge_ids(self, src: int or list or np.ndarray or torch.Tensor,
+                 tgt: int or list or np.ndarray or torch.Tensor) -> list or np.ndarray or torch.Tensor:
         """
         Convert the given endpoints to edge indices.
 
+        The lookup is vectorized over whole arrays of endpoints. An int endpoint is broadcast
+        against the other side.
+
         Parameters
         ----------
-        src: int or list
+        src: int or list or numpy.ndarray or torch.Tensor
             The index of source node(s).
-        tgt: int or list
+        tgt: int or list or numpy.ndarray or torch.Tensor
             The index of target node(s).
 
         Returns
         -------
-        list
-            The index of corresponding edges.
-        """
-        if isinstance(src, int):
-            if isinstance(tgt, int):
-                try:
-                    return [self._nids_eid_mapping[(src, tgt)]]
-                except KeyError:
-                    raise EdgeNotFoundException('Edge {} does not exist!'.format((src, tgt)))
-            elif isinstance(tgt, list):
-                eid_list = []
-                try:
-                    for tgt_idx in tgt:
-                        eid_list.append(self._nids_eid_mapping[(src, tgt_idx)])
-                except KeyError:
-                    raise EdgeNotFoundException('Edge {} does not exist!'.format((src, tgt)))
-                return eid_list
-            else:
-                raise AssertionError("`tgt' must be int or list!")
-        elif isinstance(src, list):
-            if isinstance(tgt, int):
-                eid_list = []
-                try:
-                    for src_idx in src:
-                        eid_list.append(self._nids_eid_mapping[(src_idx, tgt)])
-                except KeyError:
-                    raise EdgeNotFoundException('Edge {} does not exist!'.format((src, tgt)))
-                return eid_list
-            elif isinstance(tgt, list):
-                if not len(src) == len(tgt):
-                    raise SizeMismatchException("The length of `src' and `tgt' don't match!")
-                eid_list = []
-                try:
-                    for src_idx, tgt_idx in zip(src, tgt):
-                        eid_list.append(self._nids_eid_mapping[(src_idx, tgt_idx)])
-                except KeyError:
-                    raise EdgeNotFoundException('Edge {} does not exist!'.format((src, tgt)))
-                return eid_list
-            else:
-                raise AssertionError("`tgt' must be int or list!")
-        else:
-            raise AssertionError("`src' must be int or list!")
+        list or numpy.ndarray or torch.Tensor
+            The index of corresponding edges. A tensor is returned if one of the inputs is a tensor,
+            an array if one of them is an array, and a list otherwise.
+
+        Raises
+        ------
+        EdgeNotFoundException
+            If one of the given endpoint pairs is not an edge of the graph.
+        """
+        eids, convert = self._lookup_edges(src, tgt)
+        missing = np.flatnonzero(eids < 0)
+        if len(missing) > 0:
+            src_arr, tgt_arr = np.broadcast_arrays(to_index_array(src), to_index_array(tgt))
+            raise EdgeNotFoundException('Edge {} does not exist!'.format(
+                (int(src_arr[missing[0]]), int(tgt_arr[missing[0]]))))
+        return convert(eids)
+
+    def has_edges(self, src: int or list or np.ndarray or torch.Tensor,
+                  tgt: int or list or np.ndarray or torch.Tensor) -> list or np.ndarray or torch.Tensor:
+        """
+        Check whether the given endpoint pairs are edges of the graph.
+
+        Parameters
+        ----------
+        src: int or list or numpy.ndarray or torch.Tensor
+            The index of source node(s).
+        tgt: int or list or numpy.ndarray or torch.Tensor
+            The index of target node(s).
+
+        Returns
+        -------
+        list or numpy.ndarray or torch.Tensor
+            A boolean for every endpoint pair, in the same container type as ``edge_ids``.
+        """
+        eids, convert = self._lookup_edges(src, tgt)
+        return convert(eids >= 0)
 
     def get_all_edges(self):
         """
@@ -362,15 +441,12 @@ class GraphData(object):
         edges: list
             List of edges
         """
-        edges = list()
-        for i in range(self.get_edge_num()):
-            edges.append((self._edge_indices.src[i], self._edge_indices.tgt[i]))
-        return edges
+        return list(zip(self._edge_indices.src.data.tolist(), self._edge_indices.tgt.data.tolist()))
 
     # Edge feature operations
     @property
-    def edge_features(self):
-        return self.edges[:].features
+    def edge_features(self) -> EdgeFeatView:
+        return EdgeFeatView(self, slice(None))
 
     def get_edge_feature(self, edges: list):
         """
@@ -387,11 +463,11 @@ class GraphData(object):
             The dictionary containing all relevant features.
         """
         ret = {}
-        for key in self._edge_features.keys():
-            if self._edge_features[key] is None:
+        for key, feat in self._edge_features.items():
+            if feat is None:
                 ret[key] = None
             else:
-                ret[key] = self._edge_features[key][edges]
+                ret[key] = feat.data[edges]
         return ret
 
     def get_edge_feature_names(self):
@@ -418,7 +494,7 @@ class GraphData(object):
             if key not in self._edge_features or self._edge_features[key] is None:  # A new feature is added
                 # If the shape of the new feature does not match the number of existing nodes, then error occurs
                 if (not isinstance(edges, slice)) or (
-                        len(slice_to_list(edges, self.get_edge_num())) != self.get_edge_num()):
+                        len(slice_to_range(edges, self.get_edge_num())) != self.get_edge_num()):
                     raise SizeMismatchException(
                         'The new feature `{}\' should cover all existing {} edges!'.format(key, self.get_edge_num()))
 
@@ -427,32 +503,62 @@ class GraphData(object):
             assert isinstance(value, torch.Tensor), "`{}' is not a tensor. Node features are expected to be tensor."
             assert value.shape[0] == self.get_edge_num(), "Length of the feature vector does not match the edge number."
             if key not in self._edge_features or self._edge_features[key] is None:
-                self._edge_features[key] = value
+                self._edge_features[key] = FeatureBuffer(value)
             else:
-                self._edge_features[key][edges] = value
+                self._edge_features[key].data[edges] = value
 
     # Edge attribute operations
     @property
-    def edge_attributes(self):
-        return self._edge_attributes
+    def edge_attributes(self) -> AttributeTableView:
+        return AttributeTableView(self._edge_attributes)
 
     # Conversion utility functions
     def to_dgl(self) -> dgl.DGLGraph:
         """
         Convert to dgl.DGLGraph
 
+        The structure of the converted graph is cached until the topology changes. Every call returns
+        a shallow copy of the cached graph (``DGLGraph.local_var``): it shares the structure and the
+        feature tensors, which are bound to ``ndata`` and ``edata`` without copying, but the features
+        written to or removed from the returned graph by the caller do not affect the later results.
+        Features removed from this graph, or set to ``None``, are dropped from the cached graph.
+
         Returns
         -------
         g: dgl.DGLGraph
             The converted dgl.DGLGraph
         """
-        dgl_g = dgl.DGLGraph()
-        dgl_g.add_nodes(num=self.get_node_num())
-        for key, value in self._node_features.items():
-            if value is not None:
-                dgl_g.ndata[key] = value
-        dgl_g.add_edges(u=self._edge_indices.src, v=self._edge_indices.tgt)
-        return dgl_g
+        if self._dgl_cache is None or self._dgl_cache[0] != self._topology_version:
+            dgl_g = dgl.DGLGraph()
+            dgl_g.add_nodes(num=self.get_node_num())
+            if self.get_edge_num() > 0:
+                dgl_g.add_edges(u=torch.from_numpy(self._edge_indices.src.data),
+                                v=torch.from_numpy(self._edge_indices.tgt.data))
+            self._dgl_cache = (self._topology_version, dgl_g, dict())
+        _, dgl_g, bound_features = self._dgl_cache
+
+        for frame, features, kind in ((dgl_g.ndata, self._node_features, 'node'),
+                                      (dgl_g.edata, self._edge_features, 'edge')):
+            for key in list(frame.keys()):
+                if features.get(key) is None:
+                    del frame[key]
+                    bound_features.pop((kind, key), None)
+            for key, value in features.items():
+                if value is not None and bound_features.get((kind, key)) is not value.data:
+                    frame[key] = value.data
+                    bound_features[(kind, key)] = value.data
+        return dgl_g.local_var()
+
+    def _from_edges(self, num_nodes: int, src, tgt, edge_weight: torch.Tensor = None):
+        """
+        Fill an empty graph with `num_nodes` nodes and the given edges in one shot.
+        """
+        assert self.get_edge_num() == 0 and self.get_node_num() == 0, 'Not an empty graph.'
+        self.add_nodes(num_nodes)
+        if len(src) > 0:
+            self.add_edges(src, tgt)
+        if edge_weight is not None:
+            self.edge_features['edge_weight'] = edge_weight
 
     def from_dgl(self, dgl_g: dgl.DGLGraph):
         """
@@ -463,61 +569,506 @@ class GraphData(object):
         dgl_g: dgl.DGLGraph
             The source graph
         """
-        assert self.get_edge_num() == 0 and self.get_node_num() == 0, 'Not an empty graph.'
-
-        # Add nodes
-        self.add_nodes(dgl_g.number_of_nodes())
+        src_tensor, tgt_tensor = dgl_g.edges()
+        self._from_edges(dgl_g.number_of_nodes(), src_tensor, tgt_tensor)
         for k, v in dgl_g.ndata.items():
             self.node_features[k] = v
-
-        # Add edges
-        src_tensor, tgt_tensor = dgl_g.edges()
-        src_list = list(src_tensor.detach().numpy())
-        tgt_list = list(tgt_tensor.detach().numpy())
-        self.add_edges(src_list, tgt_list)
         for k, v in dgl_g.edata.items():
             self.edge_features[k] = v
 
+    def from_edge_index(self, edge_index: torch.Tensor or np.ndarray, num_nodes: int = None,
+                        edge_weight: torch.Tensor = None):
+        """
+        Build the graph from a 2 x E edge index, whose rows are the source and target nodes.
+
+        Parameters
+        ----------
+        edge_index: torch.Tensor or numpy.ndarray
+            The edge index.
+        num_nodes: int, optional
+            The number of nodes, default: ``None`` for the largest node index plus one.
+        edge_weight: torch.Tensor, optional
+            The weight of every edge, stored as the ``'edge_weight'`` edge feature. Default: ``None``.
+        """
+        assert len(edge_index) == 2, 'The edge index should have 2 rows.'
+        src, tgt = to_index_array(edge_index[0]), to_index_array(edge_index[1])
+        if num_nodes is None:
+            num_nodes = int(max(src.max(), tgt.max())) + 1 if len(src) > 0 else 0
+        self._from_edges(num_nodes, src, tgt, edge_weight)
+
+    def from_coo(self, row, col, data=None, num_nodes: int = None):
+        """
+        Build the graph from the coordinates of the nonzeros of an adjacency matrix.
+
+        Parameters
+        ----------
+        row: list or numpy.ndarray or torch.Tensor
+            The source node of every edge.
+        col: list or numpy.ndarray or torch.Tensor
+            The target node of every edge.
+        data: numpy.ndarray or torch.Tensor, optional
+            The weight of every edge, stored as the ``'edge_weight'`` edge feature. Default: ``None``.
+        num_nodes: int, optional
+            The number of nodes, default: ``None`` for the largest node index plus one.
+        """
+        if data is not None:
+            data = torch.as_tensor(data)
+        self.from_edge_index((row, col), num_nodes=num_nodes, edge_weight=data)
+
+    def from_csr(self, indptr, indices, data=None):
+        """
+        Build the graph from the compressed sparse row structure of an adjacency matrix.
+
+        Parameters
+        ----------
+        indptr: numpy.ndarray or torch.Tensor
+            The row pointers: the edges leaving node ``i`` are stored in ``indptr[i]:indptr[i + 1]``.
+        indices: numpy.ndarray or torch.Tensor
+            The target node of every edge.
+        data: numpy.ndarray or torch.Tensor, optional
+            The weight of every edge, stored as the ``'edge_weight'`` edge feature. Default: ``None``.
+        """
+        indptr = to_index_array(indptr)
+        num_nodes = len(indptr) - 1
+        src = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(indptr))
+        self._from_edges(num_nodes, src, to_index_array(indices)[:len(src)],
+                         None if data is None else torch.as_tensor(data)[:len(src)])
+
     def from_dense_adj(self, adj: torch.Tensor):
+        """
+        Build the graph from a dense adjacency matrix. The nonzero entries become the edges (in row-major
+        order) and their values the ``'edge_weight'`` edge feature, which keeps the autograd history of `adj`.
+
+        Parameters
+        ----------
+        adj: torch.Tensor
+            The N x N adjacency matrix.
+        """
         assert adj.dim() == 2, 'Adjancency matrix is not 2-dimensional.'
         assert adj.shape[0] == adj.shape[1], 'Adjancecy is not a square.'
 
-        node_num = adj.shape[0]
-        self.add_nodes(node_num)
-        edge_weight = []
-        for i in range(adj.shape[0]):
-            for j in range(adj.shape[1]):
-                if adj[i][j] != 0:
-                    self.add_edge(i, j)
-                    edge_weight.append(adj[i][j])
-        edge_weight = torch.stack(edge_weight, dim=0)
-        self.edge_features['edge_weight'] = edge_weight
-                    # self.edge_features['edge_weight'][-1] = adj[i][j]
-
-    def from_scipy_sparse_matrix(self, adj: scipy.sparse.coo_matrix):
+        src, tgt = adj.nonzero().t()
+        self._from_edges(adj.shape[0], src, tgt, adj[src, tgt])
+
+    def from_scipy_sparse_matrix(self, adj: scipy.sparse.spmatrix):
+        """
+        Build the graph from a scipy sparse adjacency matrix. The stored entries become the edges and
+        their values the ``'edge_weight'`` edge feature.
+
+        Parameters
+        ----------
+        adj: scipy.sparse.spmatrix
+            The N x N adjacency matrix, in any scipy sparse format.
+        """
         assert adj.shape[0] == adj.shape[1], 'Adjancecy is not a square.'
 
-        num_nodes = adj.shape[0]
-        self.add_nodes(num_nodes)
+        if scipy.sparse.isspmatrix_csr(adj):
+            self.from_csr(adj.indptr, adj.indices, adj.data)
+        else:
+            adj = adj.tocoo()
+            self.from_coo(adj.row, adj.col, adj.data, num_nodes=adj.shape[0])
 
-        for i in range(num_nodes):
-            self.add_edge(adj.row[i], adj.col[i])
-        self.edge_features['edge_weight'] = torch.tensor(adj.data)
+    def adj_matrix(self) -> torch.Tensor:
+        """
+        Get the dense adjacency matrix of the graph.
 
-    def adj_matrix(self):
+        Returns
+        -------
+        torch.Tensor
+            The N x N adjacency matrix.
+        """
         ret = torch.zeros((self.get_node_num(), self.get_node_num()))
-        all_edges = self.edges()
-        for i in range(len(all_edges)):
-            u, v = all_edges[i]
-            ret[u][v] = 1
+        ret[torch.from_numpy(self._edge_indices.src.data), torch.from_numpy(self._edge_indices.tgt.data)] = 1
+        return ret
+
+    def scipy_sparse_adj(self) -> scipy.sparse.coo_matrix:
+        """
+        Get the adjacency matrix as a ``scipy.sparse.coo_matrix``. Same as ``adj('coo', 'scipy')``.
+        """
+        return self.adj(format='coo', backend='scipy')
+
+    # Sparse adjacency structures
+    def _adj_structures(self) -> dict:
+        if self._adj_cache[0] != self._topology_version:
+            self._adj_cache = (self._topology_version, dict())
+        return self._adj_cache[1]
+
+    def _compressed_adj(self, by_src: bool = True):
+        """
+        Get the compressed sparse adjacency structure.
+
+        Parameters
+        ----------
+        by_src: bool, optional
+            Group the edges by source node (CSR) if ``True``, by target node (CSC) otherwise. Default: ``True``.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            ``(indptr, indices, eids)``: the edges of row ``i`` are ``eids[indptr[i]:indptr[i + 1]]``, which
+            connect ``i`` to the nodes ``indices[indptr[i]:indptr[i + 1]]``.
+        """
+        structures = self._adj_structures()
+        key = 'csr' if by_src else 'csc'
+        if key not in structures:
+            rows, cols = self._edge_indices.src.data, self._edge_indices.tgt.data
+            if not by_src:
+                rows, cols = cols, rows
+            eids = np.argsort(rows, kind='stable')
+            indptr = np.zeros(self.get_node_num() + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=self.get_node_num()), out=indptr[1:])
+            structures[key] = (indptr, cols[eids], eids)
+        return structures[key]
+
+    def adj(self, format: str = 'csr', backend: str = 'scipy', weight: str = None):
+        """
+        Get the sparse adjacency matrix of the graph.
+
+        The unweighted matrices are cached until the topology of the graph changes (i.e. nodes or edges
+        are added), so repeated calls return the same object. Cached matrices are shared and should
+        not be modified in place. Duplicated edges are kept as separate entries.
+
+        Parameters
+        ----------
+        format: str, optional
+            The sparse format, one of ``'csr'``, ``'csc'`` and ``'coo'``. Default: ``'csr'``.
+        backend: str, optional
+            ``'scipy'`` for a ``scipy.sparse`` matrix, ``'torch'`` for a sparse ``torch.Tensor``.
+            Default: ``'scipy'``.
+        weight: str, optional
+            The name of a 1-D edge feature used as the values of the matrix, default: ``None`` for ones.
+            Weighted matrices are not cached.
+
+        Returns
+        -------
+        scipy.sparse.spmatrix or torch.Tensor
+            The N x N adjacency matrix.
+        """
+        assert format in ('csr', 'csc', 'coo'), "Unknown sparse format `{}'.".format(format)
+        assert backend in ('scipy', 'torch'), "Unknown backend `{}'.".format(backend)
+        structures = self._adj_structures()
+        key = (format, backend)
+        if weight is None and key in structures:
+            return structures[key]
+
+        num_nodes = self.get_node_num()
+        shape = (num_nodes, num_nodes)
+        if weight is None:
+            values = torch.ones(self.get_edge_num())
+        else:
+            values = self._edge_features[weight].data
+            assert values.dim() == 1, "Edge feature `{}' is not 1-dimensional.".format(weight)
+
+        if format == 'coo':
+            indices = np.stack((self._edge_indices.src.data, self._edge_indices.tgt.data))
+            if backend == 'scipy':
+                ret = scipy.sparse.coo_matrix((values.detach().cpu().numpy(), (indices[0], indices[1])), shape=shape)
+            else:
+                ret = torch.sparse_coo_tensor(torch.from_numpy(indices).to(values.device), values, shape)
+        else:
+            indptr, indices, eids = self._compressed_adj(by_src=format == 'csr')
+            if backend == 'scipy':
+                matrix_cls = scipy.sparse.csr_matrix if format == 'csr' else scipy.sparse.csc_matrix
+                ret = matrix_cls((values.detach().cpu().numpy()[eids], indices, indptr), shape=shape)
+            else:
+                tensor_factory = getattr(torch, 'sparse_csr_tensor' if format == 'csr' else 'sparse_csc_tensor', None)
+                if tensor_factory is None:
+                    raise NotImplementedError("Sparse `{}' tensors require a newer PyTorch.".format(format))
+                ret = tensor_factory(torch.from_numpy(indptr).to(values.device),
+                                     torch.from_numpy(indices).to(values.device),
+                                     values[torch.from_numpy(eids).to(values.device)], shape)
+        if weight is None:
+            structures[key] = ret
         return ret
 
-    def scipy_sparse_adj(self):
-        row = np.array(self._edge_indices[0])
-        col = np.array(self._edge_indices[1])
-        data = np.ones(self.get_edge_num())
-        matrix = scipy.sparse.coo_matrix((data, (row, col)), shape=(self.get_node_num(), self.get_node_num()))
-        return matrix
+    def in_degrees(self) -> np.ndarray:
+        """
+        Get the in-degree of every node.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.diff(self._compressed_adj(by_src=False)[0])
+
+    def out_degrees(self) -> np.ndarray:
+        """
+        Get the out-degree of every node.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.diff(self._compressed_adj(by_src=True)[0])
+
+    def successors(self, node: int) -> np.ndarray:
+        """
+        Get the targets of the out-edges of `node`, as a slice of the cached CSR structure.
+
+        Parameters
+        ----------
+        node: int
+            The node index.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        indptr, indices, _ = self._compressed_adj(by_src=True)
+        return indices[indptr[node]:indptr[node + 1]]
+
+    def predecessors(self, node: int) -> np.ndarray:
+        """
+        Get the sources of the in-edges of `node`, as a slice of the cached CSC structure.
+
+        Parameters
+        ----------
+        node: int
+            The node index.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        indptr, indices, _ = self._compressed_adj(by_src=False)
+        return indices[indptr[node]:indptr[node + 1]]
+
+    # Subgraph extraction and sampling
+    def _check_nodes(self, nodes) -> np.ndarray:
+        nodes = to_index_array(nodes)
+        if len(nodes) > 0 and (nodes.min() < 0 or nodes.max() >= self.get_node_num()):
+            bad = nodes[(nodes < 0) | (nodes >= self.get_node_num())][0]
+            raise NodeNotFoundException('Node {} does not exist in the graph.'.format(bad))
+        return nodes
+
+    def _gather_adj(self, nodes: np.ndarray, by_src: bool = True):
+        """
+        Gather the edges of `nodes` from the cached CSR (CSC) structure, without touching other rows.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            ``(rows, neighbors, eids)``: for every gathered edge, the position in `nodes` of its
+            source (target), its other endpoint and its id.
+        """
+        indptr, indices, eids = self._compressed_adj(by_src=by_src)
+        starts = indptr[nodes]
+        counts = indptr[nodes + 1] - starts
+        offsets = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum(), dtype=np.int64) + np.repeat(starts - offsets, counts)
+        return np.repeat(np.arange(len(nodes), dtype=np.int64), counts), indices[positions], eids[positions]
+
+    def _build_subgraph(self, nodes: np.ndarray, eids: np.ndarray, endpoints: tuple = None) -> 'SubGraphData':
+        """
+        Build the subgraph made of `nodes` (in this order) and the edges `eids`, whose endpoints must be in `nodes`.
+        The edges can be given other `endpoints` than their own, as a ``(src, tgt)`` pair of arrays of node ids.
+        """
+        sub = SubGraphData()
+        sub._parent_node_ids = nodes
+        sub._parent_edge_ids = eids
+        sub.graph_attributes = dict(self.graph_attributes)
+
+        # 1. nodes and node attributes
+        sub._node_attributes = self._node_attributes.take(nodes)
+        # 2. edges, relabeled to the positions of their endpoints in `nodes`, and edge attributes
+        order = np.argsort(nodes, kind='stable')
+        sorted_nodes = nodes[order]
+        for i, (buf, field) in enumerate(zip(sub._edge_indices, EdgeIndex._fields)):
+            ends = getattr(self._edge_indices, field).data[eids] if endpoints is None else endpoints[i]
+            buf.extend(order[np.searchsorted(sorted_nodes, ends)])
+        sub._edge_attributes = self._edge_attributes.take(eids)
+        # 3. node and edge features, gathered with tensor indexing so that gradients flow back to the parent
+        for features, sub_features, index in ((self._node_features, sub._node_features, nodes),
+                                              (self._edge_features, sub._edge_features, eids)):
+            index = torch.from_numpy(index)
+            for key, feat in features.items():
+                sub_features[key] = None if feat is None else FeatureBuffer(feat.data[index.to(feat.data.device)])
+        return sub
+
+    def subgraph(self, nodes) -> 'SubGraphData':
+        """
+        Extract the subgraph induced by `nodes`, i.e. the nodes and all the edges between them.
+
+        The edges are gathered from the cached CSR structure, so the cost depends on the degree of
+        `nodes` rather than on the size of the graph.
+
+        Parameters
+        ----------
+        nodes: list or numpy.ndarray or torch.Tensor
+            The distinct nodes of the subgraph. Node ``i`` of the subgraph is ``nodes[i]``.
+
+        Returns
+        -------
+        SubGraphData
+            The subgraph with its features and attributes, whose ``parent_node_ids`` and ``parent_edge_ids``
+            map its nodes and edges back to this graph.
+
+        Raises
+        ------
+        NodeNotFoundException
+            If one of the nodes does not exist.
+        """
+        nodes = self._check_nodes(nodes)
+        assert len(np.unique(nodes)) == len(nodes), 'The nodes of a subgraph must be distinct.'
+        _, neighbors, eids = self._gather_adj(nodes, by_src=True)
+        sorted_nodes = np.sort(nodes)
+        positions = np.minimum(np.searchsorted(sorted_nodes, neighbors), max(len(nodes) - 1, 0))
+        eids = np.sort(eids[sorted_nodes[positions] == neighbors]) if len(nodes) > 0 else eids
+        return self._build_subgraph(nodes, eids)
+
+    def edge_subgraph(self, edges) -> 'SubGraphData':
+        """
+        Extract the subgraph made of `edges` and their endpoints.
+
+        Parameters
+        ----------
+        edges: list or numpy.ndarray or torch.Tensor
+            The edges of the subgraph. Edge ``i`` of the subgraph is ``edges[i]``.
+
+        Returns
+        -------
+        SubGraphData
+            The subgraph, whose nodes are the endpoints of `edges` in increasing order.
+
+        Raises
+        ------
+        EdgeNotFoundException
+            If one of the edges does not exist.
+        """
+        eids = to_index_array(edges)
+        if len(eids) > 0 and (eids.min() < 0 or eids.max() >= self.get_edge_num()):
+            bad = eids[(eids < 0) | (eids >= self.get_edge_num())][0]
+            raise EdgeNotFoundException('Edge {} does not exist in the graph.'.format(bad))
+        nodes = np.unique(np.concatenate((self._edge_indices.src.data[eids], self._edge_indices.tgt.data[eids])))
+        return self._build_subgraph(nodes, eids)
+
+    def khop_in_subgraph(self, seeds, k: int) -> 'SubGraphData':
+        """
+        Extract the subgraph induced by the nodes from which `seeds` can be reached in at most `k` hops.
+
+        The neighborhood is expanded one hop at a time with the cached CSC structure.
+
+        Parameters
+        ----------
+        seeds: int or list or numpy.ndarray or torch.Tensor
+            The seed nodes.
+        k: int
+            The number of hops.
+
+        Returns
+        -------
+        SubGraphData
+            The subgraph. Its first nodes are the distinct seeds in their given order, followed by the
+            nodes reached in 1 hop, 2 hops, ...
+        """
+        assert k >= 0, 'The number of hops must be non-negative.'
+        nodes = _unique_in_order(self._check_nodes(seeds))
+        frontier = nodes
+        visited = np.sort(nodes)
+        for _ in range(k):
+            if len(frontier) == 0:
+                break
+            _, neighbors, _ = self._gather_adj(frontier, by_src=False)
+            frontier = np.setdiff1d(neighbors, visited)
+            nodes = np.concatenate((nodes, frontier))
+            visited = np.union1d(visited, frontier)
+        return self.subgraph(nodes)
+
+    def sample_neighbors(self, seeds, fanout: int, edge_dir: str = 'in', weight: str = None) -> 'SubGraphData':
+        """
+        Sample at most `fanout` edges of every seed node, without replacement.
+
+        The edges are sampled uniformly at random, or, when `weight` is given, the `fanout` edges
+        of largest weight are kept (top-k). All the seeds are sampled together with one sort of
+        their candidate edges from the cached CSR (CSC) structure.
+
+        Parameters
+        ----------
+        seeds: int or list or numpy.ndarray or torch.Tensor
+            The seed nodes.
+        fanout: int
+            The maximum number of edges sampled per seed.
+        edge_dir: str, optional
+            ``'in'`` to sample the in-edges of the seeds, ``'out'`` for their out-edges. Default: ``'in'``.
+        weight: str, optional
+            The name of a 1-D edge feature used for top-k sampling, default: ``None`` for uniform sampling.
+
+        Returns
+        -------
+        SubGraphData
+            The subgraph made of the sampled edges. Its first nodes are the distinct seeds in their given
+            order, followed by the sampled neighbors.
+        """
+        assert edge_dir in ('in', 'out'), "Unknown edge direction `{}'.".format(edge_dir)
+        assert fanout >= 0, 'The fanout must be non-negative.'
+        seeds = _unique_in_order(self._check_nodes(seeds))
+        rows, neighbors, eids = self._gather_adj(seeds, by_src=edge_dir == 'out')
+
+        if weight is None:
+            keys = np.random.rand(len(eids))
+        else:
+            values = self._edge_features[weight].data
+            assert values.dim() == 1, "Edge feature `{}' is not 1-dimensional.".format(weight)
+            keys = -values.detach().cpu().numpy()[eids]
+        # Sort the candidates of every seed by key, and keep the first `fanout` of them
+        order = np.lexsort((keys, rows))
+        rows, neighbors, eids = rows[order], neighbors[order], eids[order]
+        starts = np.searchsorted(rows, rows, side='left')
+        keep = np.arange(len(rows)) - starts < fanout
+        neighbors, eids = neighbors[keep], np.sort(eids[keep])
+
+        nodes = np.concatenate((seeds, np.setdiff1d(neighbors, seeds)))
+        return self._build_subgraph(nodes, eids)
+
+    def contract_nodes(self, nodes) -> 'SubGraphData':
+        """
+        Remove pass-through `nodes`, i.e. nodes with exactly one in-edge and one out-edge, and bypass them.
+
+        Every chain ``u -> n1 -> ... -> nk -> v`` of removed nodes between two kept nodes is replaced by an
+        edge ``u -> v``, which takes the attributes and features of the edge ``u -> n1``. Chains closed on
+        themselves are dropped. The chains are resolved by pointer jumping on the degree arrays, so the cost
+        is linear in the size of the graph (times the logarithm of the longest chain).
+
+        Parameters
+        ----------
+        nodes: list or numpy.ndarray or torch.Tensor
+            The nodes to be removed.
+
+        Returns
+        -------
+        SubGraphData
+            The compacted graph. Its ``parent_node_ids`` map its nodes back to the nodes of this graph, and its
+            ``parent_edge_ids`` map its edges to the edges they were made from.
+
+        Raises
+        ------
+        NodeNotFoundException
+            If one of the nodes does not exist.
+        """
+        nodes = self._check_nodes(nodes)
+        num_nodes = self.get_node_num()
+        removed = np.zeros(num_nodes, dtype=bool)
+        removed[nodes] = True
+        assert (self.in_degrees()[removed] == 1).all() and (self.out_degrees()[removed] == 1).all(), \
+            'Only nodes with one in-edge and one out-edge can be contracted.'
+
+        # Point every removed node to its successor and every kept node to itself, then double the pointers
+        # until they all reach a kept node. Chains are at most `num_nodes` long, so pointers still on removed
+        # nodes after that many steps are on cycles.
+        src, tgt = self._edge_indices.src.data, self._edge_indices.tgt.data
+        exit_node = np.arange(num_nodes, dtype=np.int64)
+        exit_node[src[removed[src]]] = tgt[removed[src]]
+        for _ in range(num_nodes.bit_length()):
+            if not removed[exit_node].any():
+                break
+            exit_node = exit_node[exit_node]
+
+        # Keep the edges leaving kept nodes, redirected to the end of the chain they enter
+        eids = np.flatnonzero(~removed[src])
+        new_tgt = exit_node[tgt[eids]]
+        valid = ~removed[new_tgt]
+        eids, new_tgt = eids[valid], new_tgt[valid]
+        return self._build_subgraph(np.flatnonzero(~removed), eids, endpoints=(src[eids], new_tgt))
 
     def union(self, graph):
         """
@@ -549,42 +1100,171 @@ class GraphData(object):
         old_edge_num = self.get_edge_num()
 
         # Append information to current graph
-        # 1. add nodes
-        self.add_nodes(graph.get_node_num())
+        # 1. add nodes and their attributes
+        self._append_nodes(graph.get_node_num(), graph._node_attributes)
 
         # 2. add node features
         append_node_st_idx = old_node_num
         append_node_ed_idx = self.get_node_num()
-        for feat_name in graph.node_features.keys():
-            if self.node_features[feat_name] is None:
+        for feat_name, feat in graph._node_features.items():
+            if self._node_features[feat_name] is None or feat is None:
                 continue
-            self.node_features[feat_name][append_node_st_idx:append_node_ed_idx] = graph.node_features[feat_name]
-
-        # 3. add node attributes
-        for node_idx in range(append_node_st_idx, append_node_ed_idx):
-            self.node_attributes[node_idx] = graph.node_attributes[node_idx - append_node_st_idx]
+            self._node_features[feat_name].data[append_node_st_idx:append_node_ed_idx] = feat.data
 
-        # 4. add edges
-        for (src, tgt) in graph.edges():
-            self.add_edge(src + old_node_num, tgt + old_node_num)
+        # 3. add edges and their attributes
+        self._append_edges(graph._edge_indices.src.data + old_node_num,
+                           graph._edge_indices.tgt.data + old_node_num,
+                           graph._edge_attributes)
 
-        # 5. add edge features
+        # 4. add edge features
         append_edge_st_idx = old_edge_num
         append_edge_ed_idx = self.get_edge_num()
-        for feat_name in graph.edge_features.keys():
-            if self.edge_features[feat_name] is None:
+        for feat_name, feat in graph._edge_features.items():
+            if self._edge_features[feat_name] is None or feat is None:
                 continue
-            self.edge_features[feat_name][append_edge_st_idx:append_edge_ed_idx] = graph.edge_features[feat_name]
+            self._edge_features[feat_name].data[append_edge_st_idx:append_edge_ed_idx] = feat.data
 
-        # 6. add edge attributes
-        for edge_idx in range(append_edge_st_idx, append_edge_ed_idx):
-            self.edge_attributes[edge_idx] = graph.edge_attributes[edge_idx - append_edge_st_idx]
 
+class BatchedGraphData(GraphData):
+    """
+    A batch of graphs stored as one large graph made of disjoint components.
 
-def to_batch(graphs: list = None) -> GraphData:
+    Besides the data of the large graph, the batch keeps the number of nodes and edges of every graph.
+    The nodes (edges) of the ``i``-th graph are the contiguous range
+    ``node_offsets[i]:node_offsets[i + 1]`` (``edge_offsets[i]:edge_offsets[i + 1]``) of the large graph.
+    Use ``to_batch`` to build a batch and ``from_batch`` to split it back into graphs.
+    """
+
+    def __init__(self):
+        super(BatchedGraphData, self).__init__()
+        self._batch_num_nodes = np.zeros(0, dtype=np.int64)
+        self._batch_num_edges = np.zeros(0, dtype=np.int64)
+        self._batch_graph_attributes = []
+
+    @property
+    def batch_size(self) -> int:
+        return len(self._batch_num_nodes)
+
+    @property
+    def batch_num_nodes(self) -> np.ndarray:
+        """
+        The number of nodes of every graph in the batch.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return self._batch_num_nodes
+
+    @property
+    def batch_num_edges(self) -> np.ndarray:
+        """
+        The number of edges of every graph in the batch.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return self._batch_num_edges
+
+    @property
+    def node_offsets(self) -> np.ndarray:
+        """
+        The index of the first node of every graph, followed by the total number of nodes.
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of ``batch_size + 1`` elements.
+        """
+        return np.concatenate(([0], np.cumsum(self._batch_num_nodes)))
+
+    @property
+    def edge_offsets(self) -> np.ndarray:
+        """
+        The index of the first edge of every graph, followed by the total number of edges.
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of ``batch_size + 1`` elements.
+        """
+        return np.concatenate(([0], np.cumsum(self._batch_num_edges)))
+
+    @property
+    def batch(self) -> np.ndarray:
+        """
+        The index of the graph every node belongs to.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.repeat(np.arange(self.batch_size), self._batch_num_nodes)
+
+
+class SubGraphData(GraphData):
+    """
+    A graph extracted from a parent graph, e.g. by ``GraphData.subgraph`` or ``GraphData.sample_neighbors``.
+
+    Besides its own data, the subgraph keeps the ids in the parent graph of its nodes and edges.
+    """
+
+    def __init__(self):
+        super(SubGraphData, self).__init__()
+        self._parent_node_ids = np.zeros(0, dtype=np.int64)
+        self._parent_edge_ids = np.zeros(0, dtype=np.int64)
+
+    @property
+    def parent_node_ids(self) -> np.ndarray:
+        """
+        The id in the parent graph of every node of the subgraph.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return self._parent_node_ids
+
+    @property
+    def parent_edge_ids(self) -> np.ndarray:
+        """
+        The id in the parent graph of every edge of the subgraph.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return self._parent_edge_ids
+
+
+def _unique_in_order(array: np.ndarray) -> np.ndarray:
+    _, first = np.unique(array, return_index=True)
+    return array[np.sort(first)]
+
+
+def _concat_features(features: list, kind: str):
+    ret = dict()
+    for feat_dict in features:
+        for key in feat_dict.keys():
+            ret[key] = None
+    for key in ret.keys():
+        feats = [feat_dict.get(key) for feat_dict in features]
+        if all(feat is None for feat in feats):
+            continue
+        if any(feat is None for feat in feats):
+            raise SizeMismatchException('{} feature `{}\' is missing in some graphs of the batch.'.format(kind, key))
+        ret[key] = FeatureBuffer(torch.cat([feat.data for feat in feats], dim=0))
+    return ret
+
+
+def to_batch(graphs: list = None) -> BatchedGraphData:
     """
     Convert a list of GraphData to a large graph (a batch).
 
+    The graphs are left untouched. Every feature and every attribute column is concatenated once
+    and the edge indices are shifted by the node offset of their graph in one vectorized operation.
+
     Parameters
     ----------
     graphs: list of GraphData
@@ -592,56 +1272,73 @@ def to_batch(graphs: list = None) -> GraphData:
 
     Returns
     -------
-    GraphData
+    BatchedGraphData
         The large graph containing all the graphs in the batch.
     """
-    batch = graphs[0]
-    batch.batch = [0] * graphs[0].get_node_num()
-    for i in range(1, len(graphs)):
-        batch.union(graphs[i])
-        batch.batch += [i] * graphs[i].get_node_num()
+    batch = BatchedGraphData()
+    batch._batch_num_nodes = np.array([g.get_node_num() for g in graphs], dtype=np.int64)
+    batch._batch_num_edges = np.array([g.get_edge_num() for g in graphs], dtype=np.int64)
+    batch._batch_graph_attributes = [g.graph_attributes for g in graphs]
+
+    # 1. nodes and node attributes
+    batch._node_attributes = AttributeTable.concat([g._node_attributes for g in graphs])
+
+    # 2. edges and edge attributes
+    node_shift = np.repeat(batch.node_offsets[:-1], batch._batch_num_edges)
+    for buf, field in zip(batch._edge_indices, EdgeIndex._fields):
+        buf.extend(np.concatenate([getattr(g._edge_indices, field).data for g in graphs] + [np.zeros(0, np.int64)])
+                   + node_shift)
+    batch._edge_attributes = AttributeTable.concat([g._edge_attributes for g in graphs])
+
+    # 3. node and edge features
+    batch._node_features = _concat_features([g._node_features for g in graphs], 'Node')
+    batch._edge_features = _concat_features([g._edge_features for g in graphs], 'Edge')
     return batch
 
 
-def from_batch(batch) -> list:
-    def rindex(mylist, myvalue):
-        return len(mylist) - mylist[::-1].index(myvalue) - 1
+def from_batch(batch: BatchedGraphData) -> list:
+    """
+    Split a batch into the list of graphs it was built from.
+
+    The features of the returned graphs are views (slices) of the batch features, so no feature
+    data is copied and gradients flow back to the batch.
 
+    Parameters
+    ----------
+    batch: BatchedGraphData
+        The batch to be split
+
+    Returns
+    -------
+    list of GraphData
+        The graphs in the batch.
+    """
+    assert batch._batch_num_nodes.sum() == batch.get_node_num() and \
+        batch._batch_num_edges.sum() == batch.get_edge_num(), 'The batch has been modified after batching.'
+
+    node_offsets = batch.node_offsets.tolist()
+    edge_offsets = batch.edge_offsets.tolist()
+    src = batch._edge_indices.src.data
+    tgt = batch._edge_indices.tgt.data
     graphs = []
-    batch_size = max(batch.batch) + 1
-    for idx in range(batch_size):
+    for idx in range(batch.batch_size):
+        node_st_idx, node_ed_idx = node_offsets[idx], node_offsets[idx + 1]
+        edge_st_idx, edge_ed_idx = edge_offsets[idx], edge_offsets[idx + 1]
         g = GraphData()
-        node_st_idx = batch.batch.index(idx)
-        node_ed_idx = rindex(batch.batch, idx) + 1
-        # 1. add nodes
-        g.add_nodes(node_ed_idx - node_st_idx)
-        # 2. add node features
-        for feat_name in batch.node_features.keys():
-            if batch.node_features[feat_name] is None:
-                continue
-            else:
-                g.node_features[feat_name] = batch.node_features[feat_name][node_st_idx:node_ed_idx]
-        # 3. add node attributes
-        for i in range(node_st_idx, node_ed_idx):
-            g.node_attributes[i - node_st_idx] = batch.node_attributes[i]
-        # 4. add edges
-        batch_edges = batch.edges()
-        edge_idx = []
-        for i in range(len(batch_edges)):
-            edge = batch_edges[i]
-            if edge[0] in range(node_st_idx, node_ed_idx) and edge[1] in range(node_st_idx, node_ed_idx):
-                edge_idx.append(i)
-                g.add_edge(edge[0] - node_st_idx, edge[1] - node_st_idx)
-        edge_st_idx = min(edge_idx)
-        edge_ed_idx = max(edge_idx) + 1
-        # 5. add edge features
-        for feat_name in batch.edge_features.keys():
-            if batch.edge_features[feat_name] is None:
-                continue
-            else:
-                g.edge_features[feat_name] = batch.edge_features[feat_name][node_st_idx:node_ed_idx]
-        # 6. add edge attributes
-        for i in range(edge_st_idx, edge_ed_idx):
-            g.edge_attributes[i - edge_st_idx] = batch.edge_attributes[i]
+        # 1. nodes and node attributes
+        g._node_attributes = batch._node_attributes.take(slice(node_st_idx, node_ed_idx))
+        # 2. edges and edge attributes
+        g._edge_indices.src.extend(src[edge_st_idx:edge_ed_idx] - node_st_idx)
+        g._edge_indices.tgt.extend(tgt[edge_st_idx:edge_ed_idx] - node_st_idx)
+        g._edge_attributes = batch._edge_attributes.take(slice(edge_st_idx, edge_ed_idx))
+        # 3. node and edge features
+        for feat_name, feat in batch._node_features.items():
+            g._node_features[feat_name] = None if feat is None else \
+                FeatureBuffer(feat.data[node_st_idx:node_ed_idx])
+        for feat_name, feat in batch._edge_features.items():
+            g._edge_features[feat_name] = None if feat is None else \
+                FeatureBuffer(feat.data[edge_st_idx:edge_ed_idx])
+        if idx < len(batch._batch_graph_attributes):
+            g.graph_attributes = batch._batch_graph_attributes[idx]
         graphs.append(g)
     return graphs
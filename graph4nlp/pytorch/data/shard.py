@@ -0,0 +1,511 @@
+# Binary on-disk format for corpora of GraphData
+#
+# A shard is a directory holding one flat binary file per array of the graphs it contains:
+#
+# * ``node_offsets.bin`` / ``edge_offsets.bin``: int64 arrays of ``num_graphs + 1`` elements. The nodes
+#   (edges) of the ``i``-th graph are the rows ``offsets[i]:offsets[i + 1]`` of every node (edge) array.
+# * ``edge_src.bin`` / ``edge_tgt.bin``: int64 edge endpoints, numbered locally within their graph.
+# * ``{node,edge}_feature_<k>.bin``: the rows of every feature, in the dtype and row shape of the tensor.
+# * ``{node,edge}_attr_<k>.*``: one attribute column, stored as a ``.present`` bool mask and either a
+#   ``.values`` typed array (bool, int64, float64) or ``.offsets`` + ``.blob`` (pickled values, for
+#   strings, lists, ``None``, ...). A typed column promoted to the object layout is written to new files,
+#   ``{node,edge}_attr_<k>.obj.*``, and its typed files are only removed once ``meta.json`` points to them.
+# * ``graph_attr.*``: the pickled ``graph_attributes`` of every graph, stored like an attribute column.
+# * ``meta.json``: the number of graphs, nodes and edges, and the schema of the features and attributes.
+#
+# Files are only ever appended to, so a shard is written incrementally by ``GraphShardWriter``.
+# ``GraphShardReader`` maps the files with ``numpy.memmap`` and only reads the rows of the requested graphs.
+import base64
+import json
+import os
+import pickle
+
+import numpy as np
+import torch
+
+from .data import BatchedGraphData, EdgeIndex, GraphData
+from .storage import AttributeTable, FeatureBuffer
+from .utils import SizeMismatchException
+
+SHARD_FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+_KINDS = ('node', 'edge')
+
+
+def _encode_object(value) -> str:
+    return base64.b64encode(pickle.dumps(value)).decode('ascii')
+
+
+def _decode_object(text: str):
+    return pickle.loads(base64.b64decode(text.encode('ascii')))
+
+
+def _open_array(path: str, dtype, num_rows: int, row_shape=()) -> np.ndarray:
+    """
+    Map the first `num_rows` rows of a binary array file in read-only mode.
+    """
+    shape = (num_rows,) + tuple(row_shape)
+    if num_rows == 0 or int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+class _ArrayFile(object):
+    """
+    An append-only binary file of fixed-size rows.
+
+    Opening the file truncates it to `num_rows` rows, which drops what was written after the last
+    completed flush of the shard.
+    """
+
+    def __init__(self, path: str, dtype, row_shape=(), num_rows: int = 0):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.num_rows = num_rows
+        self._file = open(path, 'ab')
+        self._file.truncate(num_rows * self.row_bytes)
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dtype.itemsize * int(np.prod(self.row_shape))
+
+    def append(self, array: np.ndarray):
+        array = np.ascontiguousarray(array, dtype=self.dtype)
+        self._file.write(array.tobytes())
+        self.num_rows += array.shape[0] if array.ndim > 0 else 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ColumnWriter(object):
+    """
+    Writer of one attribute column.
+
+    The column keeps the typed layout of the first values written to it, and is rewritten once
+    with the object layout when a value of another type shows up. The rewritten column goes to new
+    files, so that the files of the last flushed meta file stay intact until the next flush.
+    """
+
+    def __init__(self, prefix: str, dtype, num_rows: int = 0, num_bytes: int = 0):
+        self.prefix = prefix
+        self.dtype = np.dtype(dtype)
+        self._stale_paths = []
+        self._present = _ArrayFile(prefix + '.present', bool, num_rows=num_rows)
+        if self.dtype == object:
+            self._values = None
+            self._offsets = _ArrayFile(prefix + '.offsets', np.int64, num_rows=num_rows)
+            self._blob = _ArrayFile(prefix + '.blob', np.uint8, num_rows=num_bytes)
+        else:
+            self._values = _ArrayFile(prefix + '.values', self.dtype, num_rows=num_rows)
+            self._offsets = self._blob = None
+
+    @property
+    def num_rows(self) -> int:
+        return self._present.num_rows
+
+    @property
+    def num_bytes(self) -> int:
+        return 0 if self._blob is None else self._blob.num_rows
+
+    def append(self, values: np.ndarray, present: np.ndarray):
+        if self.dtype != object and values.dtype != self.dtype and present.any():
+            self._promote()
+        if self.dtype == object:
+            chunks = [pickle.dumps(value) if has else b'' for value, has in zip(values.tolist(), present.tolist())]
+            ends = np.cumsum([len(chunk) for chunk in chunks], dtype=np.int64) + self.num_bytes
+            self._offsets.append(ends)
+            self._blob.append(np.frombuffer(b''.join(chunks), dtype=np.uint8))
+        elif values.dtype != self.dtype:
+            self._values.append(np.zeros(len(values), dtype=self.dtype))
+        else:
+            self._values.append(values)
+        self._present.append(present)
+
+    def _promote(self):
+        # Read back what has been written so far, and write it again with the object layout
+        num_rows = self.num_rows
+        for array_file in (self._values, self._present):
+            array_file.flush()
+        values = np.array(_open_array(self._values.path, self.dtype, num_rows)).astype(object)
+        present = np.array(_open_array(self._present.path, bool, num_rows))
+        self._values.close()
+        self._present.close()
+        # The typed files are still those of the meta file on disk, they are removed by `remove_stale_files`
+        self._stale_paths.extend([self._values.path, self._present.path])
+
+        self.prefix += '.obj'
+        self.dtype = np.dtype(object)
+        self._values = None
+        self._present = _ArrayFile(self.prefix + '.present', bool)
+        self._offsets = _ArrayFile(self.prefix + '.offsets', np.int64)
+        self._blob = _ArrayFile(self.prefix + '.blob', np.uint8)
+        self.append(values, present)
+
+    def files(self) -> list:
+        return [f for f in (self._present, self._values, self._offsets, self._blob) if f is not None]
+
+    def remove_stale_files(self):
+        """
+        Remove the files of the typed layout of a promoted column, once the meta file no longer refers to them.
+        """
+        for path in self._stale_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._stale_paths = []
+
+    def meta(self) -> dict:
+        return {'dtype': self.dtype.str if self.dtype != object else 'object', 'num_bytes': self.num_bytes}
+
+
+def _column_dtype(meta: dict) -> np.dtype:
+    return np.dtype(object) if meta['dtype'] == 'object' else np.dtype(meta['dtype'])
+
+
+class GraphShardWriter(object):
+    """
+    Write GraphData to a shard, one graph at a time.
+
+    The features of every graph must have the same names and row shapes as the features of the
+    first graph written to the shard. Attribute columns may appear in any graph.
+
+    Parameters
+    ----------
+    path: str
+        The directory of the shard. It is created if it does not exist.
+    append: bool, optional
+        Whether to append to an existing shard instead of overwriting it, default: ``False``.
+        The graphs written after the last ``flush`` of the existing shard are discarded.
+
+    Examples
+    --------
+    >>> with GraphShardWriter('train.shard') as writer:
+    ...     for graph in graphs:
+    ...         writer.write(graph)
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = None
+        if append and os.path.exists(os.path.join(path, META_FILE)):
+            with open(os.path.join(path, META_FILE)) as f:
+                meta = json.load(f)
+            assert meta['format_version'] == SHARD_FORMAT_VERSION, 'Unsupported shard format version.'
+        num_graphs = meta['num_graphs'] if meta else 0
+        num_rows = {'node': meta['num_nodes'] if meta else 0, 'edge': meta['num_edges'] if meta else 0}
+
+        self._num_graphs = num_graphs
+        self._offsets = {kind: _ArrayFile(self._file('{}_offsets.bin'.format(kind)), np.int64,
+                                          num_rows=num_graphs + 1 if meta else 0) for kind in _KINDS}
+        if meta is None:
+            for offsets in self._offsets.values():
+                offsets.append(np.zeros(1, dtype=np.int64))
+        self._num_rows = num_rows
+        self._edges = EdgeIndex(*[_ArrayFile(self._file('edge_{}.bin'.format(field)), np.int64,
+                                             num_rows=num_rows['edge']) for field in EdgeIndex._fields])
+        self._graph_attributes = _ColumnWriter(self._file('graph_attr'), object, num_graphs,
+                                               meta['graph_attributes']['num_bytes'] if meta else 0)
+
+        # Schema: {kind: {name: (file stem, ...)}}
+        self._features = {kind: dict() for kind in _KINDS}
+        self._attributes = {kind: dict() for kind in _KINDS}
+        self._defaults = {kind: None for kind in _KINDS}
+        if meta is not None:
+            for kind in _KINDS:
+                for feat in meta['features'][kind]:
+                    self._features[kind][feat['name']] = _ArrayFile(
+                        self._file(feat['file'] + '.bin'), feat['dtype'], feat['shape'], num_rows[kind])
+                for attr in meta['attributes'][kind]:
+                    self._attributes[kind][attr['name']] = _ColumnWriter(
+                        self._file(attr['file']), _column_dtype(attr), num_rows[kind], attr['num_bytes'])
+                self._defaults[kind] = _decode_object(meta['defaults'][kind])
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def __len__(self):
+        return self._num_graphs
+
+    def write(self, graph: GraphData):
+        """
+        Append a graph to the shard.
+
+        Parameters
+        ----------
+        graph: GraphData
+            The graph to be written.
+        """
+        sizes = {'node': graph.get_node_num(), 'edge': graph.get_edge_num()}
+        features = {'node': graph._node_features, 'edge': graph._edge_features}
+        tables = {'node': graph._node_attributes, 'edge': graph._edge_attributes}
+
+        # Validate the features against the schema before writing anything
+        for kind in _KINDS:
+            names = [name for name, feat in features[kind].items() if feat is not None]
+            if self._num_graphs == 0 and len(self._features[kind]) == 0:
+                for idx, name in enumerate(names):
+                    data = features[kind][name].data
+                    self._features[kind][name] = _ArrayFile(
+                        self._file('{}_feature_{}.bin'.format(kind, idx)),
+                        torch.zeros(0, dtype=data.dtype).numpy().dtype, data.shape[1:], self._num_rows[kind])
+            elif set(names) != set(self._features[kind].keys()):
+                raise SizeMismatchException('{} features {} do not match the features {} of the shard.'.format(
+                    kind.capitalize(), sorted(names), sorted(self._features[kind].keys())))
+            for name, array_file in self._features[kind].items():
+                if tuple(features[kind][name].data.shape[1:]) != array_file.row_shape:
+                    raise SizeMismatchException('{} feature `{}\' has rows of shape {} instead of {}.'.format(
+                        kind.capitalize(), name, tuple(features[kind][name].data.shape[1:]), array_file.row_shape))
+            if self._defaults[kind] is None:
+                self._defaults[kind] = dict(tables[kind]._defaults)
+
+        # Topology
+        self._edges.src.append(graph._edge_indices.src.data)
+        self._edges.tgt.append(graph._edge_indices.tgt.data)
+        for kind in _KINDS:
+            self._num_rows[kind] += sizes[kind]
+            self._offsets[kind].append(np.array([self._num_rows[kind]], dtype=np.int64))
+
+        # Features and attributes
+        for kind in _KINDS:
+            for name, array_file in self._features[kind].items():
+                array_file.append(features[kind][name].data.detach().cpu().numpy())
+            columns = tables[kind].columns
+            for name, column in columns.items():
+                if name not in self._attributes[kind] and column.present.any():
+                    # A new column, which none of the rows written before have
+                    num_absent = self._num_rows[kind] - sizes[kind]
+                    column_writer = _ColumnWriter(self._file('{}_attr_{}'.format(kind, len(self._attributes[kind]))),
+                                                  column.dtype)
+                    column_writer.append(np.zeros(num_absent, dtype=column.dtype), np.zeros(num_absent, dtype=bool))
+                    self._attributes[kind][name] = column_writer
+            for name, column_writer in self._attributes[kind].items():
+                column = columns.get(name)
+                if column is None:
+                    column_writer.append(np.zeros(sizes[kind], dtype=column_writer.dtype),
+                                         np.zeros(sizes[kind], dtype=bool))
+                else:
+                    column_writer.append(column.values, column.present)
+
+        graph_attributes = np.empty(1, dtype=object)
+        graph_attributes[0] = graph.graph_attributes
+        self._graph_attributes.append(graph_attributes, np.ones(1, dtype=bool))
+        self._num_graphs += 1
+
+    def flush(self):
+        """
+        Flush the written graphs to disk and update the meta file of the shard.
+        """
+        for array_file in self._all_files():
+            array_file.flush()
+        meta = {
+            'format_version': SHARD_FORMAT_VERSION,
+            'num_graphs': self._num_graphs,
+            'num_nodes': self._num_rows['node'],
+            'num_edges': self._num_rows['edge'],
+            'features': {kind: [{'name': name, 'file': os.path.basename(f.path)[:-len('.bin')],
+                                 'dtype': f.dtype.str, 'shape': list(f.row_shape)}
+                                for name, f in self._features[kind].items()] for kind in _KINDS},
+            'attributes': {kind: [dict(name=name, file=os.path.basename(column.prefix), **column.meta())
+                                  for name, column in self._attributes[kind].items()] for kind in _KINDS},
+            'defaults': {kind: _encode_object(self._defaults[kind] or dict()) for kind in _KINDS},
+            'graph_attributes': self._graph_attributes.meta(),
+        }
+        tmp_path = self._file(META_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._file(META_FILE))
+        for column in self._all_columns():
+            column.remove_stale_files()
+
+    def _all_columns(self) -> list:
+        return [self._graph_attributes] + [column for kind in _KINDS for column in self._attributes[kind].values()]
+
+    def _all_files(self) -> list:
+        files = list(self._offsets.values()) + list(self._edges)
+        for kind in _KINDS:
+            files.extend(self._features[kind].values())
+        for column in self._all_columns():
+            files.extend(column.files())
+        return files
+
+    def close(self):
+        """
+        Flush the shard and close its files.
+        """
+        self.flush()
+        for array_file in self._all_files():
+            array_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class GraphShardReader(object):
+    """
+    Read-only, random access to the graphs of a shard.
+
+    The arrays of the shard are memory-mapped, so opening a shard does not read its content, and
+    loading a graph (or a range of graphs) only touches the rows that belong to it.
+
+    Parameters
+    ----------
+    path: str
+        The directory of the shard.
+
+    Examples
+    --------
+    >>> reader = GraphShardReader('train.shard')
+    >>> g = reader[3]                      # GraphData
+    >>> graphs = reader[10:20]             # list of GraphData
+    >>> batch = reader.load_batch(10, 20)  # BatchedGraphData
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        assert meta['format_version'] == SHARD_FORMAT_VERSION, 'Unsupported shard format version.'
+        self._meta = meta
+        self._num_graphs = meta['num_graphs']
+        num_rows = {'node': meta['num_nodes'], 'edge': meta['num_edges']}
+
+        self._offsets = {kind: _open_array(self._file('{}_offsets.bin'.format(kind)), np.int64, self._num_graphs + 1)
+                         for kind in _KINDS}
+        self._edges = EdgeIndex(*[_open_array(self._file('edge_{}.bin'.format(field)), np.int64, num_rows['edge'])
+                                  for field in EdgeIndex._fields])
+        self._features = {kind: {feat['name']: _open_array(self._file(feat['file'] + '.bin'), feat['dtype'],
+                                                           num_rows[kind], feat['shape'])
+                                 for feat in meta['features'][kind]} for kind in _KINDS}
+        self._attributes = {kind: {attr['name']: self._open_column(attr['file'], _column_dtype(attr), num_rows[kind],
+                                                                   attr['num_bytes'])
+                                   for attr in meta['attributes'][kind]} for kind in _KINDS}
+        self._defaults = {kind: _decode_object(meta['defaults'][kind]) for kind in _KINDS}
+        self._graph_attributes = self._open_column('graph_attr', np.dtype(object), self._num_graphs,
+                                                   meta['graph_attributes']['num_bytes'])
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open_column(self, stem: str, dtype: np.dtype, num_rows: int, num_bytes: int) -> tuple:
+        prefix = self._file(stem)
+        present = _open_array(prefix + '.present', bool, num_rows)
+        if dtype == object:
+            return present, _open_array(prefix + '.offsets', np.int64, num_rows), \
+                _open_array(prefix + '.blob', np.uint8, num_bytes)
+        return present, _open_array(prefix + '.values', dtype, num_rows)
+
+    @staticmethod
+    def _read_column(column: tuple, st: int, ed: int) -> tuple:
+        present = np.array(column[0][st:ed])
+        if len(column) == 2:
+            return np.array(column[1][st:ed]), present
+        # Object values are pickled back to back, `offsets` holding the end of every value in the blob
+        base = int(column[1][st - 1]) if st > 0 else 0
+        ends = np.array(column[1][st:ed]) - base
+        starts = np.concatenate(([0], ends[:-1]))
+        data = bytes(column[2][base:base + int(ends[-1])]) if ed > st else b''
+        values = np.empty(ed - st, dtype=object)
+        for idx in np.flatnonzero(present).tolist():
+            values[idx] = pickle.loads(data[starts[idx]:ends[idx]])
+        return values, present
+
+    def __len__(self):
+        return self._num_graphs
+
+    @property
+    def batch_num_nodes(self) -> np.ndarray:
+        """
+        The number of nodes of every graph in the shard.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.diff(self._offsets['node'])
+
+    @property
+    def batch_num_edges(self) -> np.ndarray:
+        """
+        The number of edges of every graph in the shard.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.diff(self._offsets['edge'])
+
+    def _load(self, graph: GraphData, st: int, ed: int) -> GraphData:
+        """
+        Fill an empty `graph` with the graphs ``st:ed`` of the shard, as disjoint components.
+        """
+        node_st, node_ed = int(self._offsets['node'][st]), int(self._offsets['node'][ed])
+        edge_st, edge_ed = int(self._offsets['edge'][st]), int(self._offsets['edge'][ed])
+        rows = {'node': (node_st, node_ed), 'edge': (edge_st, edge_ed)}
+
+        # Edge endpoints are local to their graph, shift them by the node offset within the range
+        node_shift = np.repeat(self._offsets['node'][st:ed] - node_st, np.diff(self._offsets['edge'][st:ed + 1]))
+        graph._edge_indices.src.extend(self._edges.src[edge_st:edge_ed] + node_shift)
+        graph._edge_indices.tgt.extend(self._edges.tgt[edge_st:edge_ed] + node_shift)
+
+        tables, features = dict(), dict()
+        for kind in _KINDS:
+            row_st, row_ed = rows[kind]
+            columns = {name: self._read_column(column, row_st, row_ed)
+                       for name, column in self._attributes[kind].items()}
+            tables[kind] = AttributeTable.from_columns(row_ed - row_st, columns, self._defaults[kind])
+            features[kind] = {name: FeatureBuffer(torch.from_numpy(np.array(array[row_st:row_ed])))
+                              for name, array in self._features[kind].items()}
+        graph._node_attributes, graph._edge_attributes = tables['node'], tables['edge']
+        graph._node_features.update(features['node'])
+        graph._edge_features.update(features['edge'])
+        return graph
+
+    def _graph_attributes_of(self, st: int, ed: int) -> list:
+        return self._read_column(self._graph_attributes, st, ed)[0].tolist()
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[idx] for idx in range(*item.indices(self._num_graphs))]
+        idx = int(item)
+        if idx < 0:
+            idx += self._num_graphs
+        if not 0 <= idx < self._num_graphs:
+            raise IndexError('Graph {} is out of range.'.format(item))
+        graph = self._load(GraphData(), idx, idx + 1)
+        graph.graph_attributes = self._graph_attributes_of(idx, idx + 1)[0]
+        return graph
+
+    def __iter__(self):
+        for idx in range(self._num_graphs):
+            yield self[idx]
+
+    def load_batch(self, start: int, stop: int) -> BatchedGraphData:
+        """
+        Load the graphs ``start:stop`` directly as a batch, reading every array once.
+
+        Parameters
+        ----------
+        start: int
+            The index of the first graph.
+        stop: int
+            The index after the last graph.
+
+        Returns
+        -------
+        BatchedGraphData
+        """
+        assert 0 <= start <= stop <= self._num_graphs, 'The range {}:{} is out of range.'.format(start, stop)
+        batch = self._load(BatchedGraphData(), start, stop)
+        batch._batch_num_nodes = np.array(self.batch_num_nodes[start:stop], dtype=np.int64)
+        batch._batch_num_edges = np.array(self.batch_num_edges[start:stop], dtype=np.int64)
+        batch._batch_graph_attributes = self._graph_attributes_of(start, stop)
+        return batch
@@ -0,0 +1,654 @@
+# Columnar storage primitives used in GraphData
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+import torch
+
+
+class ArrayBuffer(object):
+    """
+    A one-dimensional numpy array supporting amortized O(1) appends.
+
+    The backing array is over-allocated and doubled whenever it runs out of space, so that
+    appending ``n`` elements one at a time costs O(n) in total.
+
+    Parameters
+    ----------
+    dtype: numpy.dtype
+        The element type of the buffer.
+    capacity: int, optional
+        The number of elements to pre-allocate, default: ``0``.
+    """
+
+    def __init__(self, dtype, capacity=0):
+        self._buf = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dtype(self):
+        return self._buf.dtype
+
+    @property
+    def data(self) -> np.ndarray:
+        """
+        A view of the valid part of the buffer. The view is invalidated by the next append.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return self._buf[:self._size]
+
+    def reserve(self, capacity: int):
+        """
+        Make sure the buffer can hold at least `capacity` elements without reallocating.
+
+        Parameters
+        ----------
+        capacity: int
+            The number of elements to be held.
+        """
+        if capacity <= len(self._buf):
+            return
+        new_capacity = max(capacity, 2 * len(self._buf), 8)
+        new_buf = np.empty(new_capacity, dtype=self._buf.dtype)
+        new_buf[:self._size] = self._buf[:self._size]
+        self._buf = new_buf
+
+    def append(self, value):
+        if self._size == len(self._buf):
+            self.reserve(self._size + 1)
+        self._buf[self._size] = value
+        self._size += 1
+
+    def extend(self, values):
+        if not isinstance(values, np.ndarray) or values.dtype != self._buf.dtype:
+            values = np.asarray(values, dtype=self._buf.dtype)
+        values = values.reshape(-1)
+        self.reserve(self._size + len(values))
+        self._buf[self._size:self._size + len(values)] = values
+        self._size += len(values)
+
+    def resize(self, size: int, fill=None):
+        """
+        Grow or shrink the buffer to `size` elements. New elements are set to `fill`.
+        """
+        if size > len(self._buf):
+            self.reserve(size)
+        if size == self._size + 1:
+            self._buf[self._size] = fill
+        elif size > self._size:
+            self._buf[self._size:size] = fill
+        self._size = size
+
+    def astype(self, dtype):
+        """
+        Convert the buffer to another element type in place.
+        """
+        self._buf = self._buf.astype(dtype)
+
+    def __getitem__(self, item):
+        return self.data[item]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+
+_OBJECT_DTYPE = np.dtype(object)
+_COLUMN_DTYPES = {bool: np.dtype(bool), int: np.dtype(np.int64), float: np.dtype(np.float64),
+                  str: _OBJECT_DTYPE, type(None): _OBJECT_DTYPE, list: _OBJECT_DTYPE}
+
+
+def infer_column_dtype(value) -> np.dtype:
+    """
+    Infer the narrowest column type able to hold `value`.
+
+    Booleans, integers and floats are stored in typed numpy columns. Everything else (strings,
+    lists, ``None``, ...) goes to an object column.
+    """
+    dtype = _COLUMN_DTYPES.get(type(value))
+    if dtype is not None:
+        return dtype
+    elif isinstance(value, (bool, np.bool_)):
+        return np.dtype(bool)
+    elif isinstance(value, (int, np.integer)):
+        return np.dtype(np.int64)
+    elif isinstance(value, (float, np.floating)):
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+
+def to_column_array(values) -> np.ndarray:
+    """
+    Convert a sequence of attribute values to a one-dimensional array, typed when possible.
+
+    Unlike ``numpy.asarray``, nested sequences (e.g. token lists) are kept as single objects
+    instead of being broadcast into extra dimensions.
+    """
+    if isinstance(values, np.ndarray) and values.ndim == 1:
+        return values if values.dtype.kind in 'biufO' else values.astype(object)
+    values = list(values)
+    dtypes = set(infer_column_dtype(v) for v in values)
+    if len(dtypes) == 1 and np.dtype(object) not in dtypes:
+        return np.array(values, dtype=dtypes.pop())
+    ret = np.empty(len(values), dtype=object)
+    for idx, value in enumerate(values):
+        ret[idx] = value
+    return ret
+
+
+class AttributeColumn(object):
+    """
+    A single attribute column.
+
+    The column type is fixed by the first value written to it. Values are then kept in a typed
+    numpy array while they are homogeneous, and the column is promoted to an object column as soon
+    as a value of another type is written. A separate mask records which rows have the attribute.
+
+    Parameters
+    ----------
+    num_rows: int
+        The number of rows of the column.
+    default: object, optional
+        The value held by newly added rows, default: ``None``.
+    has_default: bool, optional
+        Whether newly added rows hold `default`. Otherwise they don't have the attribute.
+        Default: ``False``.
+    """
+
+    def __init__(self, num_rows, default=None, has_default=False):
+        self._default = default
+        self._has_default = has_default
+        self._typed = has_default
+        self._values = ArrayBuffer(infer_column_dtype(default) if has_default else np.dtype(object))
+        self._present = ArrayBuffer(bool)
+        self.resize(num_rows)
+
+    def __len__(self):
+        return len(self._present)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._values.dtype
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values.data
+
+    @property
+    def present(self) -> np.ndarray:
+        return self._present.data
+
+    def resize(self, num_rows: int):
+        self._values.resize(num_rows, self._default if self._has_default else self._empty_value())
+        self._present.resize(num_rows, self._has_default)
+
+    def _empty_value(self):
+        return None if self._values.dtype == object else 0
+
+    def _retype(self, dtype):
+        # Only called before anything is written, so the content can be discarded.
+        self._values = ArrayBuffer(dtype, len(self))
+        self._values.resize(len(self._present), self._empty_value())
+
+    def _accept(self, dtype):
+        if not self._typed:
+            if dtype != self._values.dtype:
+                self._retype(dtype)
+            self._typed = True
+        elif dtype != self._values.dtype and self._values.dtype != object:
+            self._values.astype(object)
+
+    # The row-level accessors below are called with rows already checked by the owning table.
+    def has(self, row: int) -> bool:
+        return bool(self._present._buf[row])
+
+    def get(self, row: int):
+        value = self._values._buf[row]
+        if self._values._buf.dtype.kind != 'O':
+            value = value.item()
+        return value
+
+    def set(self, row: int, value):
+        dtype = infer_column_dtype(value)
+        if not self._typed or dtype is not self._values._buf.dtype:
+            self._accept(dtype)
+        self._values._buf[row] = value
+        self._present._buf[row] = True
+
+    def delete(self, row: int):
+        self._values._buf[row] = self._empty_value()
+        self._present._buf[row] = False
+
+    def extend(self, values, present=None):
+        """
+        Append a batch of rows to the column.
+
+        Parameters
+        ----------
+        values: list or numpy.ndarray
+            The values of the new rows.
+        present: numpy.ndarray, optional
+            Whether each new row has the attribute, default: ``None`` (all present).
+        """
+        values = to_column_array(values)
+        if present is None or present.any():
+            self._accept(values.dtype)
+        if values.dtype != self._values.dtype:
+            values = values.astype(self._values.dtype) if self._values.dtype == object else \
+                np.full(len(values), self._empty_value(), dtype=self._values.dtype)
+        self._values.extend(values)
+        if present is None:
+            self._present.resize(len(self._present) + len(values), True)
+        else:
+            self._present.extend(present)
+
+    def take(self, rows) -> 'AttributeColumn':
+        """
+        Create a new column from the selected `rows` (an index array or a slice).
+        """
+        ret = AttributeColumn(0, self._default, self._has_default)
+        ret._typed = self._typed
+        ret._values = ArrayBuffer(self._values.dtype)
+        ret._values.extend(self.values[rows])
+        ret._present.extend(self.present[rows])
+        return ret
+
+    @classmethod
+    def concat(cls, columns: list, lengths: list) -> 'AttributeColumn':
+        """
+        Concatenate columns into a new one. A ``None`` column stands for `length` rows without the attribute.
+
+        Parameters
+        ----------
+        columns: list of AttributeColumn or None
+            The columns to be concatenated.
+        lengths: list of int
+            The number of rows of each column.
+
+        Returns
+        -------
+        AttributeColumn
+        """
+        template = next(column for column in columns if column is not None)
+        typed = [column for column in columns if column is not None and column._typed]
+        dtypes = set(column.dtype for column in typed)
+        dtype = dtypes.pop() if len(dtypes) == 1 else np.dtype(object)
+        empty = None if dtype == object else 0
+
+        values, present = [], []
+        for column, length in zip(columns, lengths):
+            if column is None or (not column._typed and column.dtype != dtype):
+                values.append(np.full(length, empty, dtype=dtype))
+                present.append(np.zeros(length, dtype=bool) if column is None else column.present)
+            else:
+                values.append(column.values.astype(dtype, copy=False))
+                present.append(column.present)
+
+        ret = cls(0, template._default, template._has_default)
+        ret._typed = len(typed) > 0
+        ret._values = ArrayBuffer(dtype)
+        ret._values.extend(np.concatenate(values) if values else np.empty(0, dtype=dtype))
+        ret._present.extend(np.concatenate(present) if present else np.empty(0, dtype=bool))
+        return ret
+
+
+class AttributeTable(object):
+    """
+    Columnar storage of per-element attributes, with one column per attribute name.
+
+    Parameters
+    ----------
+    defaults: dict, optional
+        Attributes (and their values) that every newly added row holds, default: ``None``.
+    """
+
+    def __init__(self, defaults: dict = None):
+        self._defaults = dict(defaults) if defaults is not None else dict()
+        self._num_rows = 0
+        self._columns = dict()
+        for name, value in self._defaults.items():
+            self._columns[name] = AttributeColumn(0, value, has_default=True)
+
+    def __len__(self):
+        return self._num_rows
+
+    @property
+    def columns(self) -> dict:
+        return self._columns
+
+    def add_rows(self, num_rows: int):
+        self._num_rows += num_rows
+        for column in self._columns.values():
+            column.resize(self._num_rows)
+
+    def column(self, name, create=False) -> AttributeColumn:
+        if name not in self._columns:
+            if not create:
+                return None
+            self._columns[name] = AttributeColumn(self._num_rows)
+        return self._columns[name]
+
+    def get(self, row: int, name):
+        column = self._columns.get(name)
+        if column is None or not column.has(row):
+            raise KeyError(name)
+        return column.get(row)
+
+    def set(self, row: int, name, value):
+        if not 0 <= row < self._num_rows:
+            raise IndexError('Row {} is out of range.'.format(row))
+        column = self._columns.get(name)
+        if column is None:
+            column = self.column(name, create=True)
+        column.set(row, value)
+
+    def delete(self, row: int, name):
+        column = self._columns.get(name)
+        if column is None or not column.has(row):
+            raise KeyError(name)
+        column.delete(row)
+
+    def row_keys(self, row: int) -> list:
+        return [name for name, column in self._columns.items() if column.has(row)]
+
+    def row_dict(self, row: int) -> dict:
+        return {name: column.get(row) for name, column in self._columns.items() if column.has(row)}
+
+    def replace_row(self, row: int, values: Mapping):
+        for name in self.row_keys(row):
+            self._columns[name].delete(row)
+        for name, value in values.items():
+            self.set(row, name, value)
+
+    def extend(self, other: 'AttributeTable'):
+        """
+        Append all rows of another table to this one.
+        """
+        old_num_rows = self._num_rows
+        num_new = len(other)
+        for name, column in other._columns.items():
+            self.column(name, create=True)
+        self._num_rows += num_new
+        for name, column in self._columns.items():
+            other_column = other._columns.get(name)
+            if other_column is None:
+                column.resize(self._num_rows)
+                column.present[old_num_rows:] = False
+            else:
+                column.extend(other_column.values, other_column.present)
+
+    @classmethod
+    def concat(cls, tables: list) -> 'AttributeTable':
+        """
+        Concatenate the rows of several tables into a new table, one concatenation per column.
+
+        Parameters
+        ----------
+        tables: list of AttributeTable
+            The tables to be concatenated.
+
+        Returns
+        -------
+        AttributeTable
+        """
+        ret = cls()
+        if len(tables) == 0:
+            return ret
+        ret._defaults = dict(tables[0]._defaults)
+        lengths = [len(table) for table in tables]
+        ret._num_rows = sum(lengths)
+        names = []
+        for table in tables:
+            names.extend(name for name in table._columns.keys() if name not in names)
+        for name in names:
+            ret._columns[name] = AttributeColumn.concat([table._columns.get(name) for table in tables], lengths)
+        return ret
+
+    @classmethod
+    def from_columns(cls, num_rows: int, columns: dict, defaults: dict = None) -> 'AttributeTable':
+        """
+        Build a table from whole columns.
+
+        Parameters
+        ----------
+        num_rows: int
+            The number of rows of the table.
+        columns: dict
+            Map from attribute name to a ``(values, present)`` pair of arrays of `num_rows` elements.
+        defaults: dict, optional
+            Attributes (and their values) that rows added later hold, default: ``None``.
+
+        Returns
+        -------
+        AttributeTable
+        """
+        ret = cls()
+        ret._defaults = dict(defaults) if defaults is not None else dict()
+        ret._num_rows = num_rows
+        for name, (values, present) in columns.items():
+            has_default = name in ret._defaults
+            column = AttributeColumn(0, ret._defaults.get(name), has_default)
+            column.extend(values, present)
+            ret._columns[name] = column
+        for name, value in ret._defaults.items():
+            if name not in ret._columns:
+                ret._columns[name] = AttributeColumn(num_rows, value, has_default=True)
+        return ret
+
+    def take(self, rows) -> 'AttributeTable':
+        """
+        Create a new table holding the selected `rows` (an index array or a slice).
+        """
+        ret = AttributeTable()
+        ret._defaults = dict(self._defaults)
+        ret._num_rows = len(np.arange(self._num_rows)[rows])
+        for name, column in self._columns.items():
+            ret._columns[name] = column.take(rows)
+        return ret
+
+
+class AttributeRow(MutableMapping):
+    """
+    A dict-like proxy of one row of an ``AttributeTable``. Reads and writes go directly to the columns.
+    """
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: AttributeTable, row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._table.get(self._row, key)
+
+    def __setitem__(self, key, value):
+        self._table.set(self._row, key, value)
+
+    def __delitem__(self, key):
+        self._table.delete(self._row, key)
+
+    def __iter__(self):
+        return iter(self._table.row_keys(self._row))
+
+    def __len__(self):
+        return len(self._table.row_keys(self._row))
+
+    def __contains__(self, key):
+        column = self._table.columns.get(key)
+        return column is not None and column.has(self._row)
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self._table.row_dict(self._row))
+
+
+class AttributeTableView(MutableMapping):
+    """
+    A dict-of-dict view over an ``AttributeTable``, keyed by row index.
+
+    Examples
+    --------
+    >>> table = AttributeTable()
+    >>> table.add_rows(2)
+    >>> attrs = AttributeTableView(table)
+    >>> attrs[0]['token'] = 'hello'
+    >>> attrs[0]
+    {'token': 'hello'}
+    """
+
+    def __init__(self, table: AttributeTable):
+        self._table = table
+
+    def _check_row(self, row):
+        if not isinstance(row, (int, np.integer)) or not 0 <= row < len(self._table):
+            raise KeyError(row)
+
+    def __getitem__(self, row) -> AttributeRow:
+        self._check_row(row)
+        return AttributeRow(self._table, int(row))
+
+    def __setitem__(self, row, value: Mapping):
+        self._check_row(row)
+        self._table.replace_row(int(row), dict(value))
+
+    def __delitem__(self, row):
+        raise NotImplementedError('Rows cannot be deleted from the attribute table.')
+
+    def __iter__(self):
+        return iter(range(len(self._table)))
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, row):
+        return isinstance(row, (int, np.integer)) and 0 <= row < len(self._table)
+
+    def __repr__(self):
+        return repr({row: self._table.row_dict(row) for row in range(len(self._table))})
+
+
+class FeatureBuffer(object):
+    """
+    A feature tensor whose first dimension grows with amortized O(1) cost per row.
+
+    The backing tensor keeps spare zero rows at its end and doubles its capacity when it runs
+    out of them, so that padding the feature of every new node/edge does not copy the whole
+    tensor. The tensor given by the user is used as the initial backing tensor, which keeps
+    its autograd history.
+
+    Parameters
+    ----------
+    tensor: torch.Tensor
+        The initial feature tensor.
+    """
+
+    def __init__(self, tensor: torch.Tensor):
+        self._buf = tensor
+        self._size = tensor.shape[0]
+        self._view = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self) -> torch.Tensor:
+        """
+        The valid rows of the feature. It is the backing tensor itself when there is no spare capacity.
+        The same tensor object is returned until rows are appended.
+
+        Returns
+        -------
+        torch.Tensor
+        """
+        if self._view is None:
+            self._view = self._buf if self._size == self._buf.shape[0] else self._buf[:self._size]
+        return self._view
+
+    def reserve(self, capacity: int):
+        """
+        Make sure the buffer can hold at least `capacity` rows without reallocating.
+        """
+        if capacity <= self._buf.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._buf.shape[0], 8)
+        new_buf = torch.zeros((new_capacity, *self._buf.shape[1:]), dtype=self._buf.dtype, device=self._buf.device)
+        new_buf[:self._size] = self._buf[:self._size]
+        self._buf = new_buf
+        self._view = None
+
+    def extend(self, num_rows: int, values: torch.Tensor = None):
+        """
+        Append `num_rows` rows, filled with `values` or zero-padded.
+
+        Parameters
+        ----------
+        num_rows: int
+            The number of rows to append.
+        values: torch.Tensor, optional
+            The content of the new rows, default: ``None`` for zeros.
+        """
+        self.reserve(self._size + num_rows)
+        if values is not None:
+            self._buf[self._size:self._size + num_rows] = values
+        self._size += num_rows
+        self._view = None
+
+
+class SortedEdgeIndex(object):
+    """
+    A compact ``(src, tgt) -> edge id`` index.
+
+    Every edge is encoded as the int64 key ``src * num_nodes + tgt``. The keys are sorted once, and
+    lookups are answered for whole arrays of endpoints with a binary search. When an edge appears
+    several times, the lookup returns its most recently added id.
+
+    Parameters
+    ----------
+    src: numpy.ndarray
+        The source nodes of the edges.
+    tgt: numpy.ndarray
+        The target nodes of the edges.
+    num_nodes: int
+        The number of nodes of the graph.
+    """
+
+    def __init__(self, src: np.ndarray, tgt: np.ndarray, num_nodes: int):
+        self._num_nodes = max(num_nodes, 1)
+        keys = src * self._num_nodes + tgt
+        self._order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._order]
+
+    def lookup(self, src: np.ndarray, tgt: np.ndarray) -> np.ndarray:
+        """
+        Find the edge ids of the given endpoints.
+
+        Parameters
+        ----------
+        src: numpy.ndarray
+            The source nodes.
+        tgt: numpy.ndarray
+            The target nodes, of the same length as `src`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The edge ids, with ``-1`` for the pairs which are not edges of the graph.
+        """
+        ret = np.full(len(src), -1, dtype=np.int64)
+        if len(self._sorted_keys) == 0:
+            return ret
+        valid = (src >= 0) & (src < self._num_nodes) & (tgt >= 0) & (tgt < self._num_nodes)
+        keys = src[valid] * self._num_nodes + tgt[valid]
+        pos = np.searchsorted(self._sorted_keys, keys, side='right') - 1
+        pos_clipped = np.maximum(pos, 0)
+        found = (pos >= 0) & (self._sorted_keys[pos_clipped] == keys)
+        ret[np.flatnonzero(valid)[found]] = self._order[pos_clipped[found]]
+        return ret
@@ -1,3 +1,4 @@
+import numpy as np
 import torch
 
 
@@ -29,6 +30,29 @@ def slice_to_list(sl, max_len):
     list
         The converted list
     """
+    return list(slice_to_range(sl, max_len))
+
+
+def slice_to_range(sl, max_len):
+    """
+    Turn a slice object into a range, without materializing its elements.
+
+    Unlike ``slice.indices``, the bounds are not clipped to `max_len`, so that out-of-range
+    slices can be detected.
+
+    Parameters
+    ----------
+    sl: slice
+        The slice object
+
+    max_len: int
+        Max length of the iterable
+
+    Returns
+    -------
+    range
+        The converted range
+    """
 
     if sl.start is None:
         start = 0
@@ -49,14 +73,31 @@ def slice_to_list(sl, max_len):
     else:
         step = sl.step
 
-    return list(range(start, stop, step))
+    return range(start, stop, step)
 
 
 def entail_zero_padding(old_tensor: torch.Tensor, num_rows: int):
     if old_tensor is None:
         return None
 
-    if len(old_tensor.shape) == 1:
-        return torch.cat((old_tensor, torch.zeros(1)))
-    else:
-        return torch.cat((old_tensor, torch.zeros((num_rows, *old_tensor.shape[1:]))), dim=0)
+    padding = torch.zeros((num_rows, *old_tensor.shape[1:]), dtype=old_tensor.dtype, device=old_tensor.device)
+    return torch.cat((old_tensor, padding), dim=0)
+
+
+def to_index_array(indices) -> np.ndarray:
+    """
+    Convert a list, a numpy array or a tensor of indices to a flat int64 numpy array.
+
+    Parameters
+    ----------
+    indices: list or numpy.ndarray or torch.Tensor
+        The indices
+
+    Returns
+    -------
+    numpy.ndarray
+        The converted array
+    """
+    if isinstance(indices, torch.Tensor):
+        indices = indices.detach().cpu().numpy()
+    return np.asarray(indices, dtype=np.int64).reshape(-1)
@@ -1,11 +1,49 @@
 # Views implementations used in GraphData
+#
+# The views are lazy: they only hold the graph and the index they were created with, and resolve the
+# requested feature or attribute when it is accessed. Slices are kept as slices, so that features are
+# returned as tensor views instead of copies.
 from collections import namedtuple
 
-from .utils import slice_to_list
+import numpy as np
+import torch
+
+from .utils import slice_to_range, to_index_array
 
 NodeRepr = namedtuple('NodeData', ['features', 'attributes'])
 EdgeRepr = namedtuple('EdgeData', ['features'])
 
+_ALL = slice(None)
+
+
+def _check_index(index, num_elements: int, kind: str):
+    """
+    Check that every element selected by `index` exists, in O(1) for ints and slices and with a
+    single vectorized comparison for index arrays.
+    """
+    if isinstance(index, slice):
+        if index == _ALL:
+            return
+        rng = slice_to_range(index, num_elements)
+        assert len(rng) == 0 or max(rng[0], rng[-1]) < num_elements, \
+            '{} {} does not exist in the graph.'.format(kind, max(rng[0], rng[-1]))
+    elif isinstance(index, (int, np.integer)):
+        assert index < num_elements, '{} {} does not exist in the graph.'.format(kind, index)
+    else:
+        indices = to_index_array(index)
+        assert len(indices) == 0 or indices.max() < num_elements, \
+            '{} {} does not exist in the graph.'.format(kind, indices.max())
+
+
+def _select(feat, index):
+    if feat is None:
+        return None
+    if isinstance(index, slice) and index == _ALL:
+        return feat.data
+    if isinstance(index, (list, np.ndarray)):
+        index = torch.from_numpy(to_index_array(index)).to(feat.data.device)
+    return feat.data[index]
+
 
 class NodeView(object):
     """
@@ -21,7 +59,7 @@ class NodeView(object):
 
         Parameters
         ----------
-        node_idx: int or slice
+        node_idx: int or slice or list or numpy.ndarray or torch.Tensor
             The index of nodes to be accessed.
 
         Returns
@@ -29,24 +67,14 @@ class NodeView(object):
         NodeRepr
             A collection of the corresponding data.
         """
-        # consistency check
-        # 1. type check
-        assert isinstance(node_idx, int) or isinstance(node_idx, slice), "Only int and slice are supported currently."
-        # 2. boundary check
-        if isinstance(node_idx, slice):
-            node_idx_list = slice_to_list(node_idx, self._graph.get_node_num())
-            for idx in node_idx_list:
-                assert idx < self._graph.get_node_num(), 'Node {} does not exist in the graph.'.format(idx)
-        else:
-            assert node_idx < self._graph.get_node_num(), 'Node {} does not exist in the graph.'.format(node_idx)
-
+        _check_index(node_idx, self._graph.get_node_num(), 'Node')
         return NodeRepr(features=NodeFeatView(self._graph, node_idx), attributes=NodeAttrView(self._graph, node_idx))
 
     def __len__(self):
         return self._graph.get_node_num()
 
     def __call__(self):
-        return list(range(self._graph.get_node_num))
+        return list(range(self._graph.get_node_num()))
 
 
 class NodeFeatView(object):
@@ -59,11 +87,14 @@ class NodeFeatView(object):
         self._nodes = nodes
 
     def __getitem__(self, item):
-        return self._graph.get_node_features(self._nodes)[item]
+        return _select(self._graph._node_features[item], self._nodes)
 
     def __setitem__(self, key, value):
         return self._graph.set_node_features(self._nodes, {key: value})
 
+    def __contains__(self, item):
+        return item in self._graph._node_features
+
     def __repr__(self):
         return repr(self._graph.get_node_features(self._nodes))
 
@@ -74,6 +105,9 @@ class NodeFeatView(object):
 class NodeAttrView(object):
     """
     View for node attributes which are arbitrary objects.
+
+    Indexing by an attribute name reads the attribute column directly and returns a
+    ``{node index: value}`` dict of the nodes holding the attribute.
     """
 
     def __init__(self, graph, nodes):
@@ -81,12 +115,17 @@ class NodeAttrView(object):
         self._nodes = nodes
 
     def __getitem__(self, item):
-        total_attrs = self._graph.get_node_attrs(self._nodes)
-        filtered_attrs = dict()
-        for k, v in total_attrs.items():
-            if item in v:
-                filtered_attrs[k] = v[item]
-        return filtered_attrs
+        column = self._graph._node_attributes.column(item)
+        if column is None:
+            return dict()
+        if isinstance(self._nodes, (int, np.integer)):
+            rows = np.array([self._nodes], dtype=np.int64)
+        elif isinstance(self._nodes, slice):
+            rows = np.arange(self._graph.get_node_num())[self._nodes]
+        else:
+            rows = to_index_array(self._nodes)
+        rows = rows[column.present[rows]]
+        return dict(zip(rows.tolist(), column.values[rows].tolist()))
 
     def __setitem__(self, key, value):
         raise NotImplementedError('NodeAttrView does not support modifying node attributes.'
@@ -108,6 +147,7 @@ class EdgeView(object):
         return self._graph.get_all_edges(*args, **kwargs)
 
     def __getitem__(self, item):
+        _check_index(item, self._graph.get_edge_num(), 'Edge')
         return EdgeRepr(features=EdgeFeatView(self._graph, item))
 
     def __repr__(self):
@@ -120,10 +160,13 @@ class EdgeFeatView(object):
         self._edges = edges
 
     def __getitem__(self, item):
-        return self._graph.get_edge_feature(self._edges)[item]
+        return _select(self._graph._edge_features[item], self._edges)
 
     def __setitem__(self, key, value):
         self._graph.set_edge_feature(self._edges, {key: value})
 
+    def __contains__(self, item):
+        return item in self._graph._edge_features
+
     def keys(self):
         return self._graph.get_edge_feature_names()
@@ -1,9 +1,16 @@
+from .annotation_cache import AnnotationCache, SqliteAnnotationStore, set_annotation_cache
+from .corenlp_client import AsyncCoreNLPClient, CoreNLPError
 from .dependency_graph_construction import DependencyBasedGraphConstruction
 from .constituency_graph_construction import ConstituencyBasedGraphConstruction
 from .node_embedding_based_graph_construction import NodeEmbeddingBasedGraphConstruction
 from .node_embedding_based_refined_graph_construction import NodeEmbeddingBasedRefinedGraphConstruction
 
-__all__ = ['DependencyBasedGraphConstruction',
+__all__ = ['AnnotationCache',
+            'SqliteAnnotationStore',
+            'set_annotation_cache',
+            'AsyncCoreNLPClient',
+            'CoreNLPError',
+            'DependencyBasedGraphConstruction',
             'ConstituencyBasedGraphConstruction',
             'NodeEmbeddingBasedGraphConstruction',
             'NodeEmbeddingBasedRefinedGraphConstruction']
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+
+class AnnotationStore(object):
+    """
+    Base class of the persistent backends of ``AnnotationCache``.
+
+    A store maps cache keys (hex strings) to annotation outputs (strings). Subclass it and
+    implement ``get`` and ``put`` to plug in another backend.
+    """
+
+    def get(self, key: str):
+        """
+        Get the annotation stored under `key`, or ``None`` if there is none.
+        """
+        raise NotImplementedError()
+
+    def put(self, key: str, value: str):
+        """
+        Store the annotation `value` under `key`.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class SqliteAnnotationStore(AnnotationStore):
+    """
+    An on-disk store backed by a single sqlite database, with zlib-compressed values.
+
+    The store can be shared by several processes: every process opens its own connection, and the
+    database runs in WAL mode so that readers do not block the writer.
+
+    Parameters
+    ----------
+    path: str
+        The path of the database file. It is created if it does not exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections cannot be shared with forked processes, so reconnect after a fork
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS annotations (key TEXT PRIMARY KEY, value BLOB)')
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._connection().execute('SELECT value FROM annotations WHERE key = ?', (key,)).fetchone()
+        return None if row is None else zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO annotations (key, value) VALUES (?, ?)',
+                         (key, zlib.compress(value.encode('utf-8'))))
+            conn.commit()
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+class AnnotationCache(object):
+    """
+    A content-addressed cache of NLP annotations, e.g. the JSON output of CoreNLP.
+
+    Annotations are keyed on the hash of the normalized text and of the annotation properties.
+    They are kept in an in-memory LRU layer, which sits in front of an optional persistent store.
+
+    Parameters
+    ----------
+    store: AnnotationStore or str, optional
+        The persistent backend, or the path of a sqlite database. Default: ``None`` for a memory-only cache.
+    capacity: int, optional
+        The number of annotations kept in memory, default: ``4096``.
+    namespace: str, optional
+        A string added to every key, e.g. the version of the annotator, so that annotations made by
+        different annotators are not mixed up. Default: ``''``.
+
+    Examples
+    --------
+    >>> cache = AnnotationCache('annotations.sqlite')
+    >>> output = cache.annotate(nlp_processor, 'Hello world.', {'annotators': 'depparse', 'outputFormat': 'json'})
+    """
+
+    def __init__(self, store=None, capacity: int = 4096, namespace: str = ''):
+        if isinstance(store, str):
+            store = SqliteAnnotationStore(store)
+        self.store = store
+        self.capacity = capacity
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalize a text before hashing it: surrounding whitespace is stripped and the unicode
+        representation is made canonical (NFC).
+        """
+        return unicodedata.normalize('NFC', text.strip())
+
+    def key(self, text: str, properties: dict = None) -> str:
+        """
+        Compute the cache key of the annotation of `text` with `properties`.
+
+        Returns
+        -------
+        str
+            The hex sha256 digest.
+        """
+        content = json.dumps([self.namespace, self.normalize(text), properties or {}], sort_keys=True)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        self._remember(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def _remember(self, key: str, value: str):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    def annotate(self, nlp_processor, text: str, properties: dict = None) -> str:
+        """
+        Annotate `text` with `nlp_processor`, unless the annotation is already cached.
+
+        Parameters
+        ----------
+        nlp_processor: object
+            An annotator with an ``annotate(text, properties=...)`` method, e.g. ``StanfordCoreNLP``.
+        text: str
+            The text to annotate.
+        properties: dict, optional
+            The annotation properties.
+
+        Returns
+        -------
+        str
+            The output of the annotator.
+        """
+        key = self.key(text, properties)
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = nlp_processor.annotate(text, properties=properties)
+        self.put(key, value)
+        return value
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Copies sent to other processes start with an empty memory layer and their own statistics
+        state['_memory'] = OrderedDict()
+        state['hits'] = state['misses'] = 0
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+_annotation_cache = AnnotationCache()
+
+
+def get_annotation_cache() -> AnnotationCache:
+    """
+    Get the annotation cache used by the static graph construction modules.
+    """
+    return _annotation_cache
+
+
+def set_annotation_cache(cache: AnnotationCache or str) -> AnnotationCache:
+    """
+    Set the annotation cache used by the static graph construction modules.
+
+    Parameters
+    ----------
+    cache: AnnotationCache or str
+        The new cache, or the path of a sqlite database to cache the annotations in.
+
+    Returns
+    -------
+    AnnotationCache
+        The previous cache.
+    """
+    global _annotation_cache
+    previous = _annotation_cache
+    _annotation_cache = cache if isinstance(cache, AnnotationCache) else AnnotationCache(cache)
+    return previous
+
+
+def cached_annotate(nlp_processor, text: str, properties: dict = None) -> str:
+    """
+    Annotate `text` with `nlp_processor` through the current annotation cache.
+    """
+    return _annotation_cache.annotate(nlp_processor, text, properties)
@@ -1,13 +1,14 @@
-from nltk.tokenize import word_tokenize
 import numpy as np
 import torch
 from torch import nn
 import torch.nn.functional as F
 
 from .embedding_construction import EmbeddingConstruction
+from .parallel_construction import construct_many
 from ...data.data import GraphData
 from ..utils.constants import INF
 from ..utils.generic_utils import to_cuda
+from ..utils.tokenization_utils import default_tokenizer
 from ..utils.constants import VERY_SMALL_NUMBER
 
 
@@ -136,6 +137,19 @@ class StaticGraphConstructionBase(GraphConstructionBase):
     def topology(cls, **kwargs):
         raise NotImplementedError()
 
+    @classmethod
+    def construct_many(cls, texts, nlp_processor_factory=None, num_workers=None, **kwargs):
+        """
+        Construct the topology of every text of a corpus with a pool of worker processes.
+        See ``parallel_construction.construct_many`` for the arguments.
+
+        Returns
+        -------
+        generator of ConstructionResult
+            ``(index, graph, error)`` for every text, in input order.
+        """
+        return construct_many(cls, texts, nlp_processor_factory, num_workers=num_workers, **kwargs)
+
     def embedding(self, **kwargs):
         raise NotImplementedError()
 
@@ -197,6 +211,16 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
         Dropout ratio, default: ``None``.
     device : torch.device, optional
         Specify computation device (e.g., CPU), default: ``None`` for using CPU.
+    knn_block_size : int, optional
+        Specify the tile size for blocked kNN graph construction, which keeps
+        the ``top_k_neigh`` neighbors of every node without materializing the
+        N x N similarity matrix and gives a sparse adjacency matrix, see
+        ``compute_knn_graph``. Default: ``None`` for dense construction.
+    lsh_num_tables : int, optional
+        Specify the number of hash tables for approximate kNN graph construction
+        with random-projection LSH, only for the "cosine" and "weighted_cosine"
+        metrics, see ``compute_ann_knn_graph``. Default: ``None`` for exact
+        construction.
     """
     def __init__(self,
                 word_vocab,
@@ -212,7 +236,9 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
                 hidden_size=None,
                 fix_word_emb=False,
                 dropout=None,
-                device=None):
+                device=None,
+                knn_block_size=None,
+                lsh_num_tables=None):
         super(DynamicGraphConstructionBase, self).__init__(
                                                     word_vocab,
                                                     embedding_styles,
@@ -229,6 +255,12 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
         self.smoothness_ratio = smoothness_ratio
         self.connectivity_ratio = connectivity_ratio
         self.sparsity_ratio = sparsity_ratio
+        assert knn_block_size is None or top_k_neigh is not None, \
+            'knn_block_size requires top_k_neigh!'
+        self.knn_block_size = knn_block_size
+        assert lsh_num_tables is None or (top_k_neigh is not None and sim_metric_type in ('cosine', 'weighted_cosine')), \
+            'lsh_num_tables requires top_k_neigh and the cosine or weighted_cosine sim_metric_type!'
+        self.lsh_num_tables = lsh_num_tables
 
         if self.sim_metric_type == 'attention':
             self.mask_off_val = -INF
@@ -313,7 +345,7 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
         raise NotImplementedError()
 
     @classmethod
-    def raw_text_to_init_graph(cls, raw_text_data, lower_case=True, tokenizer=word_tokenize):
+    def raw_text_to_init_graph(cls, raw_text_data, lower_case=True, tokenizer=default_tokenizer):
         """Convert raw text data to initial static graph.
 
         Parameters
@@ -322,6 +354,8 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
             The raw text data.
         lower_case : boolean
             Specify whether to lower case the input text, default: ``True``.
+        tokenizer : callable, optional
+            Word tokenization function, default: ``default_tokenizer``, a memoized nltk.tokenize.word_tokenize.
 
         Returns
         -------
@@ -333,13 +367,9 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
 
         token_list = tokenizer(raw_text_data.strip())
         ret_graph = GraphData()
-        ret_graph.add_nodes(len(token_list))
-
-        for idx, token in enumerate(token_list[:-1]):
-            ret_graph.add_edge(idx, idx + 1)
-            ret_graph.node_attributes[idx]['token'] = token
-
-        ret_graph.node_attributes[idx + 1]['token'] = token_list[-1]
+        ret_graph.add_nodes(len(token_list), {'token': token_list})
+        if len(token_list) > 1:
+            ret_graph.add_edges(np.arange(len(token_list) - 1), np.arange(1, len(token_list)))
 
         return ret_graph
 
@@ -349,9 +379,10 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
         Parameters
         ----------
         node_emb : torch.Tensor
-            The input node embedding matrix.
+            The input node embedding matrix, N x D or B x N x D for a padded batch.
         node_mask : torch.Tensor, optional
-            The node mask matrix, default: ``None``.
+            The node mask matrix (N or B x N). The columns of the masked nodes are
+            set to ``mask_off_val``. Default: ``None``.
 
         Returns
         -------
@@ -387,13 +418,325 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
             attention = torch.exp(-0.5 * attention * (self.precision_inv_dis**2))
         elif self.sim_metric_type == 'cosine':
             node_vec_norm = node_emb.div(torch.norm(node_emb, p=2, dim=-1, keepdim=True))
-            attention = torch.mm(node_vec_norm, node_vec_norm.transpose(-1, -2)).detach()
+            attention = torch.matmul(node_vec_norm, node_vec_norm.transpose(-1, -2)).detach()
 
         if node_mask is not None:
-            attention = attention.masked_fill_(1 - node_mask.byte(), self.mask_off_val)
+            attention = attention.masked_fill_(~node_mask.bool().unsqueeze(-2), self.mask_off_val)
+
+        return attention
+
+    def _similarity_inputs(self, node_emb):
+        """Compute the per-node quantities of the similarity metric, shared by
+        all the blocks of ``_similarity_block``.
+        """
+        if self.sim_metric_type == 'attention':
+            return [torch.relu(linear_sim(node_emb)) for linear_sim in self.linear_sims]
+        elif self.sim_metric_type == 'weighted_cosine':
+            return F.normalize(node_emb.unsqueeze(0) * self.weight.unsqueeze(1), p=2, dim=-1)
+        elif self.sim_metric_type == 'gat_attention':
+            return [(linear_sim1(node_emb), linear_sim2(node_emb))
+                    for linear_sim1, linear_sim2 in zip(self.linear_sims1, self.linear_sims2)]
+        elif self.sim_metric_type == 'rbf_kernel':
+            trans_X = torch.mm(node_emb, torch.mm(self.weight, self.weight.transpose(-1, -2)))
+            return node_emb, trans_X, torch.sum(trans_X * node_emb, dim=-1)
+        elif self.sim_metric_type == 'cosine':
+            return node_emb.div(torch.norm(node_emb, p=2, dim=-1, keepdim=True)).detach()
+
+    def _similarity_block(self, inputs, rows, cols):
+        """Compute the block ``[rows, cols]`` of the similarity matrix of
+        ``compute_similarity_metric``.
+
+        Parameters
+        ----------
+        inputs :
+            The output of ``_similarity_inputs``.
+        rows : slice
+            The rows of the block.
+        cols : slice
+            The columns of the block.
+
+        Returns
+        -------
+        torch.Tensor
+            The similarity block.
+        """
+        if self.sim_metric_type == 'attention':
+            attention = 0
+            for node_vec_t in inputs:
+                attention += torch.matmul(node_vec_t[rows], node_vec_t[cols].transpose(-1, -2))
+            attention /= len(inputs)
+        elif self.sim_metric_type == 'weighted_cosine':
+            attention = torch.matmul(inputs[:, rows], inputs[:, cols].transpose(-1, -2)).mean(0)
+        elif self.sim_metric_type == 'gat_attention':
+            attention = torch.mean(torch.stack([self.leakyrelu(a_input1[rows] + a_input2[cols].transpose(-1, -2))
+                                                for a_input1, a_input2 in inputs], 0), 0)
+        elif self.sim_metric_type == 'rbf_kernel':
+            X, trans_X, norm = inputs
+            dists = -2 * torch.matmul(trans_X[rows], X[cols].transpose(-1, -2)) \
+                    + norm[cols].unsqueeze(0) + norm[rows].unsqueeze(1)
+            attention = torch.exp(-0.5 * dists * (self.precision_inv_dis**2))
+        elif self.sim_metric_type == 'cosine':
+            attention = torch.mm(inputs[rows], inputs[cols].transpose(-1, -2))
 
         return attention
 
+    def compute_knn_graph(self, node_emb, node_mask=None, top_k_neigh=None, block_size=None):
+        """Compute the kNN neighborhood graph of the nodes block by block.
+
+        The similarity matrix is computed in tiles of ``block_size`` x ``block_size``
+        and only a running top-k of every row is kept, so that the memory is
+        O(N * k + block_size^2) instead of O(N^2). The values are those of
+        ``compute_similarity_metric`` followed by ``_build_knn_neighbourhood``,
+        and gradients flow through the kept values.
+
+        Parameters
+        ----------
+        node_emb : torch.Tensor
+            The N x D node embedding matrix.
+        node_mask : torch.Tensor, optional
+            The mask of the N valid nodes. Invalid nodes have no neighbors and
+            are nobody's neighbor. Default: ``None``.
+        top_k_neigh : int, optional
+            The number of neighbors of every node, default: ``None`` for ``top_k_neigh``
+            of the constructor.
+        block_size : int, optional
+            The tile size, default: ``None`` for ``knn_block_size`` of the constructor.
+
+        Returns
+        -------
+        torch.Tensor
+            The N x N sparse (COO) adjacency matrix, with k entries per valid node.
+        """
+        assert node_emb.dim() == 2, 'Blocked kNN graph construction requires 2-D node embeddings!'
+        top_k_neigh = top_k_neigh if top_k_neigh is not None else self.top_k_neigh
+        block_size = block_size if block_size is not None else self.knn_block_size
+        num_nodes = node_emb.size(0)
+        device = node_emb.device
+        valid = node_mask.view(-1).bool() if node_mask is not None else None
+        top_k_neigh = min(top_k_neigh, int(valid.sum()) if valid is not None else num_nodes)
+
+        inputs = self._similarity_inputs(node_emb)
+        knn_rows, knn_ind, knn_val = [], [], []
+        for row_start in range(0, num_nodes, block_size):
+            rows = slice(row_start, min(row_start + block_size, num_nodes))
+            best_val = best_ind = None
+            for col_start in range(0, num_nodes, block_size):
+                cols = slice(col_start, min(col_start + block_size, num_nodes))
+                attention = self._similarity_block(inputs, rows, cols)
+                col_ind = torch.arange(cols.start, cols.stop, device=device).expand_as(attention)
+                if valid is not None:
+                    attention = attention.masked_fill(~valid[cols].unsqueeze(0), -INF)
+                # Merge the block into the running top-k of the rows
+                if best_val is not None:
+                    attention = torch.cat([best_val, attention], -1)
+                    col_ind = torch.cat([best_ind, col_ind], -1)
+                best_val, pos = torch.topk(attention, min(top_k_neigh, attention.size(-1)), dim=-1)
+                best_ind = torch.gather(col_ind, -1, pos)
+
+            row_ind = torch.arange(rows.start, rows.stop, device=device).unsqueeze(-1).expand_as(best_ind)
+            knn_rows.append(row_ind.reshape(-1))
+            knn_ind.append(best_ind.reshape(-1))
+            knn_val.append(best_val.reshape(-1))
+
+        indices = torch.stack([torch.cat(knn_rows), torch.cat(knn_ind)], 0)
+        values = torch.cat(knn_val)
+        if valid is not None:
+            keep = valid[indices[0]]
+            indices, values = indices[:, keep], values[keep]
+
+        return torch.sparse_coo_tensor(indices, values, (num_nodes, num_nodes)).coalesce()
+
+    def compute_ann_knn_graph(self, node_emb, node_mask=None, top_k_neigh=None, num_tables=None,
+                                num_bits=16, window=None, block_size=256, generator=None):
+        """Compute an approximate kNN neighborhood graph of the nodes with
+        random-projection LSH, for the "cosine" and "weighted_cosine" metrics.
+
+        Every hash table projects the normalized node embeddings on ``num_bits``
+        random hyperplanes and sorts the nodes by their sign codes, so that the
+        nodes sharing the leading bits are contiguous. The candidate neighbors of
+        a node are the ``window`` nodes on each side of it in every table. The
+        candidates are then scored exactly with the similarity metric and the
+        top k are kept, so that gradients flow through the kept values as in
+        ``compute_knn_graph``. The cost is O(T * N log N + T * N * window * D)
+        for T tables instead of O(N^2 * D).
+
+        Parameters
+        ----------
+        node_emb : torch.Tensor
+            The N x D node embedding matrix.
+        node_mask : torch.Tensor, optional
+            The mask of the N valid nodes. Invalid nodes have no neighbors and
+            are nobody's neighbor. Default: ``None``.
+        top_k_neigh : int, optional
+            The number of neighbors of every node, default: ``None`` for ``top_k_neigh``
+            of the constructor.
+        num_tables : int, optional
+            The number of hash tables, default: ``None`` for ``lsh_num_tables``
+            of the constructor, or ``8`` if it is not set.
+        num_bits : int, optional
+            The number of random hyperplanes of a table, default: ``16``.
+        window : int, optional
+            The number of candidates taken on each side of a node in every table,
+            default: ``None`` for ``top_k_neigh``.
+        block_size : int, optional
+            The number of nodes re-scored at once, default: ``256``.
+        generator : torch.Generator, optional
+            The generator of the random hyperplanes, on the device of ``node_emb``.
+            Pass a generator seeded with the same value to get the same graph
+            across calls, e.g. between training and evaluation. Default: ``None``
+            for the global random number generator.
+
+        Returns
+        -------
+        torch.Tensor
+            The N x N sparse (COO) adjacency matrix, with k entries per valid node.
+        """
+        assert node_emb.dim() == 2, 'Approximate kNN graph construction requires 2-D node embeddings!'
+        assert self.sim_metric_type in ('cosine', 'weighted_cosine'), \
+            'Approximate kNN graph construction only supports the cosine and weighted_cosine metrics!'
+        if num_tables is None:
+            num_tables = self.lsh_num_tables if self.lsh_num_tables is not None else 8
+        top_k_neigh = top_k_neigh if top_k_neigh is not None else self.top_k_neigh
+        assert num_tables >= 1, 'num_tables should be at least 1!'
+        assert top_k_neigh is not None and top_k_neigh >= 1, \
+            'Approximate kNN graph construction requires top_k_neigh!'
+        num_nodes = node_emb.size(0)
+        device = node_emb.device
+
+        # Search among the valid nodes only, and map back to node ids at the end
+        node_ids = node_mask.view(-1).nonzero().view(-1) if node_mask is not None \
+            else torch.arange(num_nodes, device=device)
+        num_valid = node_ids.numel()
+        top_k_neigh = min(top_k_neigh, num_valid)
+        window = min(max(window or top_k_neigh, top_k_neigh), max(num_valid - 1, 1))
+
+        inputs = self._similarity_inputs(node_emb[node_ids])
+        if self.sim_metric_type == 'weighted_cosine':
+            # The mean over heads of the cosine similarities is the cosine similarity
+            # of the concatenated normalized heads
+            keys = inputs.detach().transpose(0, 1).reshape(num_valid, -1)
+        else:
+            keys = inputs
+
+        # Candidates: the nodes themselves and their neighbors in every sorted table
+        offsets = torch.cat([torch.arange(-window, 0, device=device), torch.arange(1, window + 1, device=device)])
+        bit_values = 2 ** torch.arange(num_bits, device=device)
+        candidates = [torch.arange(num_valid, device=device).unsqueeze(-1)]
+        for _ in range(num_tables):
+            codes = ((keys @ torch.randn(keys.size(-1), num_bits, generator=generator, device=device)) > 0).long() @ bit_values
+            order = torch.argsort(codes)
+            rank = torch.empty_like(order)
+            rank[order] = torch.arange(num_valid, device=device)
+            candidates.append(order[(rank.unsqueeze(-1) + offsets).clamp_(0, num_valid - 1)])
+        candidates = torch.sort(torch.cat(candidates, -1), -1)[0]
+        duplicate = torch.cat([torch.zeros_like(candidates[:, :1], dtype=torch.bool),
+                               candidates[:, 1:] == candidates[:, :-1]], -1)
+
+        knn_ind, knn_val = [], []
+        for start in range(0, num_valid, block_size):
+            rows = slice(start, min(start + block_size, num_valid))
+            cand = candidates[rows]
+            if self.sim_metric_type == 'weighted_cosine':
+                cand_vec = inputs.index_select(1, cand.reshape(-1)).view(inputs.size(0), *cand.shape, -1)
+                attention = torch.matmul(cand_vec, inputs[:, rows].unsqueeze(-1)).squeeze(-1).mean(0)
+            else:
+                cand_vec = inputs.index_select(0, cand.reshape(-1)).view(*cand.shape, -1)
+                attention = torch.bmm(cand_vec, inputs[rows].unsqueeze(-1)).squeeze(-1)
+            attention = attention.masked_fill(duplicate[rows], -INF)
+            best_val, pos = torch.topk(attention, top_k_neigh, dim=-1)
+            knn_ind.append(torch.gather(cand, -1, pos))
+            knn_val.append(best_val)
+
+        knn_ind = torch.cat(knn_ind)
+        indices = torch.stack([node_ids.unsqueeze(-1).expand_as(knn_ind).reshape(-1),
+                               node_ids[knn_ind.reshape(-1)]], 0)
+
+        return torch.sparse_coo_tensor(indices, torch.cat(knn_val).reshape(-1), (num_nodes, num_nodes)).coalesce()
+
+    def compute_batched_graph(self, node_emb, batch_num_nodes, node_mask=None, bucket_ratio=1.25):
+        """Compute the adjacency matrix of a batch of graphs of different sizes.
+
+        The graphs are sorted by size and grouped into buckets whose largest graph
+        has at most ``bucket_ratio`` times the nodes of the smallest one. Every
+        bucket is padded to its largest graph and goes through
+        ``compute_similarity_metric`` at once, so that the padding is bounded
+        by the bucket ratio instead of the largest graph of the whole batch.
+        The graphs are then sparsified as in ``sparsify_graph``, and the result
+        is the block-diagonal adjacency matrix of the batch.
+
+        Parameters
+        ----------
+        node_emb : torch.Tensor
+            The node embeddings of all the graphs, concatenated: a (N_1 + ... + N_B) x D matrix.
+        batch_num_nodes : torch.LongTensor or list of int
+            The number of nodes of every graph, ``[N_1, ..., N_B]``. The nodes of
+            graph ``i`` start at offset ``N_1 + ... + N_{i-1}``.
+        node_mask : torch.Tensor, optional
+            The mask of the valid nodes, of size N_1 + ... + N_B. Invalid nodes
+            have no neighbors and are nobody's neighbor. Default: ``None``.
+        bucket_ratio : float, optional
+            The maximum ratio between the sizes of the largest and the smallest
+            graph of a bucket, default: ``1.25``.
+
+        Returns
+        -------
+        torch.Tensor
+            The sparse (COO) block-diagonal adjacency matrix of the batch.
+        """
+        assert node_emb.dim() == 2, 'Batched graph construction requires concatenated 2-D node embeddings!'
+        assert bucket_ratio >= 1, 'bucket_ratio should be at least 1!'
+        device = node_emb.device
+        sizes = torch.as_tensor(batch_num_nodes).tolist()
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).tolist()
+        num_nodes = offsets[-1]
+        assert num_nodes == node_emb.size(0), 'batch_num_nodes does not match the number of node embeddings!'
+        valid = node_mask.view(-1).bool() if node_mask is not None \
+            else torch.ones(num_nodes, dtype=torch.bool, device=device)
+
+        buckets = []
+        for graph in sorted(range(len(sizes)), key=sizes.__getitem__):
+            if sizes[graph] == 0:
+                continue
+            if len(buckets) > 0 and sizes[graph] <= sizes[buckets[-1][0]] * bucket_ratio:
+                buckets[-1].append(graph)
+            else:
+                buckets.append([graph])
+
+        adj_src, adj_dst, adj_val = [], [], []
+        for bucket in buckets:
+            bucket_sizes = torch.tensor([sizes[graph] for graph in bucket], device=device)
+            starts = torch.tensor([offsets[graph] for graph in bucket], device=device)
+            positions = torch.arange(int(bucket_sizes.max()), device=device)
+            # The node ids of the padded bucket, with the padding positions pointing to node 0 and masked
+            in_graph = positions.unsqueeze(0) < bucket_sizes.unsqueeze(-1)
+            node_ids = (starts.unsqueeze(-1) + positions).masked_fill(~in_graph, 0)
+            bucket_valid = in_graph & valid[node_ids]
+
+            attention = self.compute_similarity_metric(node_emb[node_ids], bucket_valid)
+            if self.top_k_neigh is not None:
+                scores = attention.masked_fill(~bucket_valid.unsqueeze(-2), -INF)
+                values, cols = torch.topk(scores, min(self.top_k_neigh, scores.size(-1)), dim=-1)
+                keep = bucket_valid.unsqueeze(-1) & torch.gather(bucket_valid, -1, cols.flatten(1)).view_as(cols)
+                rows = positions.view(1, -1, 1).expand_as(cols)
+                graph_index = torch.arange(len(bucket), device=device).view(-1, 1, 1).expand_as(cols)
+                graph_index, rows, cols, values = graph_index[keep], rows[keep], cols[keep], values[keep]
+            else:
+                keep = bucket_valid.unsqueeze(-1) & bucket_valid.unsqueeze(-2)
+                if self.epsilon_neigh is not None:
+                    keep = keep & (attention > self.epsilon_neigh)
+                graph_index, rows, cols = keep.nonzero(as_tuple=True)
+                values = attention[graph_index, rows, cols]
+            adj_src.append(node_ids[graph_index, rows])
+            adj_dst.append(node_ids[graph_index, cols])
+            adj_val.append(values)
+
+        if len(adj_val) == 0:
+            return torch.sparse_coo_tensor(torch.zeros(2, 0, dtype=torch.long, device=device),
+                                           node_emb.new_zeros(0), (num_nodes, num_nodes)).coalesce()
+        indices = torch.stack([torch.cat(adj_src), torch.cat(adj_dst)], 0)
+
+        return torch.sparse_coo_tensor(indices, torch.cat(adj_val), (num_nodes, num_nodes)).coalesce()
+
     def sparsify_graph(self, adj):
         if self.epsilon_neigh is not None:
             adj = self._build_epsilon_neighbourhood(adj, self.epsilon_neigh)
@@ -403,21 +746,30 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
 
         return adj
 
-    def compute_graph_regularization(self, adj, node_feat):
+    def compute_graph_regularization(self, adj, node_feat, batch_num_nodes=None):
         """Graph graph regularization loss.
 
         Parameters
         ----------
         adj : torch.Tensor
-            The adjacency matrix.
+            The dense or sparse adjacency matrix. The loss of a sparse (COO)
+            matrix is computed from its entries only, in O(E * D).
         node_feat : torch.Tensor
             The node feature matrix.
+        batch_num_nodes : torch.LongTensor, optional
+            The number of nodes of every graph when ``adj`` is the sparse
+            block-diagonal adjacency matrix of a batch, whose loss is the mean
+            of the losses of its graphs. Default: ``None`` for a single graph.
 
         Returns
         -------
         torch.float32
             The graph regularization loss.
         """
+        if adj.is_sparse:
+            return self._compute_sparse_graph_regularization(adj, node_feat, batch_num_nodes)
+        assert batch_num_nodes is None, 'Batched graph regularization requires a sparse adjacency matrix!'
+
         graph_reg = 0
         if not self.smoothness_ratio in (0, None):
             L = torch.diagflat(torch.sum(adj, -1)) - adj
@@ -435,6 +787,45 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
 
         return graph_reg
 
+    def _compute_sparse_graph_regularization(self, adj, node_feat, batch_num_nodes=None):
+        """Compute the graph regularization loss of ``compute_graph_regularization``
+        from the E entries of a sparse adjacency matrix in O(E * D), without the
+        dense Laplacian. The smoothness term ``trace(X^T L X)`` is the sum over the
+        edges (i, j) of ``a_ij * x_i . (x_i - x_j)``. The loss of a block-diagonal
+        batch is the mean of the losses of its graphs.
+        """
+        adj = adj.coalesce()
+        src, dst = adj.indices()
+        edge_weight = adj.values()
+        device = edge_weight.device
+        if batch_num_nodes is None:
+            batch_num_nodes = torch.tensor([adj.size(0)], device=device)
+        batch_num_nodes = torch.as_tensor(batch_num_nodes, device=device)
+        num_graphs = batch_num_nodes.numel()
+        node_graph = torch.repeat_interleave(torch.arange(num_graphs, device=device), batch_num_nodes)
+        edge_graph = node_graph[src]
+        num_nodes = batch_num_nodes.to(edge_weight.dtype).clamp(min=1)
+        graph_reg = 0
+
+        def per_graph_sum(index, values):
+            return torch.zeros(num_graphs, dtype=values.dtype, device=device).index_add(0, index, values)
+
+        if not self.smoothness_ratio in (0, None):
+            src_feat = node_feat[src]
+            smoothness = edge_weight * torch.sum(src_feat * (src_feat - node_feat[dst]), -1)
+            graph_reg += self.smoothness_ratio * torch.mean(per_graph_sum(edge_graph, smoothness) / num_nodes**2)
+
+        if not self.connectivity_ratio in (0, None):
+            degrees = torch.zeros(adj.size(0), dtype=edge_weight.dtype, device=device).index_add(0, src, edge_weight)
+            connectivity = per_graph_sum(node_graph, torch.log(degrees + VERY_SMALL_NUMBER))
+            graph_reg += -self.connectivity_ratio * torch.mean(connectivity / num_nodes)
+
+        if not self.sparsity_ratio in (0, None):
+            sparsity = per_graph_sum(edge_graph, torch.pow(edge_weight, 2))
+            graph_reg += self.sparsity_ratio * torch.mean(sparsity / num_nodes**2)
+
+        return graph_reg
+
     def _build_knn_neighbourhood(self, attention, top_k_neigh):
         """Build kNN neighborhood graph.
 
@@ -480,11 +871,11 @@ class DynamicGraphConstructionBase(GraphConstructionBase):
         """Compute distance matrix for RBF kernel.
         """
         if weight is not None:
-            trans_X = torch.mm(X, weight)
+            trans_X = torch.matmul(X, weight)
         else:
             trans_X = X
 
         norm = torch.sum(trans_X * X, dim=-1)
-        dists = -2 * torch.matmul(trans_X, X.transpose(-1, -2)) + norm.unsqueeze(0) + norm.unsqueeze(1)
+        dists = -2 * torch.matmul(trans_X, X.transpose(-1, -2)) + norm.unsqueeze(-2) + norm.unsqueeze(-1)
 
         return dists
@@ -0,0 +1,201 @@
+"""
+Build the graphs of a corpus once, ahead of training, and store them in graph shards.
+
+Usage::
+
+    python -m graph4nlp.pytorch.modules.graph_construction.build_graphs corpus.jsonl graphs/ \\
+        --constructor dependency --merge-strategy tailhead --num-workers 8 --shard-size 10000
+
+Every line of the input is a JSON object holding the text to parse (or a JSON string). The documents are
+split in shards of ``--shard-size`` consecutive lines, and every shard is written to its own
+``GraphShardWriter`` directory. ``manifest.json`` lists the completed shards, so running the same command
+again after a crash resumes from the first shard which was not completed.
+"""
+import argparse
+import functools
+import json
+import os
+
+from .annotation_cache import set_annotation_cache
+from .constituency_graph_construction import ConstituencyBasedGraphConstruction
+from .corenlp_client import AsyncCoreNLPClient
+from .dependency_graph_construction import DependencyBasedGraphConstruction
+from .ie_graph_construction import IEBasedGraphConstruction
+from .parallel_construction import construct_many
+from ...data.shard import GraphShardReader, GraphShardWriter
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_FORMAT_VERSION = 1
+
+CONSTRUCTORS = {
+    'dependency': DependencyBasedGraphConstruction,
+    'constituency': ConstituencyBasedGraphConstruction,
+    'ie': IEBasedGraphConstruction,
+}
+
+
+def _read_texts(path: str, text_field: str, start: int):
+    """
+    Read the texts of the non-empty lines of a JSONL file, from the `start`-th one.
+    """
+    with open(path, encoding='utf-8') as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            if index >= start:
+                record = json.loads(line)
+                yield record if isinstance(record, str) else record[text_field]
+            index += 1
+
+
+def _load_manifest(output_path: str):
+    path = os.path.join(output_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(output_path: str, manifest: dict):
+    tmp_path = os.path.join(output_path, MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(output_path, MANIFEST_FILE))
+
+
+def build_graphs(input_path: str, output_path: str, constructor: str, nlp_processor_factory=None,
+                 shard_size: int = 10000, num_workers: int = None, chunksize: int = 1, text_field: str = 'text',
+                 progress: bool = True, **topology_kwargs) -> dict:
+    """
+    Build the graphs of the documents of a JSONL file and write them to shards, resuming a previous run.
+
+    Parameters
+    ----------
+    input_path: str
+        The JSONL file, with one document per line.
+    output_path: str
+        The output directory, holding ``manifest.json`` and one shard directory per ``shard_size`` documents.
+    constructor: str
+        The name of the static graph construction, one of ``'dependency'``, ``'constituency'`` and ``'ie'``.
+    nlp_processor_factory: callable, optional
+        A picklable function without argument returning a parser client, see ``construct_many``.
+    shard_size: int, optional
+        The number of documents of a shard, default: ``10000``.
+    num_workers: int, optional
+        The number of worker processes, default: ``None`` for the number of CPUs.
+    chunksize: int, optional
+        The number of documents sent to a worker at once, default: ``1``.
+    text_field: str, optional
+        The field of the JSON objects holding the text, default: ``'text'``.
+    progress: bool, optional
+        Whether to display a progress bar, default: ``True``.
+    topology_kwargs: dict
+        The other arguments of ``topology``, e.g. ``merge_strategy`` and ``edge_strategy``.
+
+    Returns
+    -------
+    dict
+        The manifest: the settings of the run and, for every shard, its directory, the range of documents
+        it covers, its number of graphs and the documents whose construction failed with their traceback.
+    """
+    assert constructor in CONSTRUCTORS, "Unknown graph constructor `{}'.".format(constructor)
+    settings = {'constructor': constructor, 'topology_kwargs': topology_kwargs, 'shard_size': shard_size,
+                'text_field': text_field}
+    os.makedirs(output_path, exist_ok=True)
+    manifest = _load_manifest(output_path)
+    if manifest is None:
+        manifest = dict(format_version=MANIFEST_FORMAT_VERSION, shards=[], **settings)
+    else:
+        assert manifest['format_version'] == MANIFEST_FORMAT_VERSION, 'Unsupported manifest format version.'
+        for key, value in settings.items():
+            assert manifest[key] == value, "The output directory was built with {} = {}, not {}.".format(
+                key, manifest[key], value)
+
+    # Documents of the shards completed by previous runs are skipped
+    start = sum(shard['num_documents'] for shard in manifest['shards'])
+    results = construct_many(CONSTRUCTORS[constructor], _read_texts(input_path, text_field, start),
+                             nlp_processor_factory, num_workers=num_workers, chunksize=chunksize,
+                             progress=progress, **topology_kwargs)
+
+    writer = shard = None
+    for result in results:
+        document = start + result.index
+        if writer is None:
+            shard = {'path': 'shard_{:05d}'.format(len(manifest['shards'])), 'first_document': document,
+                     'num_documents': 0, 'num_graphs': 0, 'failures': []}
+            writer = GraphShardWriter(os.path.join(output_path, shard['path']))
+        if result.error is None:
+            writer.write(result.graph)
+            shard['num_graphs'] += 1
+        else:
+            shard['failures'].append({'document': document, 'error': result.error})
+        shard['num_documents'] += 1
+
+        if shard['num_documents'] == shard_size:
+            writer.close()
+            manifest['shards'].append(shard)
+            _save_manifest(output_path, manifest)
+            writer = None
+    if writer is not None:
+        writer.close()
+        manifest['shards'].append(shard)
+    _save_manifest(output_path, manifest)
+    return manifest
+
+
+def open_graph_shards(output_path: str) -> list:
+    """
+    Open the shards written by ``build_graphs``.
+
+    Returns
+    -------
+    list of GraphShardReader
+        The readers of the completed shards, in the order of the documents.
+    """
+    manifest = _load_manifest(output_path)
+    assert manifest is not None, 'No manifest in {}.'.format(output_path)
+    return [GraphShardReader(os.path.join(output_path, shard['path'])) for shard in manifest['shards']]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='graph4nlp-build-graphs',
+                                     description='Build the graphs of a JSONL corpus and write them to graph shards. '
+                                                 'Running the command again resumes an interrupted run.')
+    parser.add_argument('input', help='the JSONL file, with one document per line')
+    parser.add_argument('output', help='the output directory')
+    parser.add_argument('--constructor', choices=sorted(CONSTRUCTORS), default='dependency',
+                        help='the static graph construction (default: dependency)')
+    parser.add_argument('--merge-strategy', default=None, help='the merge strategy of the sentence graphs')
+    parser.add_argument('--edge-strategy', default=None, help='the edge strategy')
+    parser.add_argument('--text-field', default='text', help='the field holding the text (default: text)')
+    parser.add_argument('--shard-size', type=int, default=10000,
+                        help='the number of documents per shard (default: 10000)')
+    parser.add_argument('--num-workers', type=int, default=None,
+                        help='the number of worker processes (default: the number of CPUs)')
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help='the number of documents sent to a worker at once (default: 1)')
+    parser.add_argument('--corenlp-url', default='http://localhost', help='the url of the CoreNLP server')
+    parser.add_argument('--corenlp-port', type=int, default=9000, help='the port of the CoreNLP server')
+    parser.add_argument('--corenlp-timeout', type=float, default=300,
+                        help='the timeout of a CoreNLP request in seconds (default: 300)')
+    parser.add_argument('--annotation-cache', default=None,
+                        help='a sqlite database caching the CoreNLP annotations across runs')
+    parser.add_argument('--no-progress', action='store_true', help='do not display a progress bar')
+    args = parser.parse_args(args)
+
+    if args.annotation_cache is not None:
+        set_annotation_cache(args.annotation_cache)
+    nlp_processor_factory = functools.partial(AsyncCoreNLPClient, args.corenlp_url, port=args.corenlp_port,
+                                              timeout=args.corenlp_timeout)
+    manifest = build_graphs(args.input, args.output, args.constructor, nlp_processor_factory,
+                            shard_size=args.shard_size, num_workers=args.num_workers, chunksize=args.chunksize,
+                            text_field=args.text_field, progress=not args.no_progress,
+                            merge_strategy=args.merge_strategy, edge_strategy=args.edge_strategy)
+    num_graphs = sum(shard['num_graphs'] for shard in manifest['shards'])
+    num_failures = sum(len(shard['failures']) for shard in manifest['shards'])
+    print('{} graphs in {} shards, {} failures.'.format(num_graphs, len(manifest['shards']), num_failures))
+
+
+if __name__ == '__main__':
+    main()
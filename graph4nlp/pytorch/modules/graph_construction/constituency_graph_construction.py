@@ -1,19 +1,23 @@
 import copy
 import json
 import random
+import re
 
 import networkx as nx
 import networkx.algorithms as nxalg
 import numpy as np
 import torch
 import tqdm
-from pythonds.basic.stack import Stack
 from stanfordcorenlp import StanfordCoreNLP
 
+from .annotation_cache import cached_annotate
 from .base import StaticGraphConstructionBase
 from .embedding_construction import EmbeddingConstruction
 from ...data.data import GraphData
 
+# Brackets and the tokens between them in a bracketed parse tree
+_PARSE_TOKEN = re.compile(r'[()]|[^\s()]+')
+
 """TODO: some design choice:
             - replace constituent tag "." with "const_period"
             - unify whether use lower case in vocab and parsing
@@ -107,7 +111,8 @@ class ConstituencyBasedGraphConstruction(StaticGraphConstructionBase):
             A customized graph data structure
         """
         output_graph_list = []
-        output = nlp_processor.annotate(
+        output = cached_annotate(
+            nlp_processor,
             paragraph.strip(),
             properties={
                 'annotators': "tokenize,ssplit,pos,parse",
@@ -118,69 +123,117 @@ class ConstituencyBasedGraphConstruction(StaticGraphConstructionBase):
                 'outputFormat': 'json'
             })
         parsed_output = json.loads(output)['sentences']
-        for index in range(len(parsed_output)):
-            output_graph_list.append(
-                cls._construct_static_graph(parsed_output[index], index))
-        ret_graph = cls._graph_connect(output_graph_list)
+        parsed_trees = [cls._parse_tree(parsed_output[index]['parse'], index) for index in range(len(parsed_output))]
+        ret_graph = cls._assemble_graph(parsed_trees)
         return ret_graph
 
+    @classmethod
+    def _parse_tree(cls, parse, sub_sentence_id):
+        """
+        Parse a bracketed constituency tree in a single pass.
+
+        Every constituent and every word becomes a node, and every node is linked from its parent constituent.
+        Nodes are numbered in the order of their opening bracket (or word) in `parse`.
+
+        Parameters
+        ----------
+        parse : str
+            The bracketed tree, e.g. ``(ROOT (S (NP (PRP I)) (VP (VBP love) (NP (PRP you)))))``.
+        sub_sentence_id : int
+            The index of the sentence in the paragraph.
+
+        Returns
+        -------
+        dict
+            ``token``, ``type`` (``1`` for constituents and ``0`` for words) and ``position_id`` for every node,
+            ``src`` and ``tgt`` for every edge, the ids of the first (``head``) and last (``tail``) words, or ``-1``
+            if there is no word, and ``node_num`` and ``sentence_id``.
+        """
+        parse_list = _PARSE_TOKEN.findall(parse)
+        token, node_type, position_id = [], [], []
+        src, tgt = [], []
+        stack = []
+        head = tail = -1
+        cnt_word_node = 0
+        for idx, item in enumerate(parse_list):
+            if item == '(':
+                node = len(token)
+                token.append(parse_list[idx + 1])
+                node_type.append(1)
+                position_id.append(None)
+                if stack:
+                    src.append(stack[-1])
+                    tgt.append(node)
+                stack.append(node)
+            elif item == ')':
+                stack.pop()
+            elif parse_list[idx + 1] == ')':
+                node = len(token)
+                token.append(item)
+                node_type.append(0)
+                position_id.append(cnt_word_node)
+                cnt_word_node += 1
+                src.append(stack[-1])
+                tgt.append(node)
+                if head < 0:
+                    head = node
+                tail = node
+        return {'token': token, 'type': node_type, 'position_id': position_id, 'src': src, 'tgt': tgt,
+                'head': head, 'tail': tail, 'node_num': len(token), 'sentence_id': sub_sentence_id}
+
+    @classmethod
+    def _assemble_graph(cls, parsed_trees):
+        """
+        Build the graph of a paragraph from its parsed sentences, offsetting the nodes of every sentence by
+        the number of nodes before it, and linking the tail word of every sentence to the head word of the next.
+
+        Parameters
+        ----------
+        parsed_trees : list
+            The sentences, as returned by ``_parse_tree``.
+
+        Returns
+        -------
+        GraphData
+            A customized graph data structure
+        """
+        node_nums = np.array([tree['node_num'] for tree in parsed_trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(node_nums)]).tolist()
+        node_num = offsets[-1]
+
+        attributes = {'token': [], 'type': [], 'position_id': [], 'sentence_id': [],
+                      'tail': np.zeros(node_num, dtype=bool), 'head': np.zeros(node_num, dtype=bool)}
+        src_list, tgt_list = [], []
+        for tree, offset in zip(parsed_trees, offsets):
+            for name in ('token', 'type', 'position_id'):
+                attributes[name].extend(tree[name])
+            attributes['sentence_id'].extend([tree['sentence_id']] * tree['node_num'])
+            src_list.append(np.asarray(tree['src'], dtype=np.int64) + offset)
+            tgt_list.append(np.asarray(tree['tgt'], dtype=np.int64) + offset)
+            if tree['head'] >= 0:
+                attributes['head'][offset + tree['head']] = True
+                attributes['tail'][offset + tree['tail']] = True
+
+        # Link the tail word of every sentence to the head word of the next one
+        for index in range(len(parsed_trees) - 1):
+            tail_node, head_node = parsed_trees[index]['tail'], parsed_trees[index + 1]['head']
+            if tail_node >= 0 and head_node >= 0:
+                src_list.append(np.array([offsets[index] + tail_node], dtype=np.int64))
+                tgt_list.append(np.array([offsets[index + 1] + head_node], dtype=np.int64))
+
+        res_graph = GraphData()
+        res_graph.add_nodes(node_num, attributes)
+        src = np.concatenate(src_list) if src_list else np.empty(0, dtype=np.int64)
+        if len(src) > 0:
+            res_graph.add_edges(src, np.concatenate(tgt_list))
+        return res_graph
+
     @classmethod
     def _construct_static_graph(cls,
                                parsed_object,
                                sub_sentence_id,
                                edge_strategy=None):
-        parsed_sentence_data = parsed_object['parse']
-        for punc in [u'(', u')']:
-            parsed_sentence_data = parsed_sentence_data.replace(
-                punc, ' ' + punc + ' ')
-        parse_list = (parsed_sentence_data).split()
-
-        res_graph = GraphData()
-        pstack = Stack()
-        idx = 0
-        cnt_word_node = -1
-        while idx < len(parse_list):
-            if parse_list[idx] == '(':
-                res_graph.add_nodes(1)
-                res_graph.node_attributes[res_graph.get_node_num(
-                ) - 1] = {'token': parse_list[idx + 1], 'type': 1, 'position_id': None, 'sentence_id': sub_sentence_id, 'tail': False, 'head': False}
-                pstack.push(res_graph.get_node_num() - 1)
-                if pstack.size() > 1:
-                    node_2 = pstack.pop()
-                    node_1 = pstack.pop()
-                    res_graph.add_edge(node_1, node_2)
-                    pstack.push(node_1)
-                    pstack.push(node_2)
-            elif parse_list[idx] == ')':
-                pstack.pop()
-            elif parse_list[idx + 1] == u')' and parse_list[idx] != u')':
-                cnt_word_node += 1
-                res_graph.add_nodes(1)
-                res_graph.node_attributes[res_graph.get_node_num(
-                ) - 1] = {'token': parse_list[idx], 'type': 0, 'position_id': cnt_word_node, 'sentence_id': sub_sentence_id, 'tail': False, 'head': False}
-                node_1 = pstack.pop()
-                if node_1 != res_graph.get_node_num() - 1:
-                    res_graph.add_edge(node_1, res_graph.get_node_num() - 1)
-                pstack.push(node_1)
-            idx += 1
-
-        max_pos = 0
-        for n in res_graph.node_attributes.values():
-            if n['type'] == 0 and n['position_id'] > max_pos:
-                max_pos = n['position_id']
-
-        min_pos = 99999
-        for n in res_graph.node_attributes.values():
-            if n['type'] == 0 and n['position_id'] < min_pos:
-                min_pos = n['position_id']
-
-        for n in res_graph.node_attributes.values():
-            if n['type'] == 0 and n['position_id'] == max_pos:
-                n['tail'] = True
-            if n['type'] == 0 and n['position_id'] == min_pos:
-                n['head'] = True
-        # print(res_graph.node_attributes)
-        return res_graph
+        return cls._assemble_graph([cls._parse_tree(parsed_object['parse'], sub_sentence_id)])
 
     @classmethod
     def _graph_connect(cls, graph_list, merge_strategy=None):
@@ -195,27 +248,21 @@ class ConstituencyBasedGraphConstruction(StaticGraphConstructionBase):
         GraphData
             A customized graph data structure
         """
-        _len_graph_ = len(graph_list)
         merged_graph = GraphData()
-        for index in range(_len_graph_):
-            len_merged_graph = merged_graph.get_node_num()
-            graph_i_nodes_attributes = {}
-            for dict_item in graph_list[index].node_attributes.items():
-                graph_i_nodes_attributes[dict_item[0] + len_merged_graph] = dict_item[1]
-            merged_graph.node_attributes.update(graph_i_nodes_attributes)
-
-        for index in range(_len_graph_ - 1):
-            # get head node
-            head_node = -1
-            for node_attr_item in merged_graph.node_attributes.items():
-                if node_attr_item[1]['sentence_id'] == index + 1 and node_attr_item[1]['type'] == 0 and node_attr_item[1]['head'] == True:
-                    head_node = node_attr_item[0]
-            # get tail node
-            tail_node = -1
-            for node_attr_item in merged_graph.node_attributes.items():
-                if node_attr_item[1]['sentence_id'] == index and node_attr_item[1]['type'] == 0 and node_attr_item[1]['tail'] == True:
-                    tail_node = node_attr_item[0]
-            merged_graph.add_edge(tail_node, head_node)
+        head_tail = []
+        for graph in graph_list:
+            offset = merged_graph.get_node_num()
+            attributes = graph.nodes[:].attributes
+            words = [node for node, node_type in attributes['type'].items() if node_type == 0]
+            head = [node for node in words if attributes['head'].get(node)]
+            tail = [node for node in words if attributes['tail'].get(node)]
+            head_tail.append((offset + head[-1] if head else -1, offset + tail[-1] if tail else -1))
+            merged_graph.union(graph)
+
+        for index in range(len(graph_list) - 1):
+            tail_node, head_node = head_tail[index][1], head_tail[index + 1][0]
+            if tail_node >= 0 and head_node >= 0:
+                merged_graph.add_edge(tail_node, head_node)
         return merged_graph
 
     def embedding(self, node_attributes, edge_attributes):
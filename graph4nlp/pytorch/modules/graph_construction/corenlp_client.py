@@ -0,0 +1,226 @@
+import asyncio
+import json
+import threading
+from urllib.parse import quote, urlsplit
+
+
+class CoreNLPError(Exception):
+    pass
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class AsyncCoreNLPClient(object):
+    """
+    An asyncio client of the CoreNLP server, with the ``annotate(text, properties)`` interface of
+    ``stanfordcorenlp.StanfordCoreNLP``.
+
+    Requests are sent over a pool of persistent (keep-alive) HTTP/1.1 connections, with at most
+    `max_concurrency` requests in flight. Failed requests (connection errors, timeouts and 5xx responses)
+    are retried with exponential backoff. The blocking ``annotate`` runs the request on an event loop
+    owned by the client, so it can be called from any number of threads, and ``annotate_many`` sends a
+    whole list of texts concurrently.
+
+    Parameters
+    ----------
+    url: str, optional
+        The url of the server, default: ``'http://localhost'``.
+    port: int, optional
+        The port of the server, default: ``9000``.
+    max_concurrency: int, optional
+        The maximum number of requests in flight, which is also the size of the connection pool. Default: ``8``.
+    timeout: float, optional
+        The timeout of a request in seconds, default: ``300``.
+    max_retries: int, optional
+        The number of times a failed request is retried, default: ``3``.
+    backoff: float, optional
+        The delay before the first retry in seconds, doubled at every retry. Default: ``0.5``.
+
+    Examples
+    --------
+    >>> nlp_processor = AsyncCoreNLPClient('http://localhost', port=9000, max_concurrency=16)
+    >>> graph = DependencyBasedGraphConstruction.topology(text, nlp_processor, merge_strategy=None,
+    ...                                                   edge_strategy=None)
+    >>> outputs = nlp_processor.annotate_many(texts, properties={'annotators': 'depparse', 'outputFormat': 'json'})
+    """
+
+    def __init__(self, url: str = 'http://localhost', port: int = 9000, max_concurrency: int = 8,
+                 timeout: float = 300, max_retries: int = 3, backoff: float = 0.5):
+        parts = urlsplit(url if '//' in url else 'http://' + url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or port
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._idle = []
+        self._lock = threading.Lock()
+
+    # Event loop management
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    # Connection pool
+    async def _acquire(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self.host, self.port)
+
+    def _release(self, connection, reusable: bool):
+        if reusable:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+
+    async def _request(self, text: str, properties: dict) -> str:
+        body = text.encode('utf-8')
+        path = '/?properties=' + quote(json.dumps(properties or {}))
+        request = ('POST {} HTTP/1.1\r\nHost: {}:{}\r\nConnection: keep-alive\r\n'
+                   'Content-Type: text/plain; charset=utf-8\r\nContent-Length: {}\r\n\r\n').format(
+            path, self.host, self.port, len(body)).encode('ascii') + body
+
+        connection = await self._acquire()
+        reader, writer = connection
+        reusable = False
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, headers, payload = await _read_response(reader)
+            reusable = headers.get('connection', '').lower() != 'close'
+        except (OSError, EOFError, asyncio.IncompleteReadError) as e:
+            raise _RetryableError('Connection to the CoreNLP server failed: {!r}'.format(e))
+        finally:
+            self._release(connection, reusable)
+
+        text = payload.decode('utf-8')
+        if status >= 500:
+            raise _RetryableError('CoreNLP server error {}: {}'.format(status, text))
+        if status != 200:
+            raise CoreNLPError('CoreNLP server error {}: {}'.format(status, text))
+        return text
+
+    async def annotate_async(self, text: str, properties: dict = None) -> str:
+        """
+        Annotate `text` with `properties`. Coroutine version of ``annotate``, to be awaited in the
+        event loop of the client.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await asyncio.wait_for(self._request(text, properties), self.timeout)
+                except (_RetryableError, asyncio.TimeoutError) as e:
+                    if attempt == self.max_retries:
+                        raise CoreNLPError('Annotation failed after {} attempts: {}'.format(attempt + 1, e))
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def annotate(self, text: str, properties: dict = None) -> str:
+        """
+        Annotate `text` with `properties`.
+
+        Parameters
+        ----------
+        text: str
+            The text to annotate.
+        properties: dict, optional
+            The annotation properties, e.g. ``{'annotators': 'depparse', 'outputFormat': 'json'}``.
+
+        Returns
+        -------
+        str
+            The response of the server.
+
+        Raises
+        ------
+        CoreNLPError
+            If the server rejects the request, or if it still fails after `max_retries` retries.
+        """
+        return self._run(self.annotate_async(text, properties))
+
+    def annotate_many(self, texts: list, properties: dict = None) -> list:
+        """
+        Annotate every text of `texts` with `properties`, keeping up to `max_concurrency` requests in flight.
+
+        Returns
+        -------
+        list of str
+            The responses of the server, in the order of `texts`.
+        """
+        async def gather():
+            return await asyncio.gather(*[self.annotate_async(text, properties) for text in texts])
+        return self._run(gather())
+
+    def close(self):
+        """
+        Close the pooled connections and stop the event loop of the client.
+        """
+        if self._loop is None:
+            return
+
+        async def close_connections():
+            while self._idle:
+                self._idle.pop()[1].close()
+        self._run(close_connections())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = self._semaphore = None
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in ('url', 'port', 'max_concurrency', 'timeout', 'max_retries',
+                                                    'backoff')}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """
+    Read an HTTP/1.1 response, with a body delimited either by its length or by chunked encoding.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise EOFError('The connection was closed by the server.')
+    status = int(status_line.split()[1])
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        payload = b''.join(chunks)
+    elif 'content-length' in headers:
+        payload = await reader.readexactly(int(headers['content-length']))
+    else:
+        payload = await reader.read()
+        headers['connection'] = 'close'
+    return status, headers, payload
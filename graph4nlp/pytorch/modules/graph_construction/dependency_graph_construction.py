@@ -1,9 +1,11 @@
 import json
 
+import numpy as np
 from stanfordcorenlp import StanfordCoreNLP
 
 from graph4nlp.pytorch.data.data import GraphData
 from graph4nlp.pytorch.modules.utils.vocab_utils import VocabModel
+from .annotation_cache import cached_annotate
 from .base import StaticGraphConstructionBase
 
 
@@ -90,56 +92,173 @@ class DependencyBasedGraphConstruction(StaticGraphConstructionBase):
             'ssplit.isOneSentence': False,
             'outputFormat': 'json'
         }
-        dep_json = nlp_processor.annotate(raw_text_data.strip(), properties=props)
+        dep_json = cached_annotate(nlp_processor, raw_text_data.strip(), props)
         dep_dict = json.loads(dep_json)
-        parsed_results = []
-        node_id = 0
-        for s_id, s in enumerate(dep_dict["sentences"]):
-            parsed_sent = []
-            unique_hash = {}
-            node_id = 0
-
-            for dep in s["basicDependencies"]:
-                if cls.verbase > 0:
-                    print(dep)
-                if unique_hash.get((dep['governor'], dep['governorGloss'])) is None:
-                    unique_hash[(dep['governor'], dep['governorGloss'])] = node_id
-                    node_id += 1
-                if unique_hash.get((dep['dependent'], dep['dependentGloss'])) is None:
-                    unique_hash[(dep['dependent'], dep['dependentGloss'])] = node_id
-                    node_id += 1
-                dep_info = {
-                    "edge_type": dep['dep'],
-                    'src': {
-                        'token': dep['governorGloss'],
-                        'position_id': dep['governor'] - 1 if dep['governorGloss'] != "ROOT" else None,
-                        'id': unique_hash[(dep['governor'], dep['governorGloss'])],
-                        "sentence_id": s_id
-                    },
-                    'tgt': {
-                        'token': dep['dependentGloss'],
-                        'position_id': dep['dependent'] - 1 if dep['dependentGloss'] != "ROOT" else None,
-                        'id': unique_hash[(dep['dependent'], dep['dependentGloss'])],
-                        "sentence_id": s_id
-                    }
-                }
-                if cls.verbase > 0:
-                    print(dep_info)
-                parsed_sent.append(dep_info)
+        parsed_results = [cls._parse_sentence(s_id, s["basicDependencies"]) for s_id, s in enumerate(dep_dict["sentences"])]
+
+        if merge_strategy not in (None, "tailhead", "sequential"):
+            # User defined strategies merge the per-sentence graphs with ``_graph_connect``
+            sub_graphs = []
+            for parsed_sent in parsed_results:
+                graph = cls._construct_static_graph(cls._to_graph_content(parsed_sent), edge_strategy=None)
+                sub_graphs.append(graph)
+            return cls._graph_connect(sub_graphs, merge_strategy)
+        return cls._assemble_graph(parsed_results, merge_strategy)
+
+    @classmethod
+    def _parse_sentence(cls, s_id, dependencies):
+        """
+            Number the nodes of the dependencies of one sentence, and collect its edges and node attributes
+            as flat lists.
+
+        Parameters
+        ----------
+        s_id: int
+            The index of the sentence.
+        dependencies: list[dict]
+            The ``basicDependencies`` of the sentence, as output by CoreNLP.
+
+        Returns
+        -------
+        parsed_sent: dict
+            ``src``, ``tgt`` and ``edge_type`` for every dependency, ``token``, ``position_id`` and ``type``
+            for every node, and ``node_num`` and ``sentence_id``.
+        """
+        unique_hash = {}
+        src, tgt, edge_type = [], [], []
+        token, position_id, node_type = [], [], []
+
+        for dep in dependencies:
+            if cls.verbase > 0:
+                print(dep)
+            # 2 for dependency parsing tree
+            dep_type = 2 if dep['governorGloss'] == "ROOT" else 0
+            ids = []
+            for position, gloss in ((dep['governor'], dep['governorGloss']),
+                                    (dep['dependent'], dep['dependentGloss'])):
+                node = unique_hash.get((position, gloss))
+                if node is None:
+                    node = unique_hash[(position, gloss)] = len(token)
+                    token.append(gloss)
+                    position_id.append(position - 1 if gloss != "ROOT" else None)
+                    node_type.append(dep_type)
+                else:
+                    node_type[node] = dep_type
+                ids.append(node)
+            src.append(ids[0])
+            tgt.append(ids[1])
+            edge_type.append(dep['dep'])
+        if cls.verbase > 0:
+            print(len(token))
+            print(len(src))
+        return {"src": src, "tgt": tgt, "edge_type": edge_type, "token": token, "position_id": position_id,
+                "type": node_type, "node_num": len(token), "sentence_id": s_id}
+
+    @staticmethod
+    def _to_graph_content(parsed_sent):
+        """
+            Convert a parsed sentence to the ``{"graph_content": [dep_info, ...], "node_num": n}`` form taken by
+            ``_construct_static_graph``.
+        """
+        def node_info(node):
+            return {'token': parsed_sent['token'][node], 'position_id': parsed_sent['position_id'][node],
+                    'id': node, 'sentence_id': parsed_sent['sentence_id']}
+
+        graph_content = [{"edge_type": edge_type, 'src': node_info(src), 'tgt': node_info(tgt)}
+                         for src, tgt, edge_type in zip(parsed_sent['src'], parsed_sent['tgt'],
+                                                        parsed_sent['edge_type'])]
+        return {"graph_content": graph_content, "node_num": parsed_sent['node_num']}
+
+    @classmethod
+    def _assemble_graph(cls, parsed_results, merge_strategy=None):
+        """
+            Build the merged graph of all sentences in one pass, with the same result as merging the
+            graphs of ``_construct_static_graph`` with ``_graph_connect``: the nodes of every sentence are
+            offset by the number of nodes before them, and the edges and node attributes of all sentences
+            are added at once, followed by the edges of `merge_strategy`.
+
+        Parameters
+        ----------
+        parsed_results: list[dict]
+            The parsed sentences, as returned by ``_parse_sentence``.
+        merge_strategy: None or str, option=[None, "tailhead", "sequential"]
+            Strategy to merge sub-graphs into one graph, see ``topology``.
+
+        Returns
+        -------
+        joint_graph: GraphData
+            The merged graph structure.
+        """
+        node_nums = np.array([parsed_sent['node_num'] for parsed_sent in parsed_results], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(node_nums)])
+        node_num = int(offsets[-1])
+
+        attributes = {'token': [], 'position_id': [], 'type': [], 'sentence_id': []}
+        src_list, tgt_list = [], []
+        for parsed_sent, offset in zip(parsed_results, offsets.tolist()):
+            for name in ('token', 'position_id', 'type'):
+                attributes[name].extend(parsed_sent[name])
+            attributes['sentence_id'].extend([parsed_sent['sentence_id']] * parsed_sent['node_num'])
+            src_list.append(np.asarray(parsed_sent['src'], dtype=np.int64) + offset)
+            tgt_list.append(np.asarray(parsed_sent['tgt'], dtype=np.int64) + offset)
+
+        single = len(parsed_results) == 1
+        if not single:
+            attributes['head'] = np.zeros(node_num, dtype=bool)
+            attributes['tail'] = np.zeros(node_num, dtype=bool)
+            if node_num > 0:
+                attributes['head'][0] = True
+                attributes['tail'][-1] = True
+
+            # merged edges
+            heads, tails = offsets[:-1], offsets[1:] - 1
+            if merge_strategy is None or merge_strategy == "tailhead":
+                merge_src, merge_tgt = tails[:-1], heads[1:]
+            elif merge_strategy == "sequential":
+                # The chain of every sentence, followed by the link from the previous sentence
+                merge_src, merge_tgt = [], []
+                for s_g_idx, (head, n_node) in enumerate(zip(heads.tolist(), node_nums.tolist())):
+                    chain = np.arange(head, head + n_node - 1, dtype=np.int64)
+                    merge_src.append(chain)
+                    merge_tgt.append(chain + 1)
+                    if s_g_idx != 0:
+                        merge_src.append(np.array([head - 1], dtype=np.int64))
+                        merge_tgt.append(np.array([head], dtype=np.int64))
+                merge_src, merge_tgt = np.concatenate(merge_src), np.concatenate(merge_tgt)
+            else:
+                raise NotImplementedError()
             if cls.verbase > 0:
-                print(node_id)
-                print(len(parsed_sent))
-            parsed_results.append({
-                "graph_content": parsed_sent,
-                "node_num": node_id
-            })
-
-        sub_graphs = []
-        for sent_id, parsed_sent in enumerate(parsed_results):
-            graph = cls._construct_static_graph(parsed_sent, edge_strategy=None)
-            sub_graphs.append(graph)
-        joint_graph = cls._graph_connect(sub_graphs, merge_strategy)
-        return joint_graph
+                print("merged edges")
+                print("src list:", merge_src.tolist())
+                print("tgt list:", merge_tgt.tolist())
+            src_list.append(merge_src)
+            tgt_list.append(merge_tgt)
+
+        g = GraphData()
+        g.add_nodes(node_num, attributes)
+        src = np.concatenate(src_list) if src_list else np.empty(0, dtype=np.int64)
+        tgt = np.concatenate(tgt_list) if tgt_list else np.empty(0, dtype=np.int64)
+        if len(src) > 0:
+            g.add_edges(src, tgt)
+
+        if single:
+            # A single sentence keeps the head and tail marks of its own graph
+            parsed_sent = parsed_results[0]
+            if 0 in parsed_sent['src']:
+                g.node_attributes[0]['head'] = True
+                g.node_attributes[0]['tail'] = False
+            if node_num - 1 in parsed_sent['tgt']:
+                g.node_attributes[node_num - 1]['head'] = False
+                g.node_attributes[node_num - 1]['tail'] = True
+
+        if cls.verbase > 0:
+            print("merged graph")
+            print("node_num: {}".format(g.get_node_num()))
+            for i in range(g.get_node_num()):
+                print(g.get_node_attrs(i))
+            print("edge_num: {}".format(g.get_edge_num()))
+            print(g.get_all_edges())
+        return g
 
     def embedding(self, node_attributes, edge_attributes):
         pass
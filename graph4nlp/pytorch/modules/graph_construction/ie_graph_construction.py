@@ -4,11 +4,78 @@ from stanfordcorenlp import StanfordCoreNLP
 
 from graph4nlp.pytorch.data.data import GraphData
 from graph4nlp.pytorch.modules.utils.vocab_utils import VocabModel
+from .annotation_cache import cached_annotate
 from .base import StaticGraphConstructionBase
 
 import networkx as nx
 
 
+def _remove_similar_triples(triples, gram_size=3):
+    """
+        Remove the near-duplicate triples.
+
+        Two triples ``i < j`` are similar if one of their ``' '``-joined strings contains the other, or if
+        they have the same subject + object, or the same relation + object (as concatenated strings).
+        Of every similar pair, the triple with the shorter relation is removed (``i`` on a tie).
+
+        The containment candidates are found with an index of the character n-grams of the joined strings,
+        and the pairs with equal concatenations are grouped by hash, so the cost is far below the
+        comparison of all pairs.
+
+    Parameters
+    ----------
+    triples: list of [subject, relation, object]
+        The distinct triples.
+
+    gram_size: int
+        The length of the character n-grams of the containment index.
+
+    Returns
+    -------
+    list of [subject, relation, object]
+        The remaining triples, in their original order.
+    """
+    rel_len = [len(triple[1]) for triple in triples]
+    removed = set()
+
+    def remove_from_pair(i, j):
+        removed.add(j if rel_len[i] > rel_len[j] else i)
+
+    # 1. Same subject + object, or same relation + object: every pair of a group is similar. Within a group,
+    # a triple is kept only if its relation is not shorter than the ones before it, and is longer than the ones after.
+    for key_fields in ((0, 2), (1, 2)):
+        groups = {}
+        for idx, triple in enumerate(triples):
+            groups.setdefault(triple[key_fields[0]] + triple[key_fields[1]], []).append(idx)
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            suffix_max = [-1] * len(members)
+            for pos in range(len(members) - 2, -1, -1):
+                suffix_max[pos] = max(suffix_max[pos + 1], rel_len[members[pos + 1]])
+            prefix_max = -1
+            for pos, idx in enumerate(members):
+                if not (rel_len[idx] >= prefix_max and rel_len[idx] > suffix_max[pos]):
+                    removed.add(idx)
+                prefix_max = max(prefix_max, rel_len[idx])
+
+    # 2. Containment of the joined strings, through the n-gram index: a string containing `text` contains
+    # its rarest n-gram, so only the strings listed under that n-gram need to be checked.
+    texts = [' '.join(triple) for triple in triples]
+    index = {}
+    for idx, text in enumerate(texts):
+        for gram in set(text[pos:pos + gram_size] for pos in range(len(text) - gram_size + 1)):
+            index.setdefault(gram, []).append(idx)
+    for idx, text in enumerate(texts):
+        grams = [text[pos:pos + gram_size] for pos in range(len(text) - gram_size + 1)]
+        candidates = min((index[gram] for gram in grams), key=len) if grams else range(len(texts))
+        for other in candidates:
+            if other != idx and text in texts[other]:
+                remove_from_pair(min(idx, other), max(idx, other))
+
+    return [triple for idx, triple in enumerate(triples) if idx not in removed]
+
+
 class IEBasedGraphConstruction(StaticGraphConstructionBase):
     """
         Information Extraction based graph construction class
@@ -85,8 +152,55 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
         graph: GraphData
             The merged graph data-structure.
         """
+        return cls.topology_many([raw_text_data], nlp_processor, merge_strategy, edge_strategy)[0]
+
+    @classmethod
+    def topology_many(cls, raw_texts, nlp_processor, merge_strategy, edge_strategy, max_request_chars=100000):
+        """
+            Build the graphs of several documents, running OpenIE once for all of them.
+
+            The coreferences are resolved document by document. The resolved sentences of all the
+            documents are then sent to OpenIE in as few requests as the size limit allows, one sentence
+            per line with ``ssplit.eolonly``, and the extracted triples are mapped back to their sentence by index.
+
+        Parameters
+        ----------
+        raw_texts: list of str
+            The documents, each of them can be multi-sentences.
+
+        nlp_processor: StanfordCoreNLP
+            NLP parsing tools
+
+        merge_strategy: None or str
+            Strategy to merge sub-graphs into one graph, see ``topology``.
+
+        edge_strategy: None or str
+            Strategy to process edge, see ``topology``.
+
+        max_request_chars: int, optional
+            The maximum number of characters of an OpenIE request, which should not exceed the
+            ``maxCharLength`` of the CoreNLP server. Default: ``100000``, the default of the server.
+
+        Returns
+        -------
+        graphs: list of GraphData
+            The graph of every document.
+        """
         cls.verbase = 1
+        resolved_documents = [cls._resolve_coreference(raw_text_data, nlp_processor) for raw_text_data in raw_texts]
+        document_triples = cls._extract_triples(resolved_documents, nlp_processor, max_request_chars)
+        return [cls._build_graph(sent_triples, merge_strategy, edge_strategy) for sent_triples in document_triples]
 
+    @classmethod
+    def _resolve_coreference(cls, raw_text_data, nlp_processor):
+        """
+            Resolve the coreferences of a document.
+
+        Returns
+        -------
+        resolved_sentences: list of str
+            The sentences of the document, in which pronouns are replaced by the entity they refer to.
+        """
         # Do coreference resolution on the whole 'raw_text_data'
         props_coref = {
             'annotators': 'tokenize, ssplit, pos, lemma, ner, parse, coref',
@@ -96,7 +210,7 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
             'ssplit.isOneSentence': False,
             'outputFormat': 'json'
         }
-        coref_json = nlp_processor.annotate(raw_text_data.strip(), properties=props_coref)
+        coref_json = cached_annotate(nlp_processor, raw_text_data.strip(), props_coref)
         coref_dict = json.loads(coref_json)
 
         # Extract and preserve necessary parsing results from coref_dict['sentences']
@@ -140,6 +254,30 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
             sentences[sent_id]['tokenWords'] = list(filter(lambda a: a != "", sentences[sent_id]['tokenWords']))
             sentences[sent_id]['resolvedText'] = ' '.join(sentences[sent_id]['tokenWords'])
 
+        return [sent['resolvedText'] for sent in sentences]
+
+    @classmethod
+    def _extract_triples(cls, resolved_documents, nlp_processor, max_request_chars=100000):
+        """
+            Extract the OpenIE triples of the resolved sentences of several documents, with one request
+            per chunk of at most `max_request_chars` characters.
+
+        Parameters
+        ----------
+        resolved_documents: list of list of str
+            The resolved sentences of every document.
+
+        nlp_processor: StanfordCoreNLP
+            NLP parsing tools
+
+        max_request_chars: int, optional
+            The maximum number of characters of a request. A longer sentence is sent alone.
+
+        Returns
+        -------
+        document_triples: list of list of list of dict
+            For every document and every sentence, the triples extracted by OpenIE.
+        """
         # use OpenIE to extract triples from resolvedText
         props_openie = {
             'annotators': 'tokenize, ssplit, pos, ner, parse, openie',
@@ -147,17 +285,46 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
                 "splitHyphenated=true,normalizeParentheses=true,normalizeOtherBrackets=true",
             "tokenize.whitespace": False,
             'ssplit.isOneSentence': False,
+            'ssplit.eolonly': True,
             'outputFormat': 'json',
             "openie.triple.strict": "true"
         }
 
-        all_sent_triples = {}
-        for sent in sentences:
-            resolved_sent = sent['resolvedText']
-            openie_json = nlp_processor.annotate(resolved_sent.strip(), properties=props_openie)
+        # One line per sentence, empty sentences are skipped since they yield no sentence in the output
+        lines, owners = [], []
+        for doc_id, resolved_sentences in enumerate(resolved_documents):
+            for resolved_sent in resolved_sentences:
+                line = ' '.join(resolved_sent.split())
+                if line:
+                    lines.append(line)
+                    owners.append(doc_id)
+
+        # Split the lines into chunks [start, end) under the character budget, new lines included
+        chunks, start, num_chars = [], 0, 0
+        for idx, line in enumerate(lines):
+            if idx > start and num_chars + 1 + len(line) > max_request_chars:
+                chunks.append((start, idx))
+                start, num_chars = idx, 0
+            num_chars += len(line) + (1 if idx > start else 0)
+        if len(lines) > 0:
+            chunks.append((start, len(lines)))
+
+        document_triples = [[] for _ in resolved_documents]
+        for start, end in chunks:
+            openie_json = cached_annotate(nlp_processor, '\n'.join(lines[start:end]), props_openie)
             openie_dict = json.loads(openie_json)
+            for sent in openie_dict['sentences']:
+                document_triples[owners[start + sent['index']]].append(sent['openie'])
+        return document_triples
 
-            for triple_dict in openie_dict['sentences'][0]['openie']:
+    @classmethod
+    def _build_graph(cls, sent_triples, merge_strategy, edge_strategy):
+        """
+            Build the graph of a document from the OpenIE triples of its sentences.
+        """
+        all_sent_triples = {}
+        for triples in sent_triples:
+            for triple_dict in triples:
                 sbj = triple_dict['subject']
                 rel = triple_dict['relation']
                 if rel in ['was', 'is', 'were', 'are']:
@@ -175,21 +342,7 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
         all_sent_triples_list = list(all_sent_triples.values())  # triples extracted from all sentences
 
         # remove similar triples
-        triples_rm_list = []
-        for i, lst_i in enumerate(all_sent_triples_list[:-1]):
-            for j, lst_j in enumerate(all_sent_triples_list[i+1:]):
-                str_i = ' '.join(lst_i)
-                str_j = ' '.join(lst_j)
-                if str_i in str_j or str_j in str_i or \
-                        lst_i[0]+lst_i[2]==lst_j[0]+lst_j[2] or \
-                        lst_i[1]+lst_i[2]==lst_j[1]+lst_j[2]:
-                    if len(lst_i[1])>len(lst_j[1]):
-                        triples_rm_list.append(lst_j)
-                    else:
-                        triples_rm_list.append(lst_i)
-
-        for lst in triples_rm_list:
-            all_sent_triples_list.remove(lst)
+        all_sent_triples_list = _remove_similar_triples(all_sent_triples_list)
 
         global_triples = cls._graph_connect(all_sent_triples_list, merge_strategy)
         all_sent_triples_list.extend(global_triples)
@@ -197,55 +350,53 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
         parsed_results = {}
         parsed_results['graph_content'] = []
         graph_nodes = []
-        for triple in all_sent_triples_list:
-            if edge_strategy is None or edge_strategy == "homogeneous":
-                if triple[0] not in graph_nodes:
-                    graph_nodes.append(triple[0])
+        node_ids = {}
 
-                if triple[2] not in graph_nodes:
-                    graph_nodes.append(triple[2])
+        def intern_node(node):
+            # Map a node to its id, adding it to `graph_nodes` when it is seen for the first time
+            if node not in node_ids:
+                node_ids[node] = len(graph_nodes)
+                graph_nodes.append(node)
+            return node_ids[node]
 
+        for triple in all_sent_triples_list:
+            if edge_strategy is None or edge_strategy == "homogeneous":
                 triple_info = {'edge_tokens': triple[1].split(),
                                'src': {
                                    'tokens': triple[0].split(),
-                                   'id': graph_nodes.index(triple[0])
+                                   'id': intern_node(triple[0])
                                },
                                'tgt': {
                                    'tokens': triple[2].split(),
-                                   'id': graph_nodes.index(triple[2])
+                                   'id': intern_node(triple[2])
                                }}
                 parsed_results['graph_content'].append(triple_info)
             elif edge_strategy == "as_node":
-                if triple[0] not in graph_nodes:
-                    graph_nodes.append(triple[0])
-
-                if triple[1] not in graph_nodes:
-                    graph_nodes.append(triple[1])
-
-                if triple[2] not in graph_nodes:
-                    graph_nodes.append(triple[2])
+                # Intern the nodes in the order subject, relation, object
+                for node in triple:
+                    intern_node(node)
 
                 triple_info_0_1 = {'edge_tokens': [],
                                'src': {
                                    'tokens': triple[0].split(),
-                                   'id': graph_nodes.index(triple[0]),
+                                   'id': intern_node(triple[0]),
                                    'type': 'ent_node'
                                },
                                'tgt': {
                                    'tokens': triple[1].split(),
-                                   'id': graph_nodes.index(triple[1]),
+                                   'id': intern_node(triple[1]),
                                    'type': 'edge_node'
                                }}
 
                 triple_info_1_2 = {'edge_tokens': [],
                                    'src': {
                                        'tokens': triple[1].split(),
-                                       'id': graph_nodes.index(triple[1]),
+                                       'id': intern_node(triple[1]),
                                        'type': 'edge_node'
                                    },
                                    'tgt': {
                                        'tokens': triple[2].split(),
-                                       'id': graph_nodes.index(triple[2]),
+                                       'id': intern_node(triple[2]),
                                        'type': 'ent_node'
                                    }}
 
@@ -350,15 +501,15 @@ class IEBasedGraphConstruction(StaticGraphConstructionBase):
         """
 
         if merge_strategy == 'global':
-            graph_nodes = []
+            graph_nodes = set()
             global_triples = []
             for triple in triple_list:
                 if triple[0] not in graph_nodes:
-                    graph_nodes.append(triple[0])
+                    graph_nodes.add(triple[0])
                     global_triples.append([triple[0], 'global', 'GLOBAL_NODE'])
 
                 if triple[2] not in graph_nodes:
-                    graph_nodes.append(triple[2])
+                    graph_nodes.add(triple[2])
 
             return global_triples
         elif merge_strategy == None:
@@ -100,8 +100,13 @@ class NodeEmbeddingBasedGraphConstruction(DynamicGraphConstructionBase):
         GraphData
             The constructed graph.
         """
-        adj = self.compute_similarity_metric(node_emb, node_mask)
-        adj = self.sparsify_graph(adj)
+        if self.lsh_num_tables is not None:
+            adj = self.compute_ann_knn_graph(node_emb, node_mask)
+        elif self.knn_block_size is not None:
+            adj = self.compute_knn_graph(node_emb, node_mask)
+        else:
+            adj = self.compute_similarity_metric(node_emb, node_mask)
+            adj = self.sparsify_graph(adj)
         graph_reg = self.compute_graph_regularization(adj, node_emb)
 
         dgl_graph = convert_adj_to_dgl_graph(adj, self.mask_off_val, use_edge_softmax=True)
@@ -109,6 +114,36 @@ class NodeEmbeddingBasedGraphConstruction(DynamicGraphConstructionBase):
 
         return dgl_graph
 
+    def batch_topology(self, node_emb, batch_num_nodes, node_mask=None):
+        """Compute the graph topology of a batch of node sets of different sizes,
+        see ``compute_batched_graph``.
+
+        Parameters
+        ----------
+        node_emb : torch.Tensor
+            The node embeddings of all the node sets, concatenated.
+        batch_num_nodes : torch.LongTensor or list of int
+            The number of nodes of every node set.
+        node_mask : torch.Tensor, optional
+            The mask of the valid nodes, of size ``sum(batch_num_nodes)``, default: ``None``.
+
+        Returns
+        -------
+        dgl.DGLGraph
+            The batched graph. The nodes of graph ``i`` start at offset
+            ``sum(batch_num_nodes[:i])``, and ``graph_reg`` is the mean of the
+            regularization losses of the graphs.
+        """
+        batch_num_nodes = torch.as_tensor(batch_num_nodes, device=node_emb.device)
+        adj = self.compute_batched_graph(node_emb, batch_num_nodes, node_mask)
+        graph_reg = self.compute_graph_regularization(adj, node_emb, batch_num_nodes)
+
+        dgl_graph = convert_adj_to_dgl_graph(adj, self.mask_off_val, use_edge_softmax=True,
+                                             batch_num_nodes=batch_num_nodes)
+        dgl_graph.graph_reg = graph_reg
+
+        return dgl_graph
+
 
     def embedding(self, node_word_idx, node_size, num_nodes):
         """Compute initial node embeddings.
@@ -63,6 +63,8 @@ class NodeEmbeddingBasedRefinedGraphConstruction(DynamicGraphConstructionBase):
                                                             embedding_styles,
                                                             **kwargs)
         assert 0 <= alpha_fusion <= 1, 'alpha_fusion should be a `float` number between 0 and 1'
+        assert self.knn_block_size is None, 'knn_block_size is not supported by refined graph construction'
+        assert self.lsh_num_tables is None, 'lsh_num_tables is not supported by refined graph construction'
         self.alpha_fusion = alpha_fusion
 
     def forward(self, init_norm_adj, node_word_idx, node_size, num_nodes, node_mask=None):
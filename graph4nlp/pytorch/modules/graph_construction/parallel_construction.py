@@ -0,0 +1,133 @@
+import itertools
+import multiprocessing
+import os
+import traceback
+from collections import deque, namedtuple
+
+import tqdm
+
+from .annotation_cache import get_annotation_cache, set_annotation_cache
+
+ConstructionResult = namedtuple('ConstructionResult', ['index', 'graph', 'error'])
+
+# The state of a worker process, set up once by `_init_worker`
+_worker_state = dict()
+
+# The number of chunks of documents queued per worker process, which bounds how far ahead of the
+# consumer the documents are read
+_CHUNKS_PER_WORKER = 4
+
+
+def _init_worker(constructor, nlp_processor_factory, annotation_cache, topology_kwargs):
+    if annotation_cache is not None:
+        set_annotation_cache(annotation_cache)
+    _worker_state['constructor'] = constructor
+    _worker_state['nlp_processor'] = nlp_processor_factory() if nlp_processor_factory is not None else None
+    _worker_state['topology_kwargs'] = topology_kwargs
+
+
+def _construct_one(item) -> ConstructionResult:
+    index, text = item
+    try:
+        graph = _worker_state['constructor'].topology(text, _worker_state['nlp_processor'],
+                                                      **_worker_state['topology_kwargs'])
+        return ConstructionResult(index=index, graph=graph, error=None)
+    except Exception:
+        return ConstructionResult(index=index, graph=None, error=traceback.format_exc())
+
+
+def _construct_chunk(items) -> list:
+    return [_construct_one(item) for item in items]
+
+
+def _imap_bounded(pool, num_workers: int, items, chunksize: int):
+    """
+    Map ``_construct_one`` over `items` with `pool`, in order, reading `items` only as far as needed to
+    keep ``_CHUNKS_PER_WORKER`` chunks queued per worker. Unlike ``Pool.imap``, which reads the whole
+    iterable ahead, the memory does not grow with the size of the corpus.
+    """
+    chunks = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    pending = deque(pool.apply_async(_construct_chunk, (chunk,))
+                    for chunk in itertools.islice(chunks, num_workers * _CHUNKS_PER_WORKER))
+    while pending:
+        results = pending.popleft().get()
+        for chunk in itertools.islice(chunks, 1):
+            pending.append(pool.apply_async(_construct_chunk, (chunk,)))
+        yield from results
+
+
+def construct_many(constructor, texts, nlp_processor_factory=None, num_workers: int = None, chunksize: int = 1,
+                   writer=None, progress: bool = True, **topology_kwargs):
+    """
+    Construct the graphs of a corpus in parallel, with a pool of worker processes.
+
+    Every worker creates its own parser client with `nlp_processor_factory` and builds graphs with
+    ``constructor.topology(text, nlp_processor, **topology_kwargs)``. The results are streamed back
+    in the order of `texts` as soon as they are ready. `texts` is read lazily, a few chunks per worker
+    ahead of the results, so a corpus larger than memory can be streamed. A document whose construction
+    raises an exception does not stop the others: its result holds the formatted traceback instead of a graph.
+
+    Parameters
+    ----------
+    constructor: type
+        A static graph construction class, e.g. ``DependencyBasedGraphConstruction``.
+    texts: iterable of str
+        The documents.
+    nlp_processor_factory: callable, optional
+        A picklable function without argument returning a parser client, e.g.
+        ``functools.partial(StanfordCoreNLP, 'http://localhost', port=9000)``. Default: ``None`` to pass
+        ``None`` as the parser.
+    num_workers: int, optional
+        The number of worker processes, default: ``None`` for the number of CPUs. ``0`` builds the graphs
+        in the calling process.
+    chunksize: int, optional
+        The number of documents sent to a worker at once, default: ``1``.
+    writer: GraphShardWriter, optional
+        If given, every graph successfully built is also written to it, in order. Default: ``None``.
+    progress: bool, optional
+        Whether to display a progress bar with the number of failures, default: ``True``.
+    topology_kwargs: dict
+        The other arguments of ``constructor.topology``, e.g. ``merge_strategy`` and ``edge_strategy``.
+
+    Returns
+    -------
+    generator of ConstructionResult
+        ``(index, graph, error)`` for every document, in input order.
+
+    Examples
+    --------
+    >>> parser_factory = functools.partial(StanfordCoreNLP, 'http://localhost', port=9000, timeout=300000)
+    >>> for result in construct_many(DependencyBasedGraphConstruction, texts, parser_factory, num_workers=8,
+    ...                              merge_strategy='tailhead', edge_strategy=None):
+    ...     if result.error is not None:
+    ...         print('Document {} failed:\\n{}'.format(result.index, result.error))
+    """
+    total = len(texts) if hasattr(texts, '__len__') else None
+    items = enumerate(texts)
+    init_args = (constructor, nlp_processor_factory, get_annotation_cache(), topology_kwargs)
+
+    pool = None
+    if num_workers == 0:
+        _init_worker(*init_args)
+        results = map(_construct_one, items)
+    else:
+        num_workers = num_workers or os.cpu_count()
+        pool = multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=init_args)
+        results = _imap_bounded(pool, num_workers, items, chunksize)
+
+    progress_bar = tqdm.tqdm(total=total, disable=not progress, desc=constructor.__name__)
+    num_failures = 0
+    try:
+        for result in results:
+            if result.error is not None:
+                num_failures += 1
+                progress_bar.set_postfix(failures=num_failures)
+            elif writer is not None:
+                writer.write(result.graph)
+            progress_bar.update(1)
+            yield result
+    finally:
+        progress_bar.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
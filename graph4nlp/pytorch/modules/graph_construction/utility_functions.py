@@ -1,5 +1,7 @@
 import copy
 
+import numpy as np
+
 
 class Node():
     """
@@ -110,6 +112,29 @@ class UtilityFunctionsForGraph():
                 g.add_edge(in_, out_)
         return g
 
+    @staticmethod
+    def prune_line_nodes(g):
+        """Remove intermediate nodes organized like a line from a ``GraphData``, i.e. nodes with one in-edge and one
+        out-edge, and link the two ends of every line. Runs in linear time on the degree arrays of `g`, and returns
+        the compacted graph, whose ``parent_node_ids`` map its nodes to the nodes of `g`."""
+        pass_through = np.flatnonzero((g.in_degrees() == 1) & (g.out_degrees() == 1))
+        return g.contract_nodes(pass_through)
+
+    @staticmethod
+    def prune_pos_nodes(g):
+        """Remove the part-of-speech nodes of a ``GraphData``, e.g. \"NN\", \"JJ\", i.e. non-word nodes with one
+        in-edge and one out-edge pointing to a word node (of type 0), and link their parent to the word. Runs in
+        linear time on the degree arrays of `g`, and returns the compacted graph, whose ``parent_node_ids`` map
+        its nodes to the nodes of `g`."""
+        node_types = np.full(g.get_node_num(), -1, dtype=np.int64)
+        type_attrs = g.nodes[:].attributes['type']
+        node_types[list(type_attrs.keys())] = list(type_attrs.values())
+
+        adj = g.adj('csr')
+        pass_through = np.flatnonzero((g.in_degrees() == 1) & (g.out_degrees() == 1))
+        successors = adj.indices[adj.indptr[pass_through]]
+        return g.contract_nodes(pass_through[(node_types[successors] == 0) & (node_types[pass_through] != 0)])
+
     @staticmethod
     def get_seq_nodes(g):
         """Return word nodes in a syntactic graph."""
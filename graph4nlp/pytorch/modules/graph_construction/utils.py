@@ -1,4 +1,3 @@
-from scipy import sparse
 import torch
 import dgl
 from dgl.nn.pytorch.softmax import edge_softmax
@@ -7,13 +6,49 @@ from ..utils.generic_utils import to_cuda
 from ..utils.constants import INF
 
 
-def convert_adj_to_dgl_graph(adj, mask_off_val, use_edge_softmax=False):
-    """Convert adjacency matrix to DGLGraph
+def convert_adj_to_dgl_graph(adj, mask_off_val, use_edge_softmax=False, batch_num_nodes=None):
+    """Convert adjacency matrix to DGLGraph.
+
+    The edges are extracted on the device of ``adj`` and the graph is built there
+    from index tensors, without copying the matrix to the host.
+
+    Parameters
+    ----------
+    adj : torch.Tensor
+        The N x N dense or sparse (COO) adjacency matrix. The entries of a dense
+        matrix equal to ``mask_off_val`` are not edges, and every stored entry of
+        a sparse matrix is an edge, so sparse matrices are never densified.
+    mask_off_val : float
+        The value of the missing edges of a dense matrix.
+    use_edge_softmax : boolean, optional
+        Specify whether to normalize the edge weights with a softmax over the
+        incoming edges of every node, default: ``False``.
+    batch_num_nodes : torch.LongTensor, optional
+        The number of nodes of every graph when ``adj`` is the block-diagonal
+        adjacency matrix of a batch, whose edges are sorted by source node. The
+        returned graph is then a batched graph, see ``dgl.unbatch``. Default:
+        ``None`` for a single graph.
+
+    Returns
+    -------
+    dgl.DGLGraph
+        The graph, on the device of ``adj``, with the edge weights in ``edata['a']``.
     """
-    binarized_adj = sparse.coo_matrix(adj.detach().cpu().numpy() != mask_off_val)
-    dgl_graph = dgl.DGLGraph(binarized_adj)
-    edge_weight = adj[adj != mask_off_val]
+    if adj.is_sparse:
+        adj = adj.coalesce()
+        src, dst = adj.indices()
+        edge_weight = adj.values()
+    else:
+        src, dst = (adj != mask_off_val).nonzero(as_tuple=True)
+        edge_weight = adj[src, dst]
 
+    dgl_graph = dgl.graph((src, dst), num_nodes=adj.size(0))
+    if batch_num_nodes is not None:
+        batch_num_nodes = torch.as_tensor(batch_num_nodes, device=src.device)
+        node_graph = torch.repeat_interleave(torch.arange(batch_num_nodes.numel(), device=src.device),
+                                             batch_num_nodes)
+        dgl_graph.set_batch_num_nodes(batch_num_nodes)
+        dgl_graph.set_batch_num_edges(torch.bincount(node_graph[src], minlength=batch_num_nodes.numel()))
     if use_edge_softmax:
         edge_weight = edge_softmax(dgl_graph, edge_weight)
 
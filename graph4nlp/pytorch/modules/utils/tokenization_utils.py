@@ -0,0 +1,137 @@
+import multiprocessing
+import re
+import threading
+from collections import OrderedDict
+
+from nltk.tokenize import word_tokenize
+
+# Words (with inner hyphens and periods, e.g. "corner-shop", "3.50"), the "n't" and "'s"-like clitics
+# split as in the Penn Treebank, ellipses and single punctuation marks
+_TOKEN_PATTERN = re.compile(r"\w+(?=n't\b)|n't\b|'(?:s|re|ve|ll|d|m)\b|\w+(?:[-.]\w+)*|\.\.\.|[^\w\s]",
+                            re.IGNORECASE)
+
+
+def regex_tokenize(text: str) -> list:
+    """
+    A fast pure-regex word tokenizer, following the conventions of ``nltk.tokenize.word_tokenize``
+    on most text, e.g. ``"don't go."`` gives ``['do', "n't", 'go', '.']``. Unlike NLTK, abbreviations
+    lose their final period (``"U.S."`` gives ``['U.S', '.']``).
+    """
+    return _TOKEN_PATTERN.findall(text)
+
+
+class Tokenizer(object):
+    """
+    A word tokenizer memoizing its results in a bounded LRU cache keyed on the raw string.
+
+    A ``Tokenizer`` is a drop-in replacement of tokenization functions: it can be passed as the `tokenizer`
+    of ``VocabModel``, ``Vocab``, ``collect_vocabs`` and ``DynamicGraphConstructionBase.raw_text_to_init_graph``.
+    Sharing the same instance among them tokenizes every sentence only once.
+
+    Parameters
+    ----------
+    tokenize_fn: callable, optional
+        The tokenization function, from a string to a list of tokens. It must be picklable (e.g. a
+        module-level function) to tokenize with worker processes. Default: ``nltk.tokenize.word_tokenize``.
+    capacity: int, optional
+        The number of tokenized strings kept in the cache, default: ``65536``.
+
+    Examples
+    --------
+    >>> tokenizer = Tokenizer(regex_tokenize)
+    >>> vocab_model = VocabModel(data_set, tokenizer=tokenizer, word_emb_size=300)
+    >>> token_lists = tokenizer.tokenize_many(sentences, num_workers=4)
+    """
+
+    def __init__(self, tokenize_fn=word_tokenize, capacity: int = 65536):
+        self.tokenize_fn = tokenize_fn
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, text: str):
+        with self._lock:
+            tokens = self._cache.get(text)
+            if tokens is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+            return tokens
+
+    def _remember(self, text: str, tokens: tuple):
+        with self._lock:
+            self.misses += 1
+            self._cache[text] = tokens
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def __call__(self, text: str) -> list:
+        """
+        Tokenize `text`.
+
+        Returns
+        -------
+        list of str
+            The tokens, in a new list which can be modified by the caller.
+        """
+        tokens = self._lookup(text)
+        if tokens is None:
+            tokens = tuple(self.tokenize_fn(text))
+            self._remember(text, tokens)
+        return list(tokens)
+
+    def tokenize_many(self, texts, num_workers: int = 0, chunksize: int = 256) -> list:
+        """
+        Tokenize a batch of strings. Cached strings are read from the cache, and the other distinct
+        strings are tokenized once, optionally by a pool of worker processes.
+
+        Parameters
+        ----------
+        texts: iterable of str
+            The strings to tokenize.
+        num_workers: int, optional
+            The number of worker processes, default: ``0`` to tokenize in the calling process.
+        chunksize: int, optional
+            The number of strings sent to a worker at once, default: ``256``.
+
+        Returns
+        -------
+        list of list of str
+            The tokens of every string, in the order of `texts`.
+        """
+        texts = list(texts)
+        results = [self._lookup(text) for text in texts]
+        missing = list(OrderedDict.fromkeys(text for text, tokens in zip(texts, results) if tokens is None))
+        if len(missing) > 0:
+            if num_workers > 0:
+                with multiprocessing.Pool(num_workers) as pool:
+                    token_lists = pool.map(self.tokenize_fn, missing, chunksize=chunksize)
+            else:
+                token_lists = map(self.tokenize_fn, missing)
+            tokenized = {text: tuple(tokens) for text, tokens in zip(missing, token_lists)}
+            for text, tokens in tokenized.items():
+                self._remember(text, tokens)
+            results = [tokenized[text] if tokens is None else tokens for text, tokens in zip(texts, results)]
+        return [list(tokens) for tokens in results]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Pickled copies, e.g. saved with a vocab model or sent to other processes, start with an empty cache
+        state['_cache'] = OrderedDict()
+        state['hits'] = state['misses'] = 0
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+# The tokenizer shared by default by the vocabulary and graph construction modules
+default_tokenizer = Tokenizer()
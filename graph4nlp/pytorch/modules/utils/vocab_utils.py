@@ -1,12 +1,13 @@
+import itertools
 import os
 import re
 import pickle
 import numpy as np
 from collections import Counter
 from functools import lru_cache
-from nltk.tokenize import word_tokenize
 
 from . import constants
+from .tokenization_utils import default_tokenizer
 
 
 word_detector = re.compile('\w')
@@ -19,7 +20,7 @@ class VocabModel(object):
     data_set: iterable
         A list of instances where each instance is a list of str.
     tokenizer: function, optional
-        Word tokenization function, default: nltk.tokenize.word_tokenize.
+        Word tokenization function, default: ``default_tokenizer``, a memoized nltk.tokenize.word_tokenize.
     max_word_vocab_size: int, optional
         Maximal word vocab size, default: ``None``.
     min_word_vocab_freq: int, optional
@@ -47,13 +48,13 @@ class VocabModel(object):
                             word_emb_size=300)
     >>> print(vocab_model.word_vocab.get_vocab_size())
     """
-    def __init__(self, data_set, tokenizer=word_tokenize,
+    def __init__(self, data_set, tokenizer=default_tokenizer,
                                 max_word_vocab_size=None,
                                 min_word_vocab_freq=1,
                                 pretrained_word_emb_file=None,
                                 word_emb_size=None):
         super(VocabModel, self).__init__()
-        self.tokenizer = word_tokenize
+        self.tokenizer = tokenizer
 
         print('Building vocabs...')
         all_words = collect_vocabs(data_set, self.tokenizer)
@@ -86,7 +87,7 @@ class VocabModel(object):
     @classmethod
     def build(cls, saved_vocab_file,
             data_set=None,
-            tokenizer=word_tokenize,
+            tokenizer=default_tokenizer,
             max_word_vocab_size=None,
             min_word_vocab_freq=1,
             pretrained_word_emb_file=None,
@@ -100,7 +101,7 @@ class VocabModel(object):
         data_set: iterable
             A list of instances where each instance is a list of str.
         tokenizer: function, optional
-            Word tokenization function, default: nltk.tokenize.word_tokenize.
+            Word tokenization function, default: ``default_tokenizer``, a memoized nltk.tokenize.word_tokenize.
         max_word_vocab_size: int, optional
             Maximal word vocab size, default: ``None``.
         min_word_vocab_freq: int, optional
@@ -136,7 +137,7 @@ class Vocab(object):
     Parameters
     ----------
     tokenizer: function, optional
-        Word tokenization function, default: nltk.tokenize.word_tokenize.
+        Word tokenization function, default: ``default_tokenizer``, a memoized nltk.tokenize.word_tokenize.
 
     Examples
     -------
@@ -144,7 +145,7 @@ class Vocab(object):
     >>> word_vocab.build_vocab({'i': 10, 'like': 5, 'nlp': 3})
     >>> print(word_vocab.get_vocab_size())
     """
-    def __init__(self, tokenizer=word_tokenize):
+    def __init__(self, tokenizer=default_tokenizer):
         super(Vocab, self).__init__()
         self.tokenizer = tokenizer
         self.PAD = 0
@@ -281,14 +282,20 @@ class Vocab(object):
             seq.append(idx)
         return seq
 
-def collect_vocabs(all_instances, tokenizer):
-    """Count vocabulary tokens."""
+def collect_vocabs(all_instances, tokenizer, batch_size=4096):
+    """Count vocabulary tokens. The sentences are streamed in batches of `batch_size`, each of them
+    tokenized at once if `tokenizer` is a ``Tokenizer``, so that the corpus is never held in memory."""
     all_words = Counter()
-    for instance in all_instances:
-        # TODO: need to check which elements should be added to vocab
-        # Or sentence.node_attr, sentence.edge_attr
-        for sentence in instance:
-            all_words.update(tokenizer(sentence))
+    # TODO: need to check which elements should be added to vocab
+    # Or sentence.node_attr, sentence.edge_attr
+    sentences = (sentence for instance in all_instances for sentence in instance)
+    for batch in iter(lambda: list(itertools.islice(sentences, batch_size)), []):
+        if hasattr(tokenizer, 'tokenize_many'):
+            token_lists = tokenizer.tokenize_many(batch)
+        else:
+            token_lists = map(tokenizer, batch)
+        for tokens in token_lists:
+            all_words.update(tokens)
     return all_words
 
 
@@ -0,0 +1,57 @@
+"""
+Benchmark of edge insertion into a GraphData which already holds edge features.
+
+Both the edge-by-edge path (``add_edge``) and the bulk path (``add_edges``) should scale linearly
+with the number of edges, i.e. the time per edge should stay flat while the graph grows.
+
+Usage: python -m graph4nlp.pytorch.test.data_structure.run_edge_insertion_benchmark
+"""
+import time
+
+import numpy as np
+import torch
+
+from ...data.data import GraphData
+
+num_nodes = 10000
+feat_dim = 16
+edge_nums = [10000, 100000, 1000000]
+
+
+def build_graph():
+    g = GraphData()
+    g.add_nodes(num_nodes)
+    g.add_edge(0, 1)
+    g.edge_features['edge_feat'] = torch.rand((1, feat_dim))
+    g.edge_features['edge_weight'] = torch.rand(1)
+    return g
+
+
+def bench_add_edge(num_edges):
+    g = build_graph()
+    src = np.random.randint(0, num_nodes, num_edges).tolist()
+    tgt = np.random.randint(0, num_nodes, num_edges).tolist()
+    t0 = time.time()
+    for u, v in zip(src, tgt):
+        g.add_edge(u, v)
+    return time.time() - t0
+
+
+def bench_add_edges(num_edges, chunk_size=1000):
+    g = build_graph()
+    src = np.random.randint(0, num_nodes, num_edges)
+    tgt = np.random.randint(0, num_nodes, num_edges)
+    t0 = time.time()
+    for st in range(0, num_edges, chunk_size):
+        g.add_edges(src[st:st + chunk_size], tgt[st:st + chunk_size])
+    return time.time() - t0
+
+
+if __name__ == '__main__':
+    print('{:>10} {:>14} {:>16} {:>14} {:>16}'.format('edges', 'add_edge (s)', 'us per edge', 'add_edges (s)',
+                                                     'us per edge'))
+    for num_edges in edge_nums:
+        t_single = bench_add_edge(num_edges)
+        t_bulk = bench_add_edges(num_edges)
+        print('{:>10} {:>14.3f} {:>16.3f} {:>14.3f} {:>16.3f}'.format(num_edges, t_single, 1e6 * t_single / num_edges,
+                                                                   t_bulk, 1e6 * t_bulk / num_edges))
@@ -0,0 +1,365 @@
+import os
+
+import numpy as np
+import pytest
+import scipy.sparse
+import torch
+
+from ...data.data import BatchedGraphData, GraphData, from_batch, to_batch
+from ...data.shard import GraphShardReader, GraphShardWriter
+from ...data.storage import ArrayBuffer, AttributeTable, AttributeTableView
+from ...data.utils import EdgeNotFoundException, NodeNotFoundException, SizeMismatchException
+
+
+def test_array_buffer_growth():
+    buf = ArrayBuffer(np.int64)
+    for i in range(100):
+        buf.append(i)
+    buf.extend(np.arange(100, 150))
+    assert len(buf) == 150
+    assert np.array_equal(buf.data, np.arange(150))
+
+
+def test_attribute_column_types():
+    table = AttributeTable({'node_attr': None})
+    table.add_rows(3)
+    attrs = AttributeTableView(table)
+    for i in range(3):
+        attrs[i]['position_id'] = i
+        attrs[i]['token'] = 'w{}'.format(i)
+    assert table.columns['position_id'].dtype == np.int64
+    assert table.columns['token'].dtype == object
+    assert attrs[1] == {'node_attr': None, 'position_id': 1, 'token': 'w1'}
+
+    # Writing a value of another type promotes the column
+    attrs[2]['position_id'] = None
+    assert table.columns['position_id'].dtype == object
+    assert attrs[0]['position_id'] == 0 and attrs[2]['position_id'] is None
+
+    # Rows without the attribute behave like a dict without the key
+    attrs[0]['head'] = True
+    assert 'head' in attrs[0] and 'head' not in attrs[1]
+    with pytest.raises(KeyError):
+        attrs[1]['head']
+
+
+def test_graph_node_and_edge_attributes():
+    g = GraphData()
+    g.add_nodes(4)
+    g.node_attributes[0]['token'] = 'a'
+    g.node_attributes[3] = {'token': 'd', 'type': 0}
+    assert g.node_attributes[3] == {'token': 'd', 'type': 0}
+    assert g.get_node_attrs(0)[0]['token'] == 'a'
+    assert g.nodes[:].attributes['token'] == {0: 'a', 3: 'd'}
+
+    g.add_edges([0, 1, 2], [1, 2, 3])
+    g.edge_attributes[1]['rel'] = 'nsubj'
+    assert g.edges() == [(0, 1), (1, 2), (2, 3)]
+    assert g.edge_ids([0, 2], [1, 3]) == [0, 2]
+    assert g.edge_attributes[1]['rel'] == 'nsubj'
+
+
+def test_union_keeps_attributes():
+    g1, g2 = GraphData(), GraphData()
+    for g, name in ((g1, 'x'), (g2, 'y')):
+        g.add_nodes(2)
+        g.add_edge(0, 1)
+        g.node_attributes[1]['token'] = name
+    g1.union(g2)
+    assert g1.get_node_num() == 4
+    assert g1.edges() == [(0, 1), (2, 3)]
+    assert g1.node_attributes[1]['token'] == 'x' and g1.node_attributes[3]['token'] == 'y'
+
+
+def test_feature_buffer_padding():
+    g = GraphData()
+    g.add_nodes(2)
+    g.add_edge(0, 1)
+    feat = torch.ones((1, 3), requires_grad=True)
+    g.edge_features['edge_feat'] = feat
+    g.edge_features['edge_weight'] = torch.ones(1)
+    for _ in range(10):
+        g.add_edge(1, 0)
+    g.add_edges([0], [1, 1, 1])
+    assert g.edge_features['edge_feat'].shape == (14, 3)
+    assert g.edge_features['edge_weight'].tolist() == [1.] + [0.] * 13
+
+    # Gradients flow back to the tensor given by the user
+    g.edge_features['edge_feat'].sum().backward()
+    assert feat.grad.tolist() == [[1., 1., 1.]]
+
+
+def test_add_edges_validation():
+    g = GraphData()
+    g.add_nodes(3)
+    g.add_edges(torch.tensor([0, 1]), np.array([1, 2]))
+    assert g.edges() == [(0, 1), (1, 2)]
+    with pytest.raises(NodeNotFoundException):
+        g.add_edges([0, 1], [2, 3])
+    with pytest.raises(SizeMismatchException):
+        g.add_edges([0, 1], [1, 2, 0])
+    assert g.get_edge_num() == 2
+
+
+def test_batch_round_trip():
+    graphs = []
+    for i in range(3):
+        g = GraphData()
+        g.add_nodes(i + 2)
+        g.add_edges(list(range(i + 1)), list(range(1, i + 2)))
+        for j in range(i + 2):
+            g.node_attributes[j]['token'] = 'g{}_n{}'.format(i, j)
+        g.node_features['node_feat'] = torch.full((i + 2, 4), float(i))
+        g.edge_features['edge_weight'] = torch.arange(i + 1, dtype=torch.float)
+        graphs.append(g)
+
+    batch = to_batch(graphs)
+    assert isinstance(batch, BatchedGraphData)
+    assert batch.get_node_num() == 9 and batch.get_edge_num() == 6
+    assert batch.node_offsets.tolist() == [0, 2, 5, 9]
+    assert batch.batch.tolist() == [0, 0, 1, 1, 1, 2, 2, 2, 2]
+    assert batch.edges()[1:3] == [(2, 3), (3, 4)]
+    assert batch.node_attributes[5]['token'] == 'g2_n0'
+    assert graphs[0].get_node_num() == 2
+
+    unbatched = from_batch(batch)
+    for g, g_new in zip(graphs, unbatched):
+        assert g_new.edges() == g.edges()
+        assert g_new.node_attributes[1] == g.node_attributes[1]
+        assert torch.equal(g_new.node_features['node_feat'], g.node_features['node_feat'])
+        assert torch.equal(g_new.edge_features['edge_weight'], g.edge_features['edge_weight'])
+
+
+def test_edge_lookup():
+    g = GraphData()
+    g.add_nodes(5)
+    g.add_edges([0, 1, 2, 3, 0], [1, 2, 3, 4, 1])
+    assert g.edge_ids(1, 2) == [1]
+    assert g.edge_ids(0, [1]) == [4]  # Duplicated edges resolve to the latest one
+    assert g.edge_ids(np.array([2, 3]), np.array([3, 4])).tolist() == [2, 3]
+    eids = g.edge_ids(torch.tensor([3, 1]), torch.tensor([4, 2]))
+    assert isinstance(eids, torch.Tensor) and eids.tolist() == [3, 1]
+    assert g.has_edges([0, 1, 4, 7], [1, 0, 0, 0]) == [True, False, False, False]
+    with pytest.raises(EdgeNotFoundException):
+        g.edge_ids([0, 1], [1, 0])
+    with pytest.raises(SizeMismatchException):
+        g.edge_ids([0, 1], [1, 2, 3])
+
+    # The index follows topology changes
+    g.add_edge(4, 0)
+    assert g.edge_ids(4, 0) == [5]
+
+
+def test_cached_adjacency():
+    g = GraphData()
+    g.add_nodes(4)
+    g.add_edges([0, 2, 0, 3], [1, 1, 3, 2])
+    csr = g.adj('csr')
+    assert csr is g.adj('csr')
+    assert (csr.toarray() == g.adj_matrix().numpy()).all()
+    assert (g.adj('csc').toarray() == csr.toarray()).all()
+    assert (g.adj('coo', 'torch').to_dense().numpy() == csr.toarray()).all()
+    assert g.out_degrees().tolist() == [2, 0, 1, 1]
+    assert g.in_degrees().tolist() == [0, 2, 1, 1]
+    assert g.successors(0).tolist() == [1, 3]
+    assert g.predecessors(1).tolist() == [0, 2]
+
+    g.edge_features['edge_weight'] = torch.tensor([1., 2., 3., 4.])
+    assert g.adj('csr', weight='edge_weight').toarray()[2, 1] == 2.
+
+    # Topology changes invalidate the cache
+    g.add_edge(1, 0)
+    assert g.adj('csr') is not csr and g.adj('csr')[1, 0] == 1
+    assert g.out_degrees().tolist() == [2, 1, 1, 1]
+
+
+def test_bulk_constructors():
+    adj = torch.tensor([[0., 2., 0.], [0., 0., 3.], [1., 0., 0.]], requires_grad=True)
+    g = GraphData()
+    g.from_dense_adj(adj)
+    assert g.edges() == [(0, 1), (1, 2), (2, 0)]
+    assert g.edge_features['edge_weight'].tolist() == [2., 3., 1.]
+    g.edge_features['edge_weight'].sum().backward()
+    assert adj.grad.sum() == 3
+
+    csr = scipy.sparse.csr_matrix(adj.detach().numpy())
+    for matrix in (csr, csr.tocoo(), csr.tocsc()):
+        g = GraphData()
+        g.from_scipy_sparse_matrix(matrix)
+        assert g.get_node_num() == 3
+        assert (g.adj('csr', weight='edge_weight').toarray() == csr.toarray()).all()
+
+    g = GraphData()
+    g.from_edge_index(torch.tensor([[0, 1], [1, 4]]))
+    assert g.get_node_num() == 5 and g.edges() == [(0, 1), (1, 4)]
+
+
+def test_cached_dgl_conversion():
+    g = GraphData()
+    g.add_nodes(3)
+    g.add_edges([0, 1], [1, 2])
+    g.node_features['node_feat'] = torch.rand((3, 4))
+    g.edge_features['edge_weight'] = torch.tensor([.5, .7])
+    dgl_g = g.to_dgl()
+    assert dgl_g.number_of_edges() == 2
+    assert torch.equal(dgl_g.edata['edge_weight'], g.edge_features['edge_weight'])
+
+    # Same structure while the topology is unchanged, sharing the feature storage and with new features bound
+    g.node_features['node_feat'] = torch.zeros((3, 4))
+    g.node_features['node_emb'] = torch.ones((3, 2))
+    dgl_g.ndata['h'] = torch.rand((3, 8))
+    dgl_g = g.to_dgl()
+    assert dgl_g.ndata['node_feat'].data_ptr() == g.node_features['node_feat'].data_ptr()
+    assert dgl_g.ndata['node_feat'].sum() == 0 and dgl_g.ndata['node_emb'].sum() == 6
+    # Features written by the caller, or removed from the graph, are not in the later results
+    assert 'h' not in dgl_g.ndata
+    g._node_features['node_emb'] = None
+    dgl_g = g.to_dgl()
+    assert set(dgl_g.ndata.keys()) == {'node_feat'}
+
+    g.add_edge(2, 0)
+    dgl_g_2 = g.to_dgl()
+    assert dgl_g_2 is not dgl_g and dgl_g_2.number_of_edges() == 3
+    assert dgl_g_2.edata['edge_weight'].tolist() == pytest.approx([.5, .7, 0.])
+
+
+def test_graph_shard_round_trip(tmp_path):
+    graphs = []
+    for i in range(4):
+        g = GraphData()
+        g.add_nodes(i + 2)
+        g.add_edges(list(range(i + 1)), list(range(1, i + 2)))
+        for j in range(i + 2):
+            g.node_attributes[j]['token'] = 'g{}_n{}'.format(i, j)
+            if i > 0:
+                g.node_attributes[j]['position_id'] = j if i < 3 else None  # Promoted to an object column
+        g.node_features['node_feat'] = torch.rand((i + 2, 4))
+        g.edge_features['edge_weight'] = torch.rand(i + 1)
+        g.graph_attributes['id'] = i
+        graphs.append(g)
+
+    path = str(tmp_path / 'train.shard')
+    with GraphShardWriter(path) as writer:
+        for g in graphs[:3]:
+            writer.write(g)
+    with GraphShardWriter(path, append=True) as writer:
+        writer.write(graphs[3])
+
+    reader = GraphShardReader(path)
+    assert len(reader) == 4 and reader.batch_num_nodes.tolist() == [2, 3, 4, 5]
+    for g, g_new in zip(graphs, reader):
+        assert g_new.edges() == g.edges() and g_new.graph_attributes == g.graph_attributes
+        assert [dict(attrs) for attrs in g_new.node_attributes.values()] == \
+            [dict(attrs) for attrs in g.node_attributes.values()]
+        assert torch.equal(g_new.node_features['node_feat'], g.node_features['node_feat'])
+        assert torch.equal(g_new.edge_features['edge_weight'], g.edge_features['edge_weight'])
+
+    batch = reader.load_batch(1, 3)
+    assert batch.batch_num_nodes.tolist() == [3, 4]
+    assert batch.edges() == [(0, 1), (1, 2), (3, 4), (4, 5), (5, 6)]
+    assert batch.node_attributes[3]['token'] == 'g2_n0'
+
+    with pytest.raises(SizeMismatchException):
+        GraphShardWriter(path, append=True).write(GraphData())
+
+
+def test_graph_shard_promotion_crash(tmp_path):
+    def build_graph(position_id):
+        g = GraphData()
+        g.add_nodes(2)
+        g.add_edge(0, 1)
+        g.node_attributes[0]['position_id'] = position_id
+        return g
+
+    path = str(tmp_path / 'train.shard')
+    writer = GraphShardWriter(path)
+    writer.write(build_graph(0))
+    writer.write(build_graph(1))
+    writer.flush()
+    # Promote the column to the object layout, then crash before the next flush
+    writer.write(build_graph('2'))
+    for array_file in writer._all_files():
+        array_file.flush()
+    del writer
+
+    reader = GraphShardReader(path)
+    assert len(reader) == 2 and [g.node_attributes[0]['position_id'] for g in reader] == [0, 1]
+
+    with GraphShardWriter(path, append=True) as writer:
+        writer.write(build_graph('2'))
+    reader = GraphShardReader(path)
+    assert [g.node_attributes[0]['position_id'] for g in reader] == [0, 1, '2']
+    assert not any(name.endswith('.values') for name in os.listdir(path) if name.startswith('node_attr_0'))
+
+
+def test_lazy_views():
+    g = GraphData()
+    g.add_nodes(6)
+    g.add_edges([0, 1, 2], [1, 2, 3])
+    feat = torch.rand((6, 2))
+    g.node_features['node_feat'] = feat
+    assert g.node_features['node_feat'] is g.node_features['node_feat']
+    assert torch.equal(g.nodes[1:5:2].features['node_feat'], feat[1:5:2])
+    assert torch.equal(g.nodes[[4, 0]].features['node_feat'], feat[[4, 0]])
+    assert g.nodes[2].features['node_emb'] is None
+    with pytest.raises(AssertionError):
+        g.nodes[3:7]
+    with pytest.raises(AssertionError):
+        g.edges[np.array([0, 3])]
+
+    for i in (1, 4, 5):
+        g.node_attributes[i]['token'] = 'w{}'.format(i)
+    assert g.nodes[:].attributes['token'] == {1: 'w1', 4: 'w4', 5: 'w5'}
+    assert g.nodes[2:].attributes['token'] == {4: 'w4', 5: 'w5'}
+    assert g.nodes[4].attributes['token'] == {4: 'w4'}
+    assert g.nodes[:].attributes['missing'] == {}
+
+
+def test_subgraph_and_sampling():
+    g = GraphData()
+    g.add_nodes(6)
+    g.add_edges([0, 1, 2, 3, 4, 5, 0], [1, 2, 3, 4, 5, 0, 2])
+    for i in range(6):
+        g.node_attributes[i]['token'] = 'w{}'.format(i)
+    feat = torch.arange(6, dtype=torch.float).unsqueeze(1).requires_grad_()
+    g.node_features['node_feat'] = feat
+    g.edge_features['edge_weight'] = torch.arange(7, dtype=torch.float)
+
+    sub = g.subgraph([2, 0, 1])
+    assert sub.edges() == [(1, 2), (2, 0), (1, 0)]
+    assert sub.parent_edge_ids.tolist() == [0, 1, 6]
+    assert sub.node_attributes[0]['token'] == 'w2'
+    assert sub.edge_features['edge_weight'].tolist() == [0., 1., 6.]
+    sub.node_features['node_feat'].sum().backward()
+    assert feat.grad.view(-1).tolist() == [1., 1., 1., 0., 0., 0.]
+
+    sub = g.edge_subgraph([4, 1])
+    assert sub.parent_node_ids.tolist() == [1, 2, 4, 5] and sub.edges() == [(2, 3), (0, 1)]
+
+    sub = g.khop_in_subgraph(3, 2)
+    assert sub.parent_node_ids.tolist() == [3, 2, 0, 1]
+    assert sub.parent_edge_ids.tolist() == [0, 1, 2, 6]
+
+    sub = g.sample_neighbors([2, 4], 1, weight='edge_weight')
+    assert sub.parent_edge_ids.tolist() == [3, 6]
+    assert sub.parent_node_ids.tolist() == [2, 4, 0, 3]
+    sub = g.sample_neighbors([2], 5)
+    assert sorted(sub.parent_edge_ids.tolist()) == [1, 6]
+    with pytest.raises(NodeNotFoundException):
+        g.subgraph([0, 6])
+
+
+def test_contract_nodes():
+    g = GraphData()
+    g.add_nodes(7)
+    g.add_edges([0, 1, 2, 0, 5, 6, 3], [1, 2, 3, 3, 6, 5, 0])
+    g.edge_features['edge_weight'] = torch.arange(7, dtype=torch.float)
+
+    # The chain 0 -> 1 -> 2 -> 3 is bypassed and the cycle 5 <-> 6 is dropped
+    sub = g.contract_nodes([1, 2, 5, 6])
+    assert sub.parent_node_ids.tolist() == [0, 3, 4]
+    assert sub.edges() == [(0, 1), (0, 1), (1, 0)]
+    assert sub.parent_edge_ids.tolist() == [0, 3, 6]
+    assert sub.edge_features['edge_weight'].tolist() == [0., 3., 6.]
+    with pytest.raises(AssertionError):
+        g.contract_nodes([0])
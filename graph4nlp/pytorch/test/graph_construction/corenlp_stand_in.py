@@ -0,0 +1,70 @@
+"""
+A local stand-in for the CoreNLP server, used to test the CoreNLP clients without a JVM.
+
+It answers every POST request with the output of `responder(text, properties)`, over keep-alive
+HTTP/1.1 connections. The first `num_failures` requests are answered with a 503 error, and every
+answer can be delayed to emulate the parsing time.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def dependency_responder(text, properties):
+    # Every sentence is parsed as a single `nsubj` dependency between its first two words
+    sentences = []
+    for line in text.split('\n'):
+        words = line.split()
+        deps = [{'dep': 'ROOT', 'governor': 0, 'governorGloss': 'ROOT', 'dependent': 2, 'dependentGloss': words[1]},
+                {'dep': 'nsubj', 'governor': 2, 'governorGloss': words[1], 'dependent': 1,
+                 'dependentGloss': words[0]}]
+        sentences.append({'basicDependencies': deps})
+    return json.dumps({'sentences': sentences})
+
+
+class StandInCoreNLPServer(object):
+    def __init__(self, responder=dependency_responder, num_failures=0, delay=0.):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super(Handler, self).setup()
+                with server.lock:
+                    server.num_connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                properties = json.loads(parse_qs(urlsplit(self.path).query)['properties'][0])
+                with server.lock:
+                    server.num_requests += 1
+                    fail = server.num_requests <= num_failures
+                time.sleep(delay)
+                status, payload = (503, 'Overloaded') if fail else (200, responder(body, properties))
+                payload = payload.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.lock = threading.Lock()
+        self.num_connections = 0
+        self.num_requests = 0
+        self._server = ThreadingHTTPServer(('localhost', 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
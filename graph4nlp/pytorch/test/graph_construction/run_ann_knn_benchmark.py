@@ -0,0 +1,58 @@
+"""
+Benchmark of approximate (LSH) against exact (blocked) kNN graph construction.
+
+The node embeddings are drawn around random cluster centers, as embeddings of real corpora are
+clustered. recall@k is the fraction of the exact k nearest neighbors found by the approximate search.
+
+Usage: python -m graph4nlp.pytorch.test.graph_construction.run_ann_knn_benchmark
+"""
+import time
+
+import torch
+
+from ...modules.graph_construction import NodeEmbeddingBasedGraphConstruction
+from ...modules.utils.tokenization_utils import regex_tokenize
+from ...modules.utils.vocab_utils import VocabModel
+
+emb_size = 64
+top_k_neigh = 10
+num_clusters = 1000
+node_nums = [10000, 20000, 40000]
+lsh_settings = [(8, 10), (16, 10), (32, 10)]
+
+
+def build_constructor(sim_metric_type):
+    vocab_model = VocabModel([['a b c']], tokenizer=regex_tokenize, word_emb_size=emb_size)
+    return NodeEmbeddingBasedGraphConstruction(vocab_model.word_vocab, {'word_emb_type': 'w2v',
+                                                                        'node_edge_emb_strategy': 'mean',
+                                                                        'seq_info_encode_strategy': 'none'},
+                                               sim_metric_type=sim_metric_type, top_k_neigh=top_k_neigh,
+                                               input_size=emb_size, hidden_size=emb_size)
+
+
+def recall_at_k(adj, exact_adj):
+    found = adj.indices()[1].view(-1, top_k_neigh)
+    exact = exact_adj.indices()[1].view(-1, top_k_neigh)
+    return (found.unsqueeze(-1) == exact.unsqueeze(1)).any(-1).float().mean().item()
+
+
+if __name__ == '__main__':
+    torch.manual_seed(1234)
+    for sim_metric_type in ['cosine', 'weighted_cosine']:
+        constructor = build_constructor(sim_metric_type)
+        print(sim_metric_type)
+        print('{:>8} {:>10} {:>7} {:>7} {:>10} {:>10}'.format('nodes', 'exact (s)', 'tables', 'window', 'lsh (s)',
+                                                          'recall@{}'.format(top_k_neigh)))
+        for num_nodes in node_nums:
+            centers = torch.randn(num_clusters, emb_size)
+            node_emb = centers[torch.randint(num_clusters, (num_nodes,))] + 0.5 * torch.randn(num_nodes, emb_size)
+            with torch.no_grad():
+                t0 = time.time()
+                exact_adj = constructor.compute_knn_graph(node_emb, block_size=2048)
+                t_exact = time.time() - t0
+                for num_tables, window in lsh_settings:
+                    t0 = time.time()
+                    adj = constructor.compute_ann_knn_graph(node_emb, num_tables=num_tables, window=window)
+                    t_lsh = time.time() - t0
+                    print('{:>8} {:>10.2f} {:>7} {:>7} {:>10.2f} {:>10.3f}'.format(
+                        num_nodes, t_exact, num_tables, window, t_lsh, recall_at_k(adj, exact_adj)))
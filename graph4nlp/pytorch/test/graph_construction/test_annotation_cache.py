@@ -0,0 +1,54 @@
+import json
+import pickle
+
+from ...modules.graph_construction.annotation_cache import AnnotationCache, set_annotation_cache
+from ...modules.graph_construction.dependency_graph_construction import DependencyBasedGraphConstruction
+
+
+class CountingProcessor(object):
+    """
+    A stand-in for StanfordCoreNLP, which parses every sentence as a single `nsubj` dependency.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def annotate(self, text, properties=None):
+        self.calls += 1
+        words = text.split()
+        deps = [{'dep': 'ROOT', 'governor': 0, 'governorGloss': 'ROOT', 'dependent': 2, 'dependentGloss': words[1]},
+                {'dep': 'nsubj', 'governor': 2, 'governorGloss': words[1], 'dependent': 1,
+                 'dependentGloss': words[0]}]
+        return json.dumps({'sentences': [{'basicDependencies': deps}]})
+
+
+def test_annotation_cache(tmp_path):
+    db_path = str(tmp_path / 'annotations.sqlite')
+    processor = CountingProcessor()
+    props = {'annotators': 'depparse', 'outputFormat': 'json'}
+
+    cache = AnnotationCache(db_path, capacity=1)
+    output = cache.annotate(processor, 'James went', props)
+    assert cache.annotate(processor, ' James went\n', props) == output
+    assert processor.calls == 1
+    cache.annotate(processor, 'James went', dict(props, annotators='parse'))
+    assert processor.calls == 2
+
+    # The annotations evicted from memory, or made in another process, are read back from disk
+    cache = pickle.loads(pickle.dumps(cache))
+    assert cache.annotate(processor, 'James went', props) == output
+    assert processor.calls == 2 and cache.hits == 1 and cache.misses == 0
+    cache.close()
+
+
+def test_constructor_uses_annotation_cache(tmp_path):
+    processor = CountingProcessor()
+    previous = set_annotation_cache(str(tmp_path / 'annotations.sqlite'))
+    try:
+        for _ in range(2):
+            graph = DependencyBasedGraphConstruction.topology('James went', processor, merge_strategy='sequential',
+                                                              edge_strategy=None)
+        assert processor.calls == 1
+        assert graph.get_node_num() == 3
+    finally:
+        set_annotation_cache(previous).close()
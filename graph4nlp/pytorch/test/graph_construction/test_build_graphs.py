@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from ...modules.graph_construction.annotation_cache import AnnotationCache, set_annotation_cache
+from ...modules.graph_construction.build_graphs import build_graphs, open_graph_shards
+from .test_annotation_cache import CountingProcessor
+
+
+class InterruptedProcessor(CountingProcessor):
+    """
+    A parser which is interrupted when it reaches the text 'crash here'.
+    """
+
+    def annotate(self, text, properties=None):
+        if text == 'crash here':
+            raise KeyboardInterrupt()
+        return super(InterruptedProcessor, self).annotate(text, properties)
+
+
+def test_build_graphs_resumes(tmp_path):
+    input_path = str(tmp_path / 'corpus.jsonl')
+    output_path = str(tmp_path / 'graphs')
+    texts = ['word{} went'.format(i) for i in range(7)]
+    with open(input_path, 'w') as f:
+        for text in texts[:5] + ['crash here'] + texts[5:]:
+            f.write(json.dumps({'text': text}) + '\n')
+        f.write('\n' + json.dumps('bad') + '\n')
+
+    previous = set_annotation_cache(AnnotationCache(capacity=0))
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            build_graphs(input_path, output_path, 'dependency', InterruptedProcessor, shard_size=3, num_workers=0,
+                         progress=False, merge_strategy=None, edge_strategy=None)
+        assert [len(reader) for reader in open_graph_shards(output_path)] == [3]
+
+        # The second run starts from the 4th document
+        processor = CountingProcessor()
+        manifest = build_graphs(input_path, output_path, 'dependency', lambda: processor, shard_size=3,
+                                num_workers=0, progress=False, merge_strategy=None, edge_strategy=None)
+        assert processor.calls == 6
+    finally:
+        set_annotation_cache(previous)
+
+    assert [shard['num_documents'] for shard in manifest['shards']] == [3, 3, 3]
+    assert [shard['num_graphs'] for shard in manifest['shards']] == [3, 3, 2]
+    assert [failure['document'] for failure in manifest['shards'][2]['failures']] == [8]
+    graphs = [graph for reader in open_graph_shards(output_path) for graph in reader]
+    assert [graph.get_node_attrs(2)[2]['token'] for graph in graphs] == \
+        ['word0', 'word1', 'word2', 'word3', 'word4', 'crash', 'word5', 'word6']
+
+    with pytest.raises(AssertionError):
+        build_graphs(input_path, output_path, 'dependency', CountingProcessor, shard_size=4, num_workers=0,
+                     progress=False, merge_strategy=None, edge_strategy=None)
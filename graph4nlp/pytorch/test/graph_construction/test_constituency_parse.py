@@ -0,0 +1,47 @@
+import json
+
+from ...modules.graph_construction.constituency_graph_construction import ConstituencyBasedGraphConstruction
+from ...modules.graph_construction.utility_functions import UtilityFunctionsForGraph
+
+
+class ParseProcessor(object):
+    """
+    A stand-in for StanfordCoreNLP, which returns fixed constituency parses.
+    """
+
+    def __init__(self, parses):
+        self.parses = parses
+
+    def annotate(self, text, properties=None):
+        return json.dumps({'sentences': [{'parse': parse} for parse in self.parses]})
+
+
+def test_constituency_graph():
+    parses = ['(ROOT\n  (S\n    (NP (PRP I))\n    (VP (VBP love)\n      (NP (PRP you)))))',
+              '(ROOT (NP (NN Motherland)))']
+    graph = ConstituencyBasedGraphConstruction.topology('I love you. Motherland.', ParseProcessor(parses))
+
+    assert graph.get_node_num() == 15
+    # The edges of both sentences, then the link from the last word of the first to the first word of the second
+    assert graph.get_all_edges() == [(0, 1), (1, 2), (2, 3), (3, 4), (1, 5), (5, 6), (6, 7), (5, 8), (8, 9), (9, 10),
+                                     (11, 12), (12, 13), (13, 14), (10, 14)]
+    assert graph.get_node_attrs(7)[7] == {'token': 'love', 'type': 0, 'position_id': 1, 'sentence_id': 0,
+                                          'tail': False, 'head': False, 'node_attr': None}
+    assert graph.get_node_attrs(11)[11]['type'] == 1 and graph.get_node_attrs(11)[11]['position_id'] is None
+    attributes = graph.nodes[:].attributes
+    assert [node for node, head in attributes['head'].items() if head] == [4, 14]
+    assert [node for node, tail in attributes['tail'].items() if tail] == [10, 14]
+
+    # Merging the graphs of the sentences gives the same graph
+    sub_graphs = [ConstituencyBasedGraphConstruction._construct_static_graph({'parse': parse}, index)
+                  for index, parse in enumerate(parses)]
+    merged_graph = ConstituencyBasedGraphConstruction._graph_connect(sub_graphs)
+    assert merged_graph.get_all_edges() == graph.get_all_edges()
+    assert merged_graph.get_node_attrs(slice(None)) == graph.get_node_attrs(slice(None))
+
+    # The part-of-speech nodes are removed and the words linked to their phrase
+    pruned_graph = UtilityFunctionsForGraph.prune_pos_nodes(graph)
+    assert pruned_graph.parent_node_ids.tolist() == [0, 1, 2, 4, 5, 7, 8, 10, 11, 12, 14]
+    assert pruned_graph.get_all_edges() == [(0, 1), (1, 2), (2, 3), (1, 4), (4, 5), (4, 6), (6, 7), (8, 9), (9, 10),
+                                            (7, 10)]
+    assert pruned_graph.get_node_attrs(3)[3]['token'] == 'I'
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from ...modules.graph_construction.annotation_cache import AnnotationCache, set_annotation_cache
+from ...modules.graph_construction.corenlp_client import AsyncCoreNLPClient, CoreNLPError
+from ...modules.graph_construction.dependency_graph_construction import DependencyBasedGraphConstruction
+from .corenlp_stand_in import StandInCoreNLPServer
+
+
+def test_client_pipelines_over_keep_alive_connections():
+    texts = ['w{} x{}'.format(i, i) for i in range(32)]
+    with StandInCoreNLPServer(delay=0.05) as server:
+        client = AsyncCoreNLPClient('http://localhost', port=server.port, max_concurrency=8)
+        start = time.time()
+        outputs = client.annotate_many(texts, {'annotators': 'depparse'})
+        elapsed = time.time() - start
+        assert '"a"' in client.annotate('a b')  # Blocking calls reuse the pooled connections
+        client.close()
+    assert ['"w{}"'.format(i) in output for i, output in enumerate(outputs)] == [True] * 32
+    assert elapsed < 32 * 0.05 / 2  # Requests overlap instead of running one after the other
+    assert server.num_connections <= 8
+
+
+def test_client_retries():
+    with StandInCoreNLPServer(num_failures=2) as server:
+        client = AsyncCoreNLPClient('http://localhost', port=server.port, max_retries=2, backoff=0.01)
+        assert 'nsubj' in client.annotate('James went')
+        client.close()
+    with StandInCoreNLPServer(num_failures=3) as server:
+        client = AsyncCoreNLPClient('http://localhost', port=server.port, max_retries=2, backoff=0.01)
+        with pytest.raises(CoreNLPError):
+            client.annotate('James went')
+        client.close()
+
+
+def test_constructor_with_client():
+    previous = set_annotation_cache(AnnotationCache())
+    try:
+        with StandInCoreNLPServer() as server:
+            client = AsyncCoreNLPClient('http://localhost', port=server.port)
+            graph = DependencyBasedGraphConstruction.topology('James went', client, merge_strategy='sequential',
+                                                              edge_strategy=None)
+            client.close()
+        assert graph.get_node_num() == 3
+    finally:
+        set_annotation_cache(previous)
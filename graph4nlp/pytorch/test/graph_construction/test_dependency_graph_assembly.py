@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from ...modules.graph_construction.dependency_graph_construction import DependencyBasedGraphConstruction
+
+
+class MultiSentenceProcessor(object):
+    """
+    A stand-in for StanfordCoreNLP, which parses every line as a sentence whose words all depend on the first.
+    """
+
+    def annotate(self, text, properties=None):
+        sentences = []
+        for line in text.split('\n'):
+            words = line.split()
+            deps = [{'dep': 'ROOT', 'governor': 0, 'governorGloss': 'ROOT', 'dependent': 1,
+                     'dependentGloss': words[0]}]
+            deps += [{'dep': 'dep', 'governor': 1, 'governorGloss': words[0], 'dependent': i + 1,
+                      'dependentGloss': word} for i, word in enumerate(words) if i > 0]
+            sentences.append({'basicDependencies': deps})
+        return json.dumps({'sentences': sentences})
+
+
+def _merge_sub_graphs(text, merge_strategy):
+    dep_dict = json.loads(MultiSentenceProcessor().annotate(text))
+    sub_graphs = []
+    for s_id, s in enumerate(dep_dict['sentences']):
+        parsed_sent = DependencyBasedGraphConstruction._parse_sentence(s_id, s['basicDependencies'])
+        sub_graphs.append(DependencyBasedGraphConstruction._construct_static_graph(
+            DependencyBasedGraphConstruction._to_graph_content(parsed_sent)))
+    return DependencyBasedGraphConstruction._graph_connect(sub_graphs, merge_strategy)
+
+
+@pytest.mark.parametrize('merge_strategy', [None, 'tailhead', 'sequential'])
+@pytest.mark.parametrize('text', ['James went home', 'James went home\nhe slept\nthe dog barked loudly'])
+def test_single_pass_assembly(text, merge_strategy):
+    graph = DependencyBasedGraphConstruction.topology(text, MultiSentenceProcessor(), merge_strategy=merge_strategy,
+                                                      edge_strategy=None)
+    expected = _merge_sub_graphs(text, merge_strategy)
+
+    assert graph.get_node_num() == expected.get_node_num()
+    assert graph.get_all_edges() == expected.get_all_edges()
+    for node in range(graph.get_node_num()):
+        assert graph.get_node_attrs(node) == expected.get_node_attrs(node)
@@ -0,0 +1,72 @@
+import json
+
+from ...modules.graph_construction.annotation_cache import AnnotationCache, set_annotation_cache
+from ...modules.graph_construction.ie_graph_construction import IEBasedGraphConstruction, _remove_similar_triples
+
+
+class FakeIEProcessor(object):
+    """
+    Splits sentences on '.' for coreference (without any coreference chain) and, with ``ssplit.eolonly``,
+    on new lines for OpenIE, where every sentence `s r o` yields the triple (s, r, o).
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def annotate(self, text, properties=None):
+        self.calls.append(properties['annotators'])
+        if 'coref' in properties['annotators']:
+            sentences = [{'index': idx, 'tokens': [{'word': word} for word in sent.split()]}
+                         for idx, sent in enumerate(s for s in text.split('.') if s.strip())]
+            return json.dumps({'sentences': sentences, 'corefs': {}})
+        assert properties['ssplit.eolonly']
+        sentences = []
+        for idx, line in enumerate(text.split('\n')):
+            words = line.split()
+            sentences.append({'index': idx, 'openie': [{'subject': words[0], 'relation': words[1],
+                                                        'object': ' '.join(words[2:])}]})
+        return json.dumps({'sentences': sentences})
+
+
+def test_ie_single_openie_request():
+    previous = set_annotation_cache(AnnotationCache())
+    try:
+        processor = FakeIEProcessor()
+        docs = ['James likes green apples. Mary eats bread. Tom reads books.', 'Ann plays chess.']
+        graphs = IEBasedGraphConstruction.topology_many(docs, processor, merge_strategy=None, edge_strategy=None)
+        assert [annotators.endswith('openie') for annotators in processor.calls] == [False, False, True]
+        assert graphs[0].get_node_num() == 6 and graphs[0].get_edge_num() == 3
+        assert graphs[1].get_node_num() == 2
+
+        graph = IEBasedGraphConstruction.topology(docs[1], FakeIEProcessor(), merge_strategy=None,
+                                                  edge_strategy=None)
+        assert graph.get_node_num() == 2 and graph.get_edge_num() == 1
+    finally:
+        set_annotation_cache(previous)
+
+
+def test_ie_openie_requests_under_size_limit():
+    previous = set_annotation_cache(AnnotationCache())
+    try:
+        processor = FakeIEProcessor()
+        docs = ['James likes green apples. Mary eats bread.', 'Tom reads books. Ann plays chess.', 'Bob has a dog.']
+        graphs = IEBasedGraphConstruction.topology_many(docs, processor, merge_strategy=None, edge_strategy=None,
+                                                        max_request_chars=40)
+        # 'James likes green apples\nMary eats bread' (40), 'Tom reads books\nAnn plays chess' (31), 'Bob has a dog'
+        assert [annotators.endswith('openie') for annotators in processor.calls].count(True) == 3
+        assert [graph.get_edge_num() for graph in graphs] == [2, 2, 1]
+        assert sorted(graphs[1].get_node_attrs(i)[i]['token'] for i in range(graphs[1].get_node_num())) == \
+            [['Ann'], ['Tom'], ['books'], ['chess']]
+    finally:
+        set_annotation_cache(previous)
+
+
+def test_remove_similar_triples():
+    triples = [['James', 'likes', 'apples'],
+               ['James', 'really likes', 'apples'],  # Same subject + object as the first one, longer relation
+               ['Mary', 'eats', 'bread'],
+               ['Mary', 'eats', 'bread daily'],  # Contains the third one, same relation length
+               ['Tom', 'eats', 'bread daily'],  # Same relation + object as the fourth one
+               ['Ann', 'plays', 'chess']]
+    assert _remove_similar_triples(triples) == [['James', 'really likes', 'apples'], ['Tom', 'eats', 'bread daily'],
+                                                ['Ann', 'plays', 'chess']]
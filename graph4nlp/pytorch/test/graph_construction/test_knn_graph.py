@@ -0,0 +1,158 @@
+import dgl
+import pytest
+import torch
+
+from ...modules.graph_construction import NodeEmbeddingBasedGraphConstruction
+from ...modules.graph_construction.utils import convert_adj_to_dgl_graph
+from ...modules.utils.constants import INF
+from ...modules.utils.tokenization_utils import regex_tokenize
+from ...modules.utils.vocab_utils import VocabModel
+
+EMBEDDING_STYLES = {'word_emb_type': 'w2v', 'node_edge_emb_strategy': 'mean', 'seq_info_encode_strategy': 'none'}
+
+
+def build_constructor(sim_metric_type, **kwargs):
+    torch.manual_seed(0)
+    vocab_model = VocabModel([['a b c']], tokenizer=regex_tokenize, word_emb_size=8)
+    return NodeEmbeddingBasedGraphConstruction(vocab_model.word_vocab, EMBEDDING_STYLES,
+                                               sim_metric_type=sim_metric_type, num_heads=2, input_size=8,
+                                               hidden_size=8, **kwargs)
+
+
+@pytest.mark.parametrize('sim_metric_type', ['attention', 'weighted_cosine', 'gat_attention', 'rbf_kernel', 'cosine'])
+def test_blocked_knn_matches_dense(sim_metric_type):
+    constructor = build_constructor(sim_metric_type, top_k_neigh=4)
+    node_emb = torch.randn(23, 8, requires_grad=True)
+
+    knn_val, knn_ind = torch.topk(constructor.compute_similarity_metric(node_emb), 4, dim=-1)
+    adj = constructor.compute_knn_graph(node_emb, block_size=5)
+    assert adj.is_sparse and adj._nnz() == 23 * 4
+    rows, cols = adj.indices()
+    assert torch.equal(cols.view(23, 4), knn_ind.sort(-1)[0])
+    assert torch.allclose(adj.to_dense().gather(-1, knn_ind), knn_val, atol=1e-5)
+
+    if sim_metric_type != 'cosine':
+        params = [node_emb] + list(constructor.parameters())
+        dense_grads = torch.autograd.grad(knn_val.sum(), params, allow_unused=True)
+        sparse_grads = torch.autograd.grad(adj.values().sum(), params, allow_unused=True)
+        for dense_grad, sparse_grad in zip(dense_grads, sparse_grads):
+            assert (dense_grad is None) == (sparse_grad is None)
+            assert dense_grad is None or torch.allclose(dense_grad, sparse_grad, atol=1e-4)
+
+
+def test_blocked_knn_graph():
+    constructor = build_constructor('weighted_cosine', top_k_neigh=3, knn_block_size=4)
+    node_mask = torch.ones(10)
+    node_mask[8:] = 0
+    adj = constructor.compute_knn_graph(torch.randn(10, 8), node_mask)
+    rows, cols = adj.indices()
+    assert rows.tolist() == [row for row in range(8) for _ in range(3)]
+    assert cols.max().item() < 8
+
+    dgl_graph = constructor.topology(torch.randn(10, 8))
+    assert dgl_graph.number_of_edges() == 30
+    assert dgl_graph.out_degrees().tolist() == [3] * 10
+
+
+@pytest.mark.parametrize('sim_metric_type', ['weighted_cosine', 'cosine'])
+def test_lsh_knn_graph(sim_metric_type):
+    constructor = build_constructor(sim_metric_type, top_k_neigh=4, lsh_num_tables=2)
+    node_emb = torch.randn(30, 8, requires_grad=True)
+    node_mask = torch.ones(30)
+    node_mask[25:] = 0
+
+    # With a window covering all the nodes, every node is a candidate and the search is exact
+    adj = constructor.compute_ann_knn_graph(node_emb, node_mask, window=30, block_size=7)
+    exact_adj = constructor.compute_knn_graph(node_emb, node_mask, block_size=8)
+    assert torch.equal(adj.indices(), exact_adj.indices())
+    assert torch.allclose(adj.values(), exact_adj.values(), atol=1e-5)
+    if sim_metric_type == 'weighted_cosine':
+        grad, = torch.autograd.grad(adj.values().sum(), constructor.weight)
+        exact_grad, = torch.autograd.grad(exact_adj.values().sum(), constructor.weight)
+        assert torch.allclose(grad, exact_grad, atol=1e-4)
+
+    # Approximate search: k distinct valid neighbors per valid node, scored exactly
+    adj = constructor.compute_ann_knn_graph(node_emb, node_mask, window=4)
+    rows, cols = adj.indices()
+    assert rows.tolist() == [row for row in range(25) for _ in range(4)]
+    assert cols.max().item() < 25
+    dense = constructor.compute_similarity_metric(node_emb)
+    assert torch.allclose(adj.values(), dense[rows, cols], atol=1e-5)
+
+    dgl_graph = constructor.topology(torch.randn(100, 8))
+    assert dgl_graph.out_degrees().tolist() == [4] * 100
+
+    # The same seed gives the same graph, also on a constructor without LSH settings
+    node_emb = torch.randn(200, 8)
+    constructor = build_constructor(sim_metric_type, top_k_neigh=4)
+    adjs = [constructor.compute_ann_knn_graph(node_emb, window=2, generator=torch.Generator().manual_seed(7))
+            for _ in range(2)]
+    assert torch.equal(adjs[0].indices(), adjs[1].indices())
+    with pytest.raises(AssertionError):
+        build_constructor(sim_metric_type).compute_ann_knn_graph(node_emb)
+
+
+def test_convert_adj_to_dgl_graph():
+    adj = torch.rand(20, 20)
+    adj[adj < 0.8] = -INF
+    adj.requires_grad_()
+    dense_graph = convert_adj_to_dgl_graph(adj, -INF, use_edge_softmax=True)
+    src, dst = (adj > -INF).nonzero(as_tuple=True)
+    assert torch.equal(dense_graph.edges()[0], src) and torch.equal(dense_graph.edges()[1], dst)
+
+    # A sparse matrix holding the same entries gives the same graph, weights and gradients
+    sparse_adj = torch.sparse_coo_tensor(torch.stack([src, dst]), adj[src, dst], (20, 20))
+    sparse_graph = convert_adj_to_dgl_graph(sparse_adj, -INF, use_edge_softmax=True)
+    assert all(torch.equal(u, v) for u, v in zip(dense_graph.edges(), sparse_graph.edges()))
+    assert torch.allclose(dense_graph.edata['a'], sparse_graph.edata['a'])
+    grad, = torch.autograd.grad((dense_graph.edata['a'] * torch.arange(len(src))).sum(), adj)
+    sparse_grad, = torch.autograd.grad((sparse_graph.edata['a'] * torch.arange(len(src))).sum(), adj)
+    assert torch.allclose(grad, sparse_grad)
+
+
+def test_sparse_graph_regularization():
+    constructor = build_constructor('weighted_cosine', top_k_neigh=3, smoothness_ratio=0.2, connectivity_ratio=0.3,
+                                    sparsity_ratio=0.1)
+    node_feat = torch.randn(12, 8, requires_grad=True)
+    adj = constructor.compute_knn_graph(node_feat, block_size=5)
+    dense_adj = adj.to_dense()
+    dense_adj[-1] = 0
+
+    # Not symmetric, with an isolated node
+    sparse_reg = constructor.compute_graph_regularization(dense_adj.to_sparse(), node_feat)
+    dense_reg = constructor.compute_graph_regularization(dense_adj, node_feat)
+    assert torch.allclose(sparse_reg, dense_reg, rtol=1e-5)
+    params = [node_feat, constructor.weight]
+    for grad, dense_grad in zip(torch.autograd.grad(sparse_reg, params, retain_graph=True),
+                                torch.autograd.grad(dense_reg, params)):
+        assert torch.allclose(grad, dense_grad, atol=1e-5)
+
+
+@pytest.mark.parametrize('sim_metric_type', ['attention', 'weighted_cosine', 'gat_attention', 'rbf_kernel', 'cosine'])
+def test_batched_graph(sim_metric_type):
+    constructor = build_constructor(sim_metric_type, top_k_neigh=3, smoothness_ratio=0.2, connectivity_ratio=0.3,
+                                    sparsity_ratio=0.1)
+    batch_num_nodes = [5, 2, 0, 9, 6, 1]
+    node_emb = torch.randn(sum(batch_num_nodes), 8)
+    node_mask = torch.ones(sum(batch_num_nodes))
+    node_mask[[3, 10, 18]] = 0
+
+    # Same edges and weights as the graphs built one by one
+    adj = constructor.compute_batched_graph(node_emb, batch_num_nodes, node_mask, bucket_ratio=1.5)
+    offset = 0
+    for num_nodes in batch_num_nodes:
+        nodes = slice(offset, offset + num_nodes)
+        if num_nodes > 0:
+            graph_adj = constructor.compute_knn_graph(node_emb[nodes], node_mask[nodes], block_size=4).to_dense()
+            assert torch.allclose(adj.to_dense()[nodes, nodes], graph_adj, atol=1e-5)
+        offset += num_nodes
+    assert adj._nnz() == 4 * 3 + 2 * 2 + 0 + 8 * 3 + 5 * 3 + 1
+
+    dgl_graph = constructor.batch_topology(node_emb, batch_num_nodes, node_mask)
+    assert dgl_graph.batch_num_nodes().tolist() == batch_num_nodes
+    assert [graph.number_of_edges() for graph in dgl.unbatch(dgl_graph)] == [12, 4, 0, 24, 15, 1]
+    if sim_metric_type in ('weighted_cosine', 'rbf_kernel', 'cosine'):
+        # The empty graph adds 0 to the mean of the losses of the graphs
+        graph_regs = [constructor.compute_graph_regularization(adj.to_dense()[nodes, nodes], node_emb[nodes])
+                      for nodes in [slice(0, 5), slice(5, 7), slice(7, 16), slice(16, 22), slice(22, 23)]]
+        assert torch.allclose(dgl_graph.graph_reg, sum(graph_regs) / 6, rtol=1e-4)
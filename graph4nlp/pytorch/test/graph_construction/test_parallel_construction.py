@@ -0,0 +1,35 @@
+from ...data.shard import GraphShardReader, GraphShardWriter
+from ...modules.graph_construction.dependency_graph_construction import DependencyBasedGraphConstruction
+from .test_annotation_cache import CountingProcessor
+
+
+def test_construct_many(tmp_path):
+    texts = ['James went', 'broken', 'Mary smiled', 'He ran']
+    with GraphShardWriter(str(tmp_path / 'graphs.shard')) as writer:
+        results = list(DependencyBasedGraphConstruction.construct_many(
+            texts, CountingProcessor, num_workers=2, writer=writer, progress=False,
+            merge_strategy='sequential', edge_strategy=None))
+
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert results[1].graph is None and 'IndexError' in results[1].error
+    assert all(result.error is None and result.graph.get_node_num() == 3 for result in results if result.index != 1)
+
+    reader = GraphShardReader(str(tmp_path / 'graphs.shard'))
+    assert len(reader) == 3
+    assert reader[2].node_attributes[2]['token'] == 'He'
+
+
+def test_construct_many_reads_lazily():
+    num_read = [0]
+
+    def texts():
+        for _ in range(200):
+            num_read[0] += 1
+            yield 'He ran'
+
+    results = DependencyBasedGraphConstruction.construct_many(texts(), CountingProcessor, num_workers=2, chunksize=3,
+                                                              progress=False, merge_strategy=None, edge_strategy=None)
+    assert next(results).error is None
+    # At most 4 chunks per worker are queued ahead, plus the chunk submitted when the first one completed
+    assert num_read[0] <= (2 * 4 + 1) * 3
+    assert len(list(results)) == 199 and num_read[0] == 200
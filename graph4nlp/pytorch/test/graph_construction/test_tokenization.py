@@ -0,0 +1,55 @@
+import pickle
+
+from ...modules.graph_construction.base import DynamicGraphConstructionBase
+from ...modules.utils.tokenization_utils import Tokenizer, regex_tokenize
+from ...modules.utils.vocab_utils import VocabModel, collect_vocabs
+
+
+def test_regex_tokenize():
+    assert regex_tokenize("He doesn't want (eggs) from the corner-shop...") == \
+        ['He', 'does', "n't", 'want', '(', 'eggs', ')', 'from', 'the', 'corner-shop', '...']
+    assert regex_tokenize("John's cat costs $3.50!") == ['John', "'s", 'cat', 'costs', '$', '3.50', '!']
+
+
+def test_tokenizer_cache():
+    tokenizer = Tokenizer(regex_tokenize, capacity=2)
+    assert tokenizer('I like nlp.') == ['I', 'like', 'nlp', '.']
+    tokens = tokenizer('I like nlp.')
+    tokens.append('!')
+    assert tokenizer('I like nlp.') == ['I', 'like', 'nlp', '.']
+    assert tokenizer.hits == 2 and tokenizer.misses == 1
+
+    texts = ['Same here!', 'I like graph.', 'Same here!', 'I like nlp.']
+    assert tokenizer.tokenize_many(texts, num_workers=2) == [regex_tokenize(text) for text in texts]
+    assert tokenizer.misses == 3 and len(tokenizer._cache) == 2
+
+    tokenizer = pickle.loads(pickle.dumps(tokenizer))
+    assert tokenizer('Same here!') == ['Same', 'here', '!'] and tokenizer.misses == 1
+
+
+def test_shared_tokenizer():
+    tokenizer = Tokenizer(regex_tokenize)
+    vocab_model = VocabModel([['I like nlp.', 'Same here!'], ['I like graph.', 'Same here!']], tokenizer=tokenizer,
+                             word_emb_size=8)
+    assert vocab_model.word_vocab.tokenizer is tokenizer
+    assert tokenizer.misses == 3
+
+    graph = DynamicGraphConstructionBase.raw_text_to_init_graph('I like graph.', lower_case=False, tokenizer=tokenizer)
+    assert vocab_model.word_vocab.to_index_sequence('I like graph.') == \
+        [vocab_model.word_vocab.getIndex(token) for token in ['I', 'like', 'graph', '.']]
+    assert tokenizer.misses == 3
+    assert graph.get_all_edges() == [(0, 1), (1, 2), (2, 3)]
+    assert graph.get_node_attrs(3)[3]['token'] == '.'
+
+
+def test_collect_vocabs_in_batches():
+    class BatchRecordingTokenizer(Tokenizer):
+        def tokenize_many(self, texts, **kwargs):
+            batch_sizes.append(len(texts))
+            return super(BatchRecordingTokenizer, self).tokenize_many(texts, **kwargs)
+
+    batch_sizes = []
+    instances = (['I like nlp.', 'Same here!'] for _ in range(5))
+    all_words = collect_vocabs(instances, BatchRecordingTokenizer(regex_tokenize), batch_size=3)
+    assert batch_sizes == [3, 3, 3, 1]
+    assert all_words['like'] == 5 and all_words['!'] == 5 and all_words['.'] == 5